@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+import asyncio
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy import delete, func, select, text
 from typing import Dict, Any
-from app.database import get_db
+from app.database import get_async_db, get_session_factory, run_with_session
 from app.auth.auth import get_current_admin_user
 from app.models.user import User
 from app.models.document import Document, DocumentChunk
-from app.services.document_service import DocumentService
+from app.services.document_service import DocumentService, count_documents_by_status
+from app.services.container import get_document_service
 
 router = APIRouter()
 
@@ -14,31 +17,34 @@ router = APIRouter()
 @router.get("/dashboard")
 async def get_admin_dashboard(
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Dict[str, Any]:
     """Get admin dashboard statistics"""
     
     # User statistics
-    total_users = db.query(User).count()
-    active_users = db.query(User).filter(User.is_active == True).count()
-    admin_users = db.query(User).filter(User.is_admin == True).count()
+    total_users, active_users, admin_users = (await db.execute(select(
+        func.count(),
+        func.count().filter(User.is_active == True),
+        func.count().filter(User.is_admin == True)
+    ).select_from(User))).one()
     
     # Document statistics
-    total_documents = db.query(Document).count()
-    completed_documents = db.query(Document).filter(Document.status == "completed").count()
-    processing_documents = db.query(Document).filter(Document.status == "processing").count()
-    failed_documents = db.query(Document).filter(Document.status == "failed").count()
+    status_counts = await count_documents_by_status(db)
+    total_documents = sum(status_counts.values())
+    completed_documents = status_counts.get("completed", 0)
+    processing_documents = status_counts.get("processing", 0)
+    failed_documents = status_counts.get("failed", 0)
     
     # Chunk statistics
-    total_chunks = db.query(DocumentChunk).count()
+    total_chunks = await db.scalar(select(func.count()).select_from(DocumentChunk))
     
     # Storage statistics
-    total_storage = db.query(func.sum(Document.file_size)).scalar() or 0
+    total_storage = await db.scalar(select(func.sum(Document.file_size))) or 0
     
     # Recent documents
-    recent_documents = db.query(Document).order_by(
-        Document.created_at.desc()
-    ).limit(5).all()
+    recent_documents = (await db.execute(
+        select(Document).order_by(Document.created_at.desc()).limit(5)
+    )).scalars().all()
     
     return {
         "users": {
@@ -75,13 +81,13 @@ async def get_admin_dashboard(
 @router.get("/users")
 async def list_all_users(
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
     limit: int = 100
 ):
     """List all users with pagination"""
-    users = db.query(User).offset(skip).limit(limit).all()
-    total = db.query(User).count()
+    users = (await db.execute(select(User).offset(skip).limit(limit))).scalars().all()
+    total = await db.scalar(select(func.count()).select_from(User))
     
     return {
         "users": users,
@@ -95,18 +101,18 @@ async def list_all_users(
 async def toggle_user_active_status(
     user_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Toggle user active status"""
     if user_id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot modify your own account")
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     user.is_active = not user.is_active
-    db.commit()
+    await db.commit()
     
     return {
         "message": f"User {user.email} {'activated' if user.is_active else 'deactivated'}",
@@ -118,19 +124,19 @@ async def toggle_user_active_status(
 @router.get("/documents")
 async def list_all_documents(
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     skip: int = 0,
     limit: int = 100,
     status: str = None
 ):
     """List all documents with optional status filter"""
-    query = db.query(Document)
+    query = select(Document)
     
     if status:
-        query = query.filter(Document.status == status)
+        query = query.where(Document.status == status)
     
-    documents = query.offset(skip).limit(limit).all()
-    total = query.count()
+    documents = (await db.execute(query.offset(skip).limit(limit))).scalars().all()
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
     
     return {
         "documents": documents,
@@ -145,10 +151,10 @@ async def list_all_documents(
 async def reprocess_document(
     document_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Force reprocess a failed document"""
-    document = db.query(Document).filter(Document.id == document_id).first()
+    document = await db.get(Document, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
@@ -160,7 +166,7 @@ async def reprocess_document(
     
     # Reset status to uploaded for reprocessing
     document.status = "uploaded"
-    db.commit()
+    await db.commit()
     
     return {
         "message": f"Document {document.original_filename} queued for reprocessing",
@@ -172,12 +178,15 @@ async def reprocess_document(
 async def force_delete_document(
     document_id: int,
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    session_factory: sessionmaker = Depends(get_session_factory),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """Force delete a document (admin only)"""
-    document_service = DocumentService()
+    if not await db.get(Document, document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
     
-    success = document_service.delete_document(document_id, db)
+    success = await asyncio.to_thread(run_with_session, session_factory, document_service.delete_document, document_id)
     if not success:
         raise HTTPException(status_code=404, detail="Document not found or deletion failed")
     
@@ -190,19 +199,19 @@ async def force_delete_document(
 @router.get("/system/status")
 async def get_system_status(
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    document_service: DocumentService = Depends(get_document_service)
 ):
     """Get system status and health"""
     try:
         # Test database connection
-        db.execute("SELECT 1")
+        await db.execute(text("SELECT 1"))
         db_status = "healthy"
     except Exception as e:
         db_status = f"error: {str(e)}"
     
     # Get processing statistics
-    document_service = DocumentService()
-    processing_stats = document_service.get_processing_stats(db)
+    processing_stats = await document_service.get_processing_stats(db)
     
     return {
         "database": {
@@ -221,25 +230,19 @@ async def get_system_status(
 @router.post("/system/cleanup")
 async def cleanup_orphaned_data(
     current_user: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Clean up orphaned data (chunks without documents, etc.)"""
-    # Find chunks without documents
-    orphaned_chunks = db.query(DocumentChunk).filter(
-        ~DocumentChunk.document_id.in_(
-            db.query(Document.id)
-        )
-    ).all()
-    
-    orphaned_count = len(orphaned_chunks)
+    # Delete chunks without documents in one statement
+    result = await db.execute(
+        delete(DocumentChunk).where(~DocumentChunk.document_id.in_(select(Document.id)))
+    )
+    orphaned_count = result.rowcount
     
-    # Delete orphaned chunks
-    for chunk in orphaned_chunks:
-        db.delete(chunk)
-    
-    db.commit()
+    await db.commit()
     
     return {
         "message": f"Cleanup completed. Removed {orphaned_count} orphaned chunks",
         "orphaned_chunks_removed": orphaned_count
-    }
\ No newline at end of file
+    }
+
@@ -1,15 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 from pathlib import Path
+import asyncio
 import os
 import uuid
 from typing import List
 
-from app.database import get_db
+from app.database import get_async_db, get_session_factory, run_with_session
 from app.models.document import Document
 from app.schemas.document import DocumentResponse, DocumentUploadResponse
 from app.services.document_service import DocumentService
 from app.services.query_service import QueryService
+from app.services.container import get_document_service, get_query_service
 from app.auth.auth import get_current_user_optional, get_current_active_user
 from app.models.user import User
 from app.config import settings
@@ -19,10 +23,6 @@ router = APIRouter()
 # Ensure upload directory exists
 os.makedirs(settings.upload_dir, exist_ok=True)
 
-# Initialize services
-document_service = DocumentService()
-query_service = QueryService()
-
 ALLOWED_EXTENSIONS = {'.pdf', '.txt', '.doc', '.docx'}
 MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 
@@ -30,7 +30,7 @@ MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
 @router.post("/upload", response_model=DocumentUploadResponse)
 async def upload_document(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user_optional)
 ):
     # Validate file type
@@ -70,8 +70,8 @@ async def upload_document(
     )
     
     db.add(db_document)
-    db.commit()
-    db.refresh(db_document)
+    await db.commit()
+    await db.refresh(db_document)
     
     return DocumentUploadResponse(
         document_id=db_document.id,
@@ -82,22 +82,27 @@ async def upload_document(
 
 
 @router.get("/", response_model=List[DocumentResponse])
-async def list_documents(db: Session = Depends(get_db)):
-    documents = db.query(Document).all()
-    return documents
+async def list_documents(db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(Document))
+    return result.scalars().all()
 
 
 @router.get("/{document_id}", response_model=DocumentResponse)
-async def get_document(document_id: int, db: Session = Depends(get_db)):
-    document = db.query(Document).filter(Document.id == document_id).first()
+async def get_document(document_id: int, db: AsyncSession = Depends(get_async_db)):
+    document = await db.get(Document, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     return document
 
 
 @router.post("/{document_id}/process")
-async def process_document(document_id: int, db: Session = Depends(get_db)):
-    document = db.query(Document).filter(Document.id == document_id).first()
+async def process_document(
+    document_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    session_factory: sessionmaker = Depends(get_session_factory),
+    document_service: DocumentService = Depends(get_document_service)
+):
+    document = await db.get(Document, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
@@ -107,8 +112,13 @@ async def process_document(document_id: int, db: Session = Depends(get_db)):
             detail=f"Document cannot be processed. Current status: {document.status}"
         )
     
-    # Start processing
-    success = await document_service.process_document(document_id, db)
+    # Release the pooled connection: processing opens its own session and can take a while
+    await db.close()
+    
+    # Extraction, embedding and indexing block, so they run on a worker thread
+    success = await asyncio.to_thread(
+        run_with_session, session_factory, document_service.process_document, document_id
+    )
     
     if success:
         return {"message": "Document processing completed successfully", "document_id": document_id}
@@ -117,8 +127,16 @@ async def process_document(document_id: int, db: Session = Depends(get_db)):
 
 
 @router.delete("/{document_id}")
-async def delete_document(document_id: int, db: Session = Depends(get_db)):
-    success = document_service.delete_document(document_id, db)
+async def delete_document(
+    document_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    session_factory: sessionmaker = Depends(get_session_factory),
+    document_service: DocumentService = Depends(get_document_service)
+):
+    if not await db.get(Document, document_id):
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    success = await asyncio.to_thread(run_with_session, session_factory, document_service.delete_document, document_id)
     if success:
         return {"message": "Document deleted successfully", "document_id": document_id}
     else:
@@ -126,12 +144,16 @@ async def delete_document(document_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/{document_id}/chunks")
-async def get_document_chunks(document_id: int, db: Session = Depends(get_db)):
-    document = db.query(Document).filter(Document.id == document_id).first()
+async def get_document_chunks(
+    document_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    document_service: DocumentService = Depends(get_document_service)
+):
+    document = await db.get(Document, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    chunks = document_service.get_document_chunks(document_id, db)
+    chunks = await document_service.get_document_chunks(document_id, db)
     return {
         "document_id": document_id,
         "total_chunks": len(chunks),
@@ -147,9 +169,13 @@ async def get_document_chunks(document_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/{document_id}/summary")
-async def get_document_summary(document_id: int, db: Session = Depends(get_db)):
+async def get_document_summary(
+    document_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    query_service: QueryService = Depends(get_query_service)
+):
     """Get AI-generated summary of a document."""
-    document = db.query(Document).filter(Document.id == document_id).first()
+    document = await db.get(Document, document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
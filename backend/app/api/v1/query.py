@@ -1,25 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional, List
+import json
 import logging
 
-from app.database import get_db
+from app.config import settings
+from app.database import get_async_db
 from app.services.query_service import QueryService
+from app.services.container import get_query_service
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Initialize query service
-query_service = QueryService()
-
 
 class QueryRequest(BaseModel):
     question: str
     document_id: Optional[int] = None
     max_results: Optional[int] = 5
     score_threshold: Optional[float] = 0.7
+    stream: bool = False  # Stream sources and answer tokens as Server-Sent Events
+
+
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest]
 
 
 class SourceInfo(BaseModel):
@@ -34,20 +40,42 @@ class QueryResponse(BaseModel):
     answer: str
     sources: List[SourceInfo]
     processing_time_ms: int
+    cached: bool = False
 
 
 @router.post("/", response_model=QueryResponse)
 async def query_documents(
     request: QueryRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    query_service: QueryService = Depends(get_query_service)
 ):
-    """Query documents and get AI-generated answers with sources."""
+    """Query documents and get AI-generated answers with sources.
+    
+    With ``stream`` set, the response is an SSE stream: a ``sources``
+    event once retrieval finishes, ``token`` events as the answer is
+    generated, and a final ``done`` event with the full response (or an
+    ``error`` event).
+    """
     try:
         if not request.question.strip():
             raise HTTPException(status_code=400, detail="Question cannot be empty")
         
         logger.info(f"Processing query: {request.question[:100]}...")
         
+        if request.stream:
+            events = query_service.stream_query(
+                question=request.question,
+                document_id=request.document_id,
+                max_results=request.max_results,
+                score_threshold=request.score_threshold,
+                db=db
+            )
+            return StreamingResponse(
+                _sse_lines(events),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        
         # Process query
         result = await query_service.process_query(
             question=request.question,
@@ -64,6 +92,50 @@ async def query_documents(
         raise HTTPException(status_code=500, detail=f"Query processing failed: {str(e)}")
 
 
+async def _sse_lines(events):
+    """Encode query events as Server-Sent Events."""
+    async for event in events:
+        yield f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+@router.post("/batch")
+async def query_documents_batch(
+    request: BatchQueryRequest,
+    db: AsyncSession = Depends(get_async_db),
+    query_service: QueryService = Depends(get_query_service)
+):
+    """Answer many questions in one request, streaming NDJSON results as they finish.
+    
+    Each line is a query result (or an ``error``) tagged with the ``index``
+    of its question in the request.
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="At least one query is required")
+    if len(request.queries) > settings.query_batch_max_size:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many queries: {len(request.queries)} (max {settings.query_batch_max_size})"
+        )
+    if any(not query.question.strip() for query in request.queries):
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+    
+    logger.info(f"Processing batch of {len(request.queries)} queries")
+    
+    async def result_lines():
+        async for result in query_service.process_query_batch(
+            [query.model_dump(exclude_none=True) for query in request.queries], db=db
+        ):
+            yield json.dumps(result, default=str) + "\n"
+    
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+
+@router.get("/stats")
+async def query_stats(query_service: QueryService = Depends(get_query_service)):
+    """Cache and batching statistics for the query pipeline."""
+    return query_service.get_stats()
+
+
 @router.get("/health")
 async def query_health():
     """Health check for query service."""
@@ -1,12 +1,14 @@
 from datetime import datetime, timedelta
 from typing import Optional
+import asyncio
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.config import settings
-from app.database import get_db
+from app.database import get_async_db
 from app.models.user import User
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -45,17 +47,24 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    """Look up a user by email"""
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
     """Authenticate a user by email and password"""
-    user = db.query(User).filter(User.email == email).first()
-    if not user or not verify_password(password, user.hashed_password):
+    user = await get_user_by_email(db, email)
+    # bcrypt is deliberately slow, so keep it off the event loop
+    if not user or not await asyncio.to_thread(verify_password, password, user.hashed_password):
         return None
     return user
 
 
-def get_current_user(
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """Get current authenticated user"""
     credentials_exception = HTTPException(
@@ -76,7 +85,7 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    user = await get_user_by_email(db, email)
     if user is None:
         raise credentials_exception
     
@@ -101,9 +110,9 @@ def get_current_admin_user(current_user: User = Depends(get_current_active_user)
 
 
 # Optional authentication - doesn't require token
-def get_current_user_optional(
+async def get_current_user_optional(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Optional[User]:
     """Get current user if token provided, None otherwise"""
     if not credentials:
@@ -118,7 +127,7 @@ def get_current_user_optional(
         if email is None:
             return None
             
-        user = db.query(User).filter(User.email == email).first()
+        user = await get_user_by_email(db, email)
         return user if user and user.is_active else None
         
     except:
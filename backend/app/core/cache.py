@@ -0,0 +1,138 @@
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import threading
+import time
+import logging
+
+import redis
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client: Optional[redis.Redis] = None
+_redis_retry_at = 0.0
+_redis_lock = threading.Lock()
+
+REDIS_RETRY_INTERVAL_SECONDS = 30
+
+
+class LRUCache:
+    """Thread-safe in-process LRU cache bounded by entry count and total size."""
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value or None, refreshing its recency."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, size: int = 0):
+        """Store a value, evicting least recently used entries when over budget."""
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, expires_at)
+            self._total_bytes += size
+
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+            ):
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        """Remove a single entry if present."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _remove(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics."""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "size_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions
+        }
+
+
+def get_redis_client() -> Optional[redis.Redis]:
+    """Get the shared Redis client, or None if Redis is not reachable."""
+    global _redis_client, _redis_retry_at
+
+    if _redis_client is not None:
+        return _redis_client
+
+    # Don't pay a connection timeout on every call while Redis is down
+    if time.monotonic() < _redis_retry_at:
+        return None
+
+    with _redis_lock:
+        if _redis_client is None and time.monotonic() >= _redis_retry_at:
+            try:
+                client = redis.Redis.from_url(
+                    settings.redis_url,
+                    socket_timeout=1,
+                    socket_connect_timeout=1
+                )
+                client.ping()
+                _redis_client = client
+                logger.info("Connected to Redis cache")
+            except Exception as e:
+                logger.warning(f"Redis unavailable, using in-process cache only: {e}")
+                _redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL_SECONDS
+                return None
+
+    return _redis_client
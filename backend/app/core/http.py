@@ -0,0 +1,21 @@
+import httpx
+from app.config import settings
+
+
+def get_http_limits() -> httpx.Limits:
+    """Connection pool limits shared by outbound HTTP clients."""
+    return httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry_seconds
+    )
+
+
+def create_http_client() -> httpx.Client:
+    """Pooled keep-alive client for the OpenAI SDK; request timeouts are set by the SDK."""
+    return httpx.Client(limits=get_http_limits())
+
+
+def create_async_http_client() -> httpx.AsyncClient:
+    """Pooled keep-alive client for the async OpenAI SDK clients."""
+    return httpx.AsyncClient(limits=get_http_limits())
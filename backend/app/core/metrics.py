@@ -0,0 +1,38 @@
+from typing import Dict, Sequence
+import bisect
+import threading
+
+
+class Histogram:
+    """Fixed-bucket histogram with cumulative (Prometheus-style) bucket counts."""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Record a single observation."""
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self) -> Dict:
+        """Get the current counts, sum and mean."""
+        with self._lock:
+            cumulative = {}
+            running = 0
+            for bound, count in zip(self.buckets, self._counts):
+                running += count
+                cumulative[f"le_{bound:g}"] = running
+            cumulative["le_inf"] = self.count
+
+            return {
+                "count": self.count,
+                "sum": round(self.sum, 3),
+                "mean": round(self.sum / self.count, 3) if self.count else 0.0,
+                "buckets": cumulative
+            }
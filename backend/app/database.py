@@ -1,11 +1,20 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from typing import Any, Callable
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Async drivers for the request path, by database dialect
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
 engine = create_engine(
     settings.database_url,
     pool_pre_ping=True,
@@ -17,6 +26,37 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def get_async_database_url(database_url: str) -> str:
+    """The same database addressed through its async driver."""
+    url = make_url(database_url)
+    dialect = url.get_backend_name()
+    if dialect not in ASYNC_DRIVERS:
+        raise Exception(f"No async driver configured for database: {dialect}")
+    return url.set(drivername=ASYNC_DRIVERS[dialect]).render_as_string(hide_password=False)
+
+
+def _async_pool_options(database_url: str) -> dict:
+    """Pool sizing for the async engine (SQLite opens a connection per session instead)."""
+    if make_url(database_url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": settings.database_pool_size,
+        "max_overflow": settings.database_max_overflow,
+        "pool_timeout": settings.database_pool_timeout,
+        "pool_pre_ping": True,
+        "pool_recycle": 300,
+    }
+
+
+async_engine = create_async_engine(
+    get_async_database_url(settings.database_url),
+    echo=settings.debug,
+    **_async_pool_options(settings.database_url)
+)
+# Objects stay usable after commit, since responses are built from them afterwards
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -25,6 +65,26 @@ def get_db():
         db.close()
 
 
+def get_session_factory() -> sessionmaker:
+    """Dependency: the sync session factory for work handed to a worker thread (overridable in tests)."""
+    return SessionLocal
+
+
+def run_with_session(session_factory: sessionmaker, function: Callable[..., Any], *args) -> Any:
+    """Call ``function(*args, db)`` with its own sync session, for blocking work on a worker thread."""
+    db = session_factory()
+    try:
+        return function(*args, db)
+    finally:
+        db.close()
+
+
+async def get_async_db():
+    """Dependency: a session on the async engine, for request handlers."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def create_tables():
     """Create database tables"""
     try:
@@ -36,13 +96,17 @@ def create_tables():
         raise
 
 
-def check_database_connection():
+async def check_database_connection():
     """Check if database connection is working"""
     try:
-        db = SessionLocal()
-        db.execute("SELECT 1")
-        db.close()
+        async with async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
         return True
     except Exception as e:
         logger.error(f"Database connection failed: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+async def close_database():
+    """Close pooled async connections."""
+    await async_engine.dispose()
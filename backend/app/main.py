@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
@@ -9,18 +10,50 @@ from app.core.exceptions import (
     validation_exception_handler,
     general_exception_handler
 )
-from app.database import create_tables, check_database_connection
+from app.database import create_tables, check_database_connection, close_database
+from app.services.container import ServiceContainer
 import logging
 
 # Setup logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize the database and shared services, and close them on shutdown"""
+    logger.info("Starting Advanced RAG System API...")
+    
+    # Check database connection
+    if not await check_database_connection():
+        logger.error("Database connection failed!")
+        raise Exception("Database connection failed")
+    
+    # Create tables if they don't exist
+    try:
+        create_tables()
+        logger.info("Database initialization completed")
+    except Exception as e:
+        logger.error(f"Database initialization failed: {e}")
+        raise
+    
+    # Build shared services once for all routes
+    app.state.services = ServiceContainer()
+    
+    logger.info("Application startup completed")
+    yield
+    
+    await app.state.services.aclose()
+    await close_database()
+    logger.info("Application shutdown completed")
+
+
 app = FastAPI(
     title="Advanced RAG System API",
     description="A Retrieval-Augmented Generation system for document Q&A",
     version="1.0.0",
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan
 )
 
 # Exception handlers
@@ -45,27 +78,6 @@ app.include_router(query.router, prefix="/api/v1/query", tags=["query"])
 app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize application on startup"""
-    logger.info("Starting Advanced RAG System API...")
-    
-    # Check database connection
-    if not check_database_connection():
-        logger.error("Database connection failed!")
-        raise Exception("Database connection failed")
-    
-    # Create tables if they don't exist
-    try:
-        create_tables()
-        logger.info("Database initialization completed")
-    except Exception as e:
-        logger.error(f"Database initialization failed: {e}")
-        raise
-    
-    logger.info("Application startup completed")
-
-
 @app.get("/")
 async def root():
     return {"message": "Advanced RAG System API", "version": "1.0.0", "status": "running"}
\ No newline at end of file
@@ -25,7 +25,7 @@ class DocumentChunk(BaseModel):
     document_id = Column(Integer, ForeignKey("documents.id"), nullable=False)
     chunk_index = Column(Integer, nullable=False)
     content = Column(Text, nullable=False)
-    vector_id = Column(String(100))  # ID in vector database
+    vector_id = Column(String(100), index=True)  # ID in vector database
     
     # Relationships
     document = relationship("Document", back_populates="chunks")
\ No newline at end of file
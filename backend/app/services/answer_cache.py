@@ -0,0 +1,220 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import threading
+import time
+import logging
+
+import numpy as np
+
+from app.config import settings
+from app.services.document_versions import DocumentVersions
+
+logger = logging.getLogger(__name__)
+
+_answer_cache: Optional["SemanticAnswerCache"] = None
+_answer_cache_lock = threading.Lock()
+
+
+class SemanticAnswerCache:
+    """In-process cache of formatted answers, looked up by question similarity.
+
+    Question embeddings are rows of one preallocated, normalized matrix,
+    so a lookup is a single matrix-vector product. A cached answer is
+    reused only for the same scope (document filter and retrieval
+    parameters) and when the cosine similarity clears ``similarity_threshold``.
+
+    Entries are stamped with the change counters (``DocumentVersions``) of
+    the documents they were answered from, and a hit is only served while
+    those counters are unchanged. With ``use_redis`` the counters live in
+    Redis, so a document change in any worker invalidates the answers
+    cached by every worker; while they can't be read, lookups bypass the cache.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        max_entries: int = 1000,
+        ttl_seconds: Optional[float] = None,
+        use_redis: bool = False
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self.versions = DocumentVersions("ans", use_redis)
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # Allocated on first put, once the dimension is known
+        self._responses: List[Optional[Dict]] = [None] * max_entries
+        self._stamps: List[Dict[int, int]] = [{} for _ in range(max_entries)]
+        self._scopes = np.full(max_entries, None, dtype=object)
+        self._expires_at = np.full(max_entries, -np.inf)
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._slots_by_document: Dict[int, Set[int]] = {}
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.bypassed = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_scope(document_id: Optional[int], max_results: int, score_threshold: float) -> str:
+        """Scope key: answers are only shared between identically scoped queries."""
+        return f"{document_id or '*'}:{max_results}:{score_threshold}"
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    def get(self, embedding: np.ndarray, scope: str) -> Optional[Dict]:
+        """Return the cached response for the most similar question in scope, or None."""
+        return self.lookup(embedding, scope)[1]
+
+    def lookup(self, embedding: np.ndarray, scope: str) -> Tuple[Optional[int], Optional[Dict]]:
+        """(global version to stamp a new entry with, cached response or None)."""
+        version = self.versions.current(None)
+        if version is None:
+            with self._lock:
+                self.bypassed += 1
+            return None, None
+
+        query = self._normalize(embedding)
+        with self._lock:
+            slot = self._best_slot(query, scope)
+            if slot is None:
+                self.misses += 1
+                return version, None
+            stamp, response = self._stamps[slot], self._responses[slot]
+
+        current = self.versions.current_many(list(stamp))
+        with self._lock:
+            if current != stamp:
+                if self._stamps[slot] is stamp:
+                    self._release(slot)
+                self.stale += 1
+                return version, None
+            if self._stamps[slot] is stamp:
+                self._touch(slot)
+            self.hits += 1
+        return version, dict(response)
+
+    def _best_slot(self, query: np.ndarray, scope: str) -> Optional[int]:
+        """The in-scope slot most similar to the query, if it clears the threshold. Caller holds the lock."""
+        if self._vectors is None or self._vectors.shape[1] != len(query):
+            return None
+
+        valid = (self._scopes == scope) & (self._expires_at > time.monotonic())
+        if not valid.any():
+            return None
+
+        similarities = np.where(valid, self._vectors @ query, -np.inf)
+        slot = int(np.argmax(similarities))
+        return slot if similarities[slot] >= self.similarity_threshold else None
+
+    def put(self, embedding: np.ndarray, scope: str, response: Dict, document_ids: Iterable[int], version: int):
+        """Cache a response, evicting an expired or the least recently used entry when full.
+
+        ``version`` is the global counter read before retrieval; if any
+        document changed since, the response may be stale and is not cached.
+        """
+        stamp = self.versions.current_many([None, *set(document_ids)])
+        if stamp is None or stamp.pop(None) != version:
+            return
+        query = self._normalize(embedding)
+
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != len(query):
+                self._reset(len(query))
+
+            now = time.monotonic()
+            slot = int(np.argmin(np.where(self._expires_at <= now, -1, self._last_used)))
+            self._release(slot)
+
+            self._vectors[slot] = query
+            self._responses[slot] = response
+            self._scopes[slot] = scope
+            self._expires_at[slot] = now + self.ttl_seconds if self.ttl_seconds else np.inf
+            self._stamps[slot] = stamp
+            for document_id in stamp:
+                self._slots_by_document.setdefault(document_id, set()).add(slot)
+            self._touch(slot)
+
+    def invalidate_document(self, document_id: int):
+        """Invalidate every answer built from the given document, in all workers sharing the counters."""
+        if not self.versions.bump(document_id):
+            logger.warning(f"Answer cache bypassed until document {document_id}'s version bump reaches Redis")
+
+        # Free this worker's slots now; other workers drop theirs on their next hit
+        with self._lock:
+            slots = self._slots_by_document.pop(document_id, set())
+            for slot in slots:
+                self._release(slot)
+            self.invalidations += len(slots)
+
+        if slots:
+            logger.info(f"Invalidated {len(slots)} cached answers for document {document_id}")
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            for slot in range(self.max_entries):
+                self._release(slot)
+
+    def _touch(self, slot: int):
+        self._clock += 1
+        self._last_used[slot] = self._clock
+
+    def _release(self, slot: int):
+        """Empty a slot. Caller holds the lock."""
+        for document_id in self._stamps[slot]:
+            slots = self._slots_by_document.get(document_id)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self._slots_by_document[document_id]
+        self._stamps[slot] = {}
+        self._responses[slot] = None
+        self._scopes[slot] = None
+        self._expires_at[slot] = -np.inf
+        self._last_used[slot] = 0
+
+    def _reset(self, dimension: int):
+        """(Re)allocate storage for a new embedding dimension. Caller holds the lock."""
+        for slot in range(self.max_entries):
+            self._release(slot)
+        self._vectors = np.zeros((self.max_entries, dimension), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return sum(1 for response in self._responses if response is not None)
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics."""
+        lookups = self.hits + self.misses + self.stale + self.bypassed
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """Get the process-wide semantic answer cache."""
+    global _answer_cache
+
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                _answer_cache = SemanticAnswerCache(
+                    similarity_threshold=settings.answer_cache_similarity,
+                    max_entries=settings.answer_cache_max_entries,
+                    ttl_seconds=settings.answer_cache_ttl_seconds,
+                    use_redis=settings.answer_cache_use_redis
+                )
+
+    return _answer_cache
@@ -0,0 +1,100 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List
+import os
+import sqlite3
+import threading
+import logging
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models.document import DocumentChunk
+
+logger = logging.getLogger(__name__)
+
+# Keep IN lists well under database parameter limits
+LOOKUP_BATCH_SIZE = 500
+
+
+class ChunkStore(ABC):
+    """Chunk text keyed by vector ID, for hydrating lean vector search results."""
+
+    @abstractmethod
+    def get_many(self, vector_ids: List[str]) -> Dict[str, str]:
+        """Bulk-load content for the given IDs; unknown IDs are left out."""
+
+    def put_many(self, contents: Dict[str, str]):
+        """Store content by vector ID."""
+
+    def delete_many(self, vector_ids: List[str]):
+        """Remove content by vector ID."""
+
+
+class DatabaseChunkStore(ChunkStore):
+    """Reads ``document_chunks.content``, which DocumentService already writes."""
+
+    def get_many(self, vector_ids: List[str]) -> Dict[str, str]:
+        if not vector_ids:
+            return {}
+
+        db = SessionLocal()
+        try:
+            contents = {}
+            for start in range(0, len(vector_ids), LOOKUP_BATCH_SIZE):
+                rows = db.query(DocumentChunk.vector_id, DocumentChunk.content).filter(
+                    DocumentChunk.vector_id.in_(vector_ids[start:start + LOOKUP_BATCH_SIZE])
+                ).all()
+                contents.update({vector_id: content for vector_id, content in rows})
+            return contents
+        finally:
+            db.close()
+
+
+class SqliteChunkStore(ChunkStore):
+    """Local key-value file for deployments that don't want chunk reads on the main database."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (vector_id TEXT PRIMARY KEY, content TEXT NOT NULL)"
+        )
+        self._connection.commit()
+
+    def get_many(self, vector_ids: List[str]) -> Dict[str, str]:
+        contents = {}
+        with self._lock:
+            for start in range(0, len(vector_ids), LOOKUP_BATCH_SIZE):
+                batch = vector_ids[start:start + LOOKUP_BATCH_SIZE]
+                rows = self._connection.execute(
+                    f"SELECT vector_id, content FROM chunks WHERE vector_id IN ({','.join('?' * len(batch))})",
+                    batch
+                ).fetchall()
+                contents.update(rows)
+        return contents
+
+    def put_many(self, contents: Dict[str, str]):
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO chunks (vector_id, content) VALUES (?, ?)", contents.items()
+            )
+            self._connection.commit()
+
+    def delete_many(self, vector_ids: List[str]):
+        with self._lock:
+            self._connection.executemany(
+                "DELETE FROM chunks WHERE vector_id = ?", [(vector_id,) for vector_id in vector_ids]
+            )
+            self._connection.commit()
+
+
+def get_chunk_store() -> ChunkStore:
+    """Build the chunk store selected in settings."""
+    if settings.chunk_store == "database":
+        return DatabaseChunkStore()
+
+    if settings.chunk_store == "sqlite":
+        return SqliteChunkStore(settings.chunk_store_path)
+
+    raise Exception(f"Unknown chunk store: {settings.chunk_store}")
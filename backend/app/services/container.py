@@ -0,0 +1,93 @@
+from fastapi import Request
+import logging
+
+from app.core.http import create_async_http_client, create_http_client
+from app.services.embedding_providers import get_embedding_provider
+from app.services.embedding_service import EmbeddingService
+from app.services.vector_service import get_vector_service
+from app.services.llm_service import LLMService
+from app.services.chunk_store import get_chunk_store
+from app.services.lexical_index import get_lexical_index
+from app.services.document_router import get_document_router
+from app.config import settings
+from app.services.document_service import DocumentService
+from app.services.query_service import QueryService
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceContainer:
+    """Application-scoped services, built once in the app lifespan.
+
+    Every route shares one vector service (one Qdrant connection pool and
+    one collection bootstrap) and one keep-alive HTTP pool (sync and async)
+    for all OpenAI clients, instead of each module or request building its own.
+    """
+
+    def __init__(self):
+        self.http_client = create_http_client()
+        self.async_http_client = create_async_http_client()
+        self.embedding_service = EmbeddingService(provider=get_embedding_provider(
+            http_client=self.http_client, async_http_client=self.async_http_client
+        ))
+        self.vector_service = get_vector_service(self.embedding_service.dimension)
+        self.llm_service = LLMService(async_http_client=self.async_http_client)
+        self.chunk_store = get_chunk_store()
+        self.lexical_index = get_lexical_index() if settings.hybrid_search_enabled else None
+        self.document_router = (
+            get_document_router(self.embedding_service.dimension) if settings.document_routing_enabled else None
+        )
+
+        self.document_service = DocumentService(
+            embedding_service=self.embedding_service,
+            vector_service=self.vector_service,
+            chunk_store=self.chunk_store,
+            lexical_index=self.lexical_index,
+            document_router=self.document_router
+        )
+        self.query_service = QueryService(
+            embedding_service=self.embedding_service,
+            vector_service=self.vector_service,
+            llm_service=self.llm_service,
+            chunk_store=self.chunk_store,
+            lexical_index=self.lexical_index,
+            document_router=self.document_router
+        )
+        if self.query_service.answer_cache is not None:
+            self.document_service.change_listeners.append(self.query_service.answer_cache.invalidate_document)
+        if self.query_service.retrieval_cache is not None:
+            self.document_service.change_listeners.append(self.query_service.retrieval_cache.bump_document)
+        if self.query_service.metadata_cache is not None:
+            self.document_service.change_listeners.append(self.query_service.metadata_cache.invalidate_document)
+        logger.info("Service container initialized")
+
+    def close(self):
+        """Release pooled connections."""
+        self.vector_service.close()
+        if self.document_router is not None:
+            self.document_router.close()
+        self.http_client.close()
+        logger.info("Service container closed")
+
+    async def aclose(self):
+        """Release pooled connections, including the async clients'."""
+        await self.vector_service.aclose()
+        if self.document_router is not None:
+            await self.document_router.aclose()
+        await self.async_http_client.aclose()
+        self.close()
+
+
+def get_services(request: Request) -> ServiceContainer:
+    """Dependency: the container built at startup."""
+    return request.app.state.services
+
+
+def get_document_service(request: Request) -> DocumentService:
+    """Dependency: the shared DocumentService."""
+    return get_services(request).document_service
+
+
+def get_query_service(request: Request) -> QueryService:
+    """Dependency: the shared QueryService."""
+    return get_services(request).query_service
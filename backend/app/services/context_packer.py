@@ -0,0 +1,150 @@
+from typing import Dict, List, Tuple
+import threading
+import logging
+
+from app.services.tokenizer import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class ContextPacker:
+    """Builds the LLM context from retrieved chunks within a token budget.
+
+    Chunks of the same document with consecutive (or equal) indexes are
+    merged into one passage, dropping the words a chunk repeats from the
+    end of the one before it (chunking uses overlapping windows). Passages
+    are then added in retrieval rank order while they fit ``max_tokens``,
+    counted with the model's tokenizer; the top passage is truncated rather
+    than dropped when it alone exceeds the budget.
+    """
+
+    def __init__(self, model: str, max_tokens: int = 4000, max_overlap_words: int = 200):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.max_overlap_words = max_overlap_words
+        self._stats_lock = threading.Lock()
+        self.contexts = 0
+        self.chunks_merged = 0
+        self.passages_dropped = 0
+        self.tokens_sent = 0
+        self.tokens_saved = 0
+
+    def pack(self, chunks: List[Dict]) -> Tuple[str, List[Dict], Dict]:
+        """Context text for the prompt, the chunks it includes, and how it compares to sending every chunk whole.
+
+        Each chunk is tokenized once; token figures cover passage text,
+        not the ``[Context i]`` labels.
+        """
+        chunk_tokens = [count_tokens(chunk["content"], self.model) for chunk in chunks]
+        passages = self._merge(chunks, chunk_tokens)
+
+        selected = []
+        included = []
+        used_tokens = 0
+        for passage in passages:
+            if used_tokens + passage["tokens"] <= self.max_tokens:
+                selected.append(passage["content"])
+                included.extend(chunks[position] for position, _ in passage["chunks"])
+                used_tokens += passage["tokens"]
+            elif not selected:
+                content = truncate_to_tokens(passage["content"], self.max_tokens, self.model)
+                selected.append(content)
+                # Chunks whose text starts inside the kept prefix
+                included.extend(chunks[position] for position, offset in passage["chunks"] if offset < len(content))
+                used_tokens = self.max_tokens
+
+        stats = {
+            "chunks": len(chunks),
+            "passages": len(selected),
+            "dropped": len(passages) - len(selected),
+            "tokens": used_tokens,
+            "unpacked_tokens": sum(chunk_tokens)
+        }
+        stats["tokens_saved"] = max(0, stats["unpacked_tokens"] - stats["tokens"])
+
+        with self._stats_lock:
+            self.contexts += 1
+            self.chunks_merged += len(chunks) - len(passages)
+            self.passages_dropped += stats["dropped"]
+            self.tokens_sent += stats["tokens"]
+            self.tokens_saved += stats["tokens_saved"]
+
+        logger.info(
+            f"Packed {len(chunks)} chunks into {len(selected)} passages: "
+            f"{stats['tokens']} context tokens, {stats['tokens_saved']} saved"
+        )
+        return format_context(selected), included, stats
+
+    def _merge(self, chunks: List[Dict], chunk_tokens: List[int]) -> List[Dict]:
+        """Join runs of adjacent chunks per document; passages keep their best chunk's rank.
+
+        Each passage lists its chunks as (position in ``chunks``, offset of
+        the chunk's first new character in the passage text).
+        """
+        by_document: Dict[int, List[Tuple[int, Dict]]] = {}
+        for rank, chunk in enumerate(chunks):
+            by_document.setdefault(chunk.get("document_id"), []).append((rank, chunk))
+
+        passages = []
+        for ranked_chunks in by_document.values():
+            ranked_chunks.sort(key=lambda item: -1 if item[1].get("chunk_index") is None else item[1]["chunk_index"])
+            current = None
+            for rank, chunk in ranked_chunks:
+                words = chunk["content"].split()
+                index = chunk.get("chunk_index")
+                if current is not None and index is not None and index - current["last_index"] <= 1:
+                    new_words = words[self._overlap(current["tail"], words):]
+                    current["chunks"].append((rank, len(current["content"])))
+                    if new_words:
+                        added = " " + " ".join(new_words)
+                        current["content"] += added
+                        current["tokens"] += count_tokens(added, self.model)
+                    current["tail"] = (current["tail"] + new_words)[-self.max_overlap_words:]
+                    current["last_index"] = index
+                    current["rank"] = min(current["rank"], rank)
+                    continue
+
+                current = {
+                    "content": chunk["content"],
+                    "tokens": chunk_tokens[rank],
+                    "chunks": [(rank, 0)],
+                    "tail": words[-self.max_overlap_words:],
+                    "last_index": index if index is not None else -2,
+                    "rank": rank
+                }
+                passages.append(current)
+
+        passages.sort(key=lambda passage: passage["rank"])
+        return passages
+
+    def _overlap(self, previous: List[str], following: List[str]) -> int:
+        """How many leading words of ``following`` repeat the end of ``previous``."""
+        for size in range(min(len(previous), len(following)), 0, -1):
+            if previous[-size:] == following[:size]:
+                return size
+        return 0
+
+    def get_stats(self) -> Dict:
+        """Get cumulative packing statistics."""
+        with self._stats_lock:
+            return {
+                "contexts": self.contexts,
+                "chunks_merged": self.chunks_merged,
+                "passages_dropped": self.passages_dropped,
+                "tokens_sent": self.tokens_sent,
+                "tokens_saved": self.tokens_saved
+            }
+
+
+def format_context(passages: List[str]) -> str:
+    """Number passages as ``[Context i]`` blocks separated by blank lines."""
+    if not passages:
+        return "No relevant context found."
+
+    context_parts = []
+    for i, passage in enumerate(passages, 1):
+        context_parts.append(f"[Context {i}]")
+        context_parts.append(passage)
+        context_parts.append("")  # Empty line separator
+
+    return "\n".join(context_parts)
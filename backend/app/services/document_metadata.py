@@ -0,0 +1,84 @@
+from typing import Dict, Iterable, Optional
+import threading
+import logging
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.cache import LRUCache
+from app.models.document import Document
+
+logger = logging.getLogger(__name__)
+
+_metadata_cache: Optional["DocumentMetadataCache"] = None
+_metadata_cache_lock = threading.Lock()
+
+
+async def load_document_metadata(document_ids: Iterable[int], db: AsyncSession) -> Dict[int, Dict]:
+    """Filename and type of each existing document, in one ``IN (...)`` query."""
+    document_ids = list(dict.fromkeys(document_ids))
+    if not document_ids:
+        return {}
+
+    rows = await db.execute(
+        select(Document.id, Document.original_filename, Document.file_type).where(Document.id.in_(document_ids))
+    )
+    return {row.id: {"filename": row.original_filename, "file_type": row.file_type} for row in rows}
+
+
+class DocumentMetadataCache:
+    """Process-wide cache of the document fields search results are labelled with.
+
+    A document's filename and type don't change while it exists, so entries
+    are only dropped when the document is processed or deleted (through the
+    document service's change listeners). The TTL bounds how long another
+    worker's changes can go unseen.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: Optional[float] = None):
+        self.memory = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.queries = 0
+
+    async def get_many(self, document_ids: Iterable[int], db: AsyncSession) -> Dict[int, Dict]:
+        """Metadata per document ID; misses are loaded together in one query."""
+        metadata = {}
+        missing = []
+        for document_id in dict.fromkeys(document_ids):
+            cached = self.memory.get(str(document_id))
+            if cached is None:
+                missing.append(document_id)
+            else:
+                metadata[document_id] = cached
+
+        if missing:
+            loaded = await load_document_metadata(missing, db)
+            self.queries += 1
+            for document_id, entry in loaded.items():
+                self.memory.set(str(document_id), entry)
+            metadata.update(loaded)
+
+        return metadata
+
+    def invalidate_document(self, document_id: int):
+        """Forget a document's metadata."""
+        self.memory.delete(str(document_id))
+
+    def get_stats(self) -> Dict:
+        """Get cache statistics."""
+        return {"queries": self.queries, **self.memory.get_stats()}
+
+
+def get_document_metadata_cache() -> DocumentMetadataCache:
+    """Get the process-wide document metadata cache."""
+    global _metadata_cache
+
+    if _metadata_cache is None:
+        with _metadata_cache_lock:
+            if _metadata_cache is None:
+                _metadata_cache = DocumentMetadataCache(
+                    max_entries=settings.document_metadata_cache_max_entries,
+                    ttl_seconds=settings.document_metadata_cache_ttl_seconds
+                )
+
+    return _metadata_cache
@@ -0,0 +1,93 @@
+from typing import List, Optional, Set
+import logging
+import numpy as np
+
+from app.config import settings
+from app.services.vector_service import get_vector_service
+from app.services.vector_ids import document_point_id
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentRouter:
+    """Coarse stage of two-stage retrieval: one centroid vector per document.
+
+    Centroids (the normalized mean of a document's chunk embeddings) live
+    in their own collection of the configured vector backend, stored as a
+    single point per document. Corpus-wide queries search this small
+    collection first and then search chunks only within the top documents.
+    """
+
+    def __init__(self, vector_service):
+        self.vector_service = vector_service
+
+    @staticmethod
+    def centroid(embeddings: np.ndarray) -> np.ndarray:
+        """Mean direction of a document's chunk embeddings."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        unit = np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms > 0)
+        return unit.mean(axis=0)
+
+    def update_document(self, document_id: int, embeddings: List[np.ndarray]):
+        """Store (or replace) a document's centroid from all of its chunk embeddings."""
+        if not embeddings:
+            self.delete_document(document_id)
+            return
+
+        self.vector_service.store_chunks(
+            document_id,
+            [{"index": 0, "content": "", "word_count": len(embeddings), "embedding": self.centroid(np.vstack(embeddings))}],
+            vector_ids=[document_point_id(document_id)]
+        )
+
+    def delete_document(self, document_id: int):
+        """Remove a document's centroid."""
+        self.vector_service.delete_document_chunks(document_id)
+
+    def get_document_ids(self) -> Set[int]:
+        """IDs of the documents that have a centroid."""
+        return self.vector_service.get_document_ids()
+
+    def route(self, query_embedding: np.ndarray, limit: int) -> List[int]:
+        """IDs of the documents whose centroids are closest to the query."""
+        results = self.vector_service.search_similar(query_embedding, limit=limit, score_threshold=-1.0)
+        return [result["document_id"] for result in results]
+
+    def route_batch(self, query_embeddings: np.ndarray, limit: int) -> List[List[int]]:
+        """``route`` for many queries in one search round-trip."""
+        batch_results = self.vector_service.search_similar_batch(
+            query_embeddings,
+            limits=[limit] * len(query_embeddings),
+            document_ids=[None] * len(query_embeddings),
+            score_thresholds=[-1.0] * len(query_embeddings)
+        )
+        return [[result["document_id"] for result in results] for results in batch_results]
+
+    async def route_async(self, query_embedding: np.ndarray, limit: int) -> List[int]:
+        """``route`` without blocking the event loop."""
+        results = await self.vector_service.search_similar_async(query_embedding, limit=limit, score_threshold=-1.0)
+        return [result["document_id"] for result in results]
+
+    async def route_batch_async(self, query_embeddings: np.ndarray, limit: int) -> List[List[int]]:
+        """``route_batch`` without blocking the event loop."""
+        batch_results = await self.vector_service.search_similar_batch_async(
+            query_embeddings,
+            limits=[limit] * len(query_embeddings),
+            document_ids=[None] * len(query_embeddings),
+            score_thresholds=[-1.0] * len(query_embeddings)
+        )
+        return [[result["document_id"] for result in results] for results in batch_results]
+
+    def close(self):
+        self.vector_service.close()
+
+    async def aclose(self):
+        await self.vector_service.aclose()
+
+
+def get_document_router(vector_size: int, collection_name: Optional[str] = None) -> DocumentRouter:
+    """Build a router over the centroid collection next to the chunk collection."""
+    return DocumentRouter(
+        get_vector_service(vector_size, collection_name or f"{settings.qdrant_collection_name}_centroids")
+    )
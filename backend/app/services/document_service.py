@@ -1,24 +1,55 @@
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Callable, Dict, List, Optional, Set
+import asyncio
 import logging
 import os
 
 from app.models.document import Document, DocumentChunk
 from app.services.processors.pdf_processor import PDFProcessor
 from app.services.embedding_service import EmbeddingService
-from app.services.vector_service import VectorService
+from app.services.vector_service import get_vector_service
+from app.services.vector_ids import chunk_point_ids
+from app.services.chunk_store import ChunkStore, get_chunk_store
+from app.services.lexical_index import LexicalIndex, get_lexical_index
+from app.services.document_router import DocumentRouter, get_document_router
+from app.config import settings
 
 logger = logging.getLogger(__name__)
 
 
 class DocumentService:
-    def __init__(self):
+    def __init__(
+        self,
+        embedding_service: Optional[EmbeddingService] = None,
+        vector_service=None,
+        chunk_store: Optional[ChunkStore] = None,
+        lexical_index: Optional[LexicalIndex] = None,
+        document_router: Optional[DocumentRouter] = None
+    ):
         self.pdf_processor = PDFProcessor()
-        self.embedding_service = EmbeddingService()
-        self.vector_service = VectorService()
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.vector_service = vector_service or get_vector_service(self.embedding_service.dimension)
+        self.chunk_store = chunk_store or get_chunk_store()
+        self.lexical_index = lexical_index
+        if self.lexical_index is None and settings.hybrid_search_enabled:
+            self.lexical_index = get_lexical_index()
+        self.document_router = document_router
+        if self.document_router is None and settings.document_routing_enabled:
+            self.document_router = get_document_router(self.embedding_service.dimension)
+        # Called with a document ID whenever its indexed content changes (e.g. to invalidate caches)
+        self.change_listeners: List[Callable[[int], None]] = []
+    
+    def _notify_change(self, document_id: int):
+        for listener in self.change_listeners:
+            try:
+                listener(document_id)
+            except Exception as e:
+                logger.warning(f"Document change listener failed for document {document_id}: {e}")
     
-    async def process_document(self, document_id: int, db: Session) -> bool:
-        """Process a document through the complete pipeline."""
+    def process_document(self, document_id: int, db: Session) -> bool:
+        """Process a document through the complete pipeline (blocking; run it off the event loop)."""
         try:
             # Get document from database
             document = db.query(Document).filter(Document.id == document_id).first()
@@ -34,14 +65,11 @@ class DocumentService:
             # Step 1: Extract and chunk text
             chunks = self._extract_and_chunk(document)
             
-            # Step 2: Generate embeddings
-            chunks_with_embeddings = self.embedding_service.embed_chunks(chunks)
-            
-            # Step 3: Store in vector database
-            vector_ids = self.vector_service.store_chunks(document_id, chunks_with_embeddings)
+            # Step 2-3: Embed and store only chunks not already indexed
+            vector_ids = self._sync_vectors(document_id, chunks)
             
             # Step 4: Save chunks to database
-            self._save_chunks_to_db(document_id, chunks_with_embeddings, vector_ids, db)
+            self._save_chunks_to_db(document_id, chunks, vector_ids, db)
             
             # Update document status
             document.status = "completed"
@@ -59,6 +87,52 @@ class DocumentService:
                 db.commit()
             
             return False
+        
+        finally:
+            # Reprocessing may have changed indexed content even if it failed part-way
+            self._notify_change(document_id)
+    
+    def _sync_vectors(self, document_id: int, chunks: List[dict]) -> List[str]:
+        """Bring the document's points in line with its current chunks.
+        
+        Point IDs are derived from chunk content, so unchanged chunks keep
+        their points (only the chunk index is refreshed if it moved); new
+        or edited chunks are embedded and upserted, and points for chunks
+        that disappeared are deleted.
+        """
+        vector_ids = chunk_point_ids(document_id, chunks)
+        existing = self.vector_service.get_document_point_ids(document_id)
+        
+        new_positions = [i for i, vector_id in enumerate(vector_ids) if vector_id not in existing]
+        new_chunks = self.embedding_service.embed_chunks([chunks[i] for i in new_positions])
+        self.chunk_store.put_many({vector_ids[i]: chunks[i]["content"] for i in new_positions})
+        self.vector_service.store_chunks(document_id, new_chunks, [vector_ids[i] for i in new_positions])
+        
+        moved = {
+            vector_id: chunk["index"]
+            for vector_id, chunk in zip(vector_ids, chunks)
+            if vector_id in existing and existing[vector_id] != chunk["index"]
+        }
+        self.vector_service.update_chunk_indexes(moved)
+        
+        removed = list(set(existing) - set(vector_ids))
+        self.vector_service.delete_points(removed)
+        self.chunk_store.delete_many(removed)
+        
+        if self.lexical_index is not None:
+            self.lexical_index.replace_document(document_id, vector_ids, chunks)
+        
+        if self.document_router is not None:
+            # New chunks carry their embeddings; unchanged ones are read back from the store
+            kept = self.vector_service.get_vectors([vector_id for vector_id in vector_ids if vector_id in existing])
+            embeddings = [chunk["embedding"] for chunk in new_chunks] + list(kept.values())
+            self.document_router.update_document(document_id, embeddings)
+        
+        logger.info(
+            f"Indexed document {document_id}: {len(new_chunks)} new, "
+            f"{len(chunks) - len(new_chunks)} unchanged ({len(moved)} moved), {len(removed)} removed"
+        )
+        return vector_ids
     
     def _extract_and_chunk(self, document: Document) -> List[dict]:
         """Extract text and create chunks based on file type."""
@@ -90,8 +164,10 @@ class DocumentService:
         vector_ids: List[str], 
         db: Session
     ):
-        """Save chunks to database."""
+        """Save chunks to database, replacing rows from earlier processing."""
         try:
+            db.query(DocumentChunk).filter(DocumentChunk.document_id == document_id).delete()
+            
             for chunk, vector_id in zip(chunks, vector_ids):
                 db_chunk = DocumentChunk(
                     document_id=document_id,
@@ -115,8 +191,14 @@ class DocumentService:
             if not document:
                 return False
             
-            # Delete from vector database
+            # Delete from vector database and chunk store
+            vector_ids = list(self.vector_service.get_document_point_ids(document_id))
             self.vector_service.delete_document_chunks(document_id)
+            self.chunk_store.delete_many(vector_ids)
+            if self.lexical_index is not None:
+                self.lexical_index.delete_document(document_id)
+            if self.document_router is not None:
+                self.document_router.delete_document(document_id)
             
             # Delete file from disk
             if os.path.exists(document.file_path):
@@ -125,6 +207,7 @@ class DocumentService:
             # Delete from database (cascades to chunks)
             db.delete(document)
             db.commit()
+            self._notify_change(document_id)
             
             logger.info(f"Successfully deleted document {document_id}")
             return True
@@ -133,25 +216,90 @@ class DocumentService:
             logger.error(f"Failed to delete document {document_id}: {e}")
             return False
     
-    def get_document_chunks(self, document_id: int, db: Session) -> List[DocumentChunk]:
+    def rebuild_lexical_index(self, db: Session) -> int:
+        """Index every completed document's saved chunks; returns the number of documents indexed.
+        
+        Backfills documents processed before hybrid search was enabled,
+        without re-extracting or re-embedding anything.
+        """
+        if self.lexical_index is None:
+            raise Exception("Lexical index rebuild failed: hybrid search is not configured")
+        
+        document_ids = self._completed_document_ids(db)
+        for document_id in document_ids:
+            chunks = (
+                db.query(DocumentChunk)
+                .filter(DocumentChunk.document_id == document_id)
+                .order_by(DocumentChunk.chunk_index)
+                .all()
+            )
+            self.lexical_index.replace_document(
+                document_id,
+                [chunk.vector_id for chunk in chunks],
+                [{"index": chunk.chunk_index, "content": chunk.content} for chunk in chunks]
+            )
+            self._notify_change(document_id)
+        
+        logger.info(f"Rebuilt lexical index for {len(document_ids)} documents")
+        return len(document_ids)
+    
+    def rebuild_centroids(self, db: Session) -> int:
+        """Store a centroid for every completed document from its stored chunk vectors.
+        
+        Backfills documents processed before document routing was enabled;
+        until every completed document has a centroid, queries skip routing.
+        """
+        if self.document_router is None:
+            raise Exception("Centroid rebuild failed: document routing is not configured")
+        
+        document_ids = self._completed_document_ids(db)
+        for document_id in document_ids:
+            vector_ids = list(self.vector_service.get_document_point_ids(document_id))
+            self.document_router.update_document(document_id, list(self.vector_service.get_vectors(vector_ids).values()))
+        
+        logger.info(f"Rebuilt centroids for {len(document_ids)} documents")
+        return len(document_ids)
+    
+    @staticmethod
+    def _completed_document_ids(db: Session) -> List[int]:
+        return [document_id for (document_id,) in db.query(Document.id).filter(Document.status == "completed")]
+    
+    async def get_document_chunks(self, document_id: int, db: AsyncSession) -> List[DocumentChunk]:
         """Get all chunks for a document."""
-        return db.query(DocumentChunk).filter(
-            DocumentChunk.document_id == document_id
-        ).order_by(DocumentChunk.chunk_index).all()
+        result = await db.execute(
+            select(DocumentChunk)
+            .where(DocumentChunk.document_id == document_id)
+            .order_by(DocumentChunk.chunk_index)
+        )
+        return list(result.scalars().all())
     
-    def get_processing_stats(self, db: Session) -> dict:
+    async def get_processing_stats(self, db: AsyncSession) -> dict:
         """Get processing statistics."""
-        total_docs = db.query(Document).count()
-        completed_docs = db.query(Document).filter(Document.status == "completed").count()
-        processing_docs = db.query(Document).filter(Document.status == "processing").count()
-        failed_docs = db.query(Document).filter(Document.status == "failed").count()
+        status_counts = await count_documents_by_status(db)
+        total_docs = sum(status_counts.values())
+        completed_docs = status_counts.get("completed", 0)
+        processing_docs = status_counts.get("processing", 0)
+        failed_docs = status_counts.get("failed", 0)
         
-        vector_stats = self.vector_service.get_collection_stats()
+        vector_stats = await asyncio.to_thread(self.vector_service.get_collection_stats)
         
         return {
             "total_documents": total_docs,
             "completed_documents": completed_docs,
             "processing_documents": processing_docs,
             "failed_documents": failed_docs,
-            "vector_database": vector_stats
-        }
\ No newline at end of file
+            "vector_database": vector_stats,
+            "embedding_service": self.embedding_service.get_stats()
+        }
+
+
+async def completed_document_ids(db: AsyncSession) -> Set[int]:
+    """IDs of every successfully processed document."""
+    rows = await db.execute(select(Document.id).where(Document.status == "completed"))
+    return set(rows.scalars().all())
+
+
+async def count_documents_by_status(db: AsyncSession) -> Dict[str, int]:
+    """Document counts per processing status, in one query."""
+    rows = await db.execute(select(Document.status, func.count()).group_by(Document.status))
+    return {status: count for status, count in rows.all()}
@@ -0,0 +1,90 @@
+from typing import Dict, List, Optional
+import threading
+import logging
+
+from app.core.cache import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentVersions:
+    """Per-document and corpus-wide change counters that cache entries are stamped with.
+
+    Every document change bumps the document's counter and the global
+    one (``None``), so an entry stamped with an older value is stale.
+    With ``use_redis`` the counters are only ever read from and bumped in
+    Redis, so all workers agree on them. A bump that can't reach Redis is
+    kept and replayed before the next read; until it lands (or whenever
+    Redis is unreachable) reads return None and callers bypass their
+    cache rather than trust an unbumped counter.
+    """
+
+    def __init__(self, namespace: str, use_redis: bool = True):
+        self.namespace = namespace
+        self.use_redis = use_redis
+        self._local_versions: Dict[str, int] = {}
+        self._pending_bumps: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def key(self, document_id: Optional[int]) -> str:
+        return f"{self.namespace}:version:{document_id or 'all'}"
+
+    def current(self, document_id: Optional[int]) -> Optional[int]:
+        """A document's counter, or the global one for ``None`` (None: Redis unavailable)."""
+        versions = self.current_many([document_id])
+        return None if versions is None else versions[document_id]
+
+    def current_many(self, document_ids: List[Optional[int]]) -> Optional[Dict[Optional[int], int]]:
+        """Counters for several documents in one round-trip (None: Redis unavailable)."""
+        keys = [self.key(document_id) for document_id in document_ids]
+        if not self.use_redis:
+            with self._lock:
+                return {document_id: self._local_versions.get(key, 0) for document_id, key in zip(document_ids, keys)}
+
+        redis_client = get_redis_client()
+        if redis_client is None or not self._flush_bumps(redis_client):
+            return None
+        try:
+            values = redis_client.mget(keys) if keys else []
+            return {document_id: int(value or 0) for document_id, value in zip(document_ids, values)}
+        except Exception as e:
+            logger.warning(f"Redis {self.namespace} version lookup failed: {e}")
+            return None
+
+    def bump(self, document_id: int) -> bool:
+        """Mark a document (and so the whole corpus) changed; False if the bump is still pending."""
+        keys = [self.key(document_id), self.key(None)]
+        with self._lock:
+            versions = self._pending_bumps if self.use_redis else self._local_versions
+            for key in keys:
+                versions[key] = versions.get(key, 0) + 1
+
+        if not self.use_redis:
+            return True
+        redis_client = get_redis_client()
+        return redis_client is not None and self._flush_bumps(redis_client)
+
+    def _flush_bumps(self, redis_client) -> bool:
+        """Apply pending bumps to Redis; False if some are still pending."""
+        with self._lock:
+            pending = dict(self._pending_bumps)
+        if not pending:
+            return True
+
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for key, count in pending.items():
+                pipeline.incrby(key, count)
+            pipeline.execute()
+        except Exception as e:
+            logger.warning(f"Redis {self.namespace} version bump failed: {e}")
+            return False
+
+        with self._lock:
+            for key, count in pending.items():
+                remaining = self._pending_bumps.get(key, 0) - count
+                if remaining > 0:
+                    self._pending_bumps[key] = remaining
+                else:
+                    self._pending_bumps.pop(key, None)
+        return True
@@ -0,0 +1,103 @@
+from typing import List, Dict, Optional, Set, Tuple
+import asyncio
+import time
+import logging
+
+import numpy as np
+
+from app.core.metrics import Histogram
+from app.services.embedding_service import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+
+class QueryEmbeddingBatcher:
+    """Groups concurrent query embedding requests into batched API calls.
+
+    The first request to arrive opens a short window; every text queued
+    before it closes (or before the batch fills up) is embedded in one
+    request and each caller gets its own vector back.
+    """
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        max_wait_ms: float = 5.0,
+        max_batch_size: int = 64
+    ):
+        self.embedding_service = embedding_service
+        self.max_wait_ms = max_wait_ms
+        self.max_batch_size = max_batch_size
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+        self.batch_size_histogram = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.wait_time_histogram = Histogram([0.5, 1, 2, 5, 10, 25, 50, 100])
+        self.batches = 0
+        self.requests = 0
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Get the embedding for one text, sharing an API call with concurrent requests."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.monotonic()))
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Dispatch everything queued so far as one batch."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        dispatched_at = time.monotonic()
+        for _, _, queued_at in batch:
+            self.wait_time_histogram.observe((dispatched_at - queued_at) * 1000)
+
+        # Identical questions in the same window share one input
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self.batch_size_histogram.observe(len(texts))
+        self.batches += 1
+
+        try:
+            embeddings = await self.embedding_service.get_embeddings_batch_async(texts)
+            by_text = dict(zip(texts, embeddings))
+
+            for text, future, _ in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+
+            logger.debug(f"Embedded {len(texts)} queries for {len(batch)} waiting requests")
+
+        except Exception as e:
+            logger.error(f"Failed to embed query batch of {len(texts)}: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def get_stats(self) -> Dict:
+        """Get batching statistics."""
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "max_wait_ms": self.max_wait_ms,
+            "max_batch_size": self.max_batch_size,
+            "batch_size_histogram": self.batch_size_histogram.snapshot(),
+            "wait_time_ms_histogram": self.wait_time_histogram.snapshot()
+        }
@@ -0,0 +1,160 @@
+from typing import List, Optional, Sequence, Dict
+import hashlib
+import threading
+import logging
+
+import numpy as np
+
+from app.config import settings
+from app.core.cache import LRUCache, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+_embedding_cache: Optional["EmbeddingCache"] = None
+_query_embedding_cache: Optional["EmbeddingCache"] = None
+_embedding_cache_lock = threading.Lock()
+
+
+class EmbeddingCache:
+    """Two-level embedding cache: in-process LRU in front of Redis.
+
+    Entries are keyed by (model, sha256 of normalized text) and stored as
+    packed float32 bytes, so an ada-002 vector costs ~6 KB in either tier.
+    """
+
+    def __init__(
+        self,
+        namespace: str = "emb",
+        max_entries: int = 10000,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+        use_redis: bool = True,
+        lowercase: bool = False
+    ):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self.lowercase = lowercase
+        self.memory = LRUCache(max_entries=max_entries, max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+        # Lookups come from embedding worker threads, so counters are updated under a lock
+        self._stats_lock = threading.Lock()
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def normalize(self, text: str) -> str:
+        """Normalize text so trivially different inputs share a key."""
+        text = " ".join(text.split())
+        return text.lower() if self.lowercase else text
+
+    def make_key(self, model: str, text: str) -> str:
+        """Build the cache key for a text embedded with the given model."""
+        digest = hashlib.sha256(self.normalize(text).encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{model}:{digest}"
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Look up embeddings for texts; missing entries are returned as None."""
+        keys = [self.make_key(model, text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(keys)
+        redis_positions = []
+        redis_hits = 0
+
+        for i, key in enumerate(keys):
+            packed = self.memory.get(key)
+            if packed is not None:
+                results[i] = self._unpack(packed)
+            else:
+                redis_positions.append(i)
+
+        redis_client = get_redis_client() if self.use_redis and redis_positions else None
+        if redis_client is not None:
+            try:
+                values = redis_client.mget([keys[i] for i in redis_positions])
+                for i, packed in zip(redis_positions, values):
+                    if packed is not None:
+                        results[i] = self._unpack(packed)
+                        self.memory.set(keys[i], packed, size=len(packed))
+                        redis_hits += 1
+            except Exception as e:
+                logger.warning(f"Redis embedding cache lookup failed: {e}")
+
+        with self._stats_lock:
+            self.memory_hits += len(keys) - len(redis_positions)
+            self.redis_hits += redis_hits
+            self.misses += sum(1 for result in results if result is None)
+        return results
+
+    def set_many(self, model: str, texts: Sequence[str], embeddings: Sequence[np.ndarray]):
+        """Store embeddings for texts in both cache tiers."""
+        entries = {}
+        for text, embedding in zip(texts, embeddings):
+            key = self.make_key(model, text)
+            packed = self._pack(embedding)
+            self.memory.set(key, packed, size=len(packed))
+            entries[key] = packed
+
+        redis_client = get_redis_client() if self.use_redis and entries else None
+        if redis_client is not None:
+            try:
+                pipeline = redis_client.pipeline(transaction=False)
+                for key, packed in entries.items():
+                    pipeline.set(key, packed, ex=self.ttl_seconds)
+                pipeline.execute()
+            except Exception as e:
+                logger.warning(f"Redis embedding cache write failed: {e}")
+
+    @staticmethod
+    def _pack(embedding: np.ndarray) -> bytes:
+        return np.asarray(embedding, dtype=np.float32).tobytes()
+
+    @staticmethod
+    def _unpack(packed: bytes) -> np.ndarray:
+        return np.frombuffer(packed, dtype=np.float32)
+
+    def get_stats(self) -> Dict:
+        """Get cache hit/miss statistics."""
+        with self._stats_lock:
+            memory_hits, redis_hits, misses = self.memory_hits, self.redis_hits, self.misses
+        lookups = memory_hits + redis_hits + misses
+        return {
+            "memory_hits": memory_hits,
+            "redis_hits": redis_hits,
+            "misses": misses,
+            "hit_rate": round((memory_hits + redis_hits) / lookups, 4) if lookups else 0.0,
+            "memory": self.memory.get_stats()
+        }
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Get the process-wide chunk embedding cache."""
+    global _embedding_cache
+
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache(
+                    namespace="emb",
+                    max_entries=settings.embedding_cache_max_entries,
+                    ttl_seconds=settings.embedding_cache_ttl_seconds
+                )
+
+    return _embedding_cache
+
+
+def get_query_embedding_cache() -> EmbeddingCache:
+    """Get the process-wide query embedding cache."""
+    global _query_embedding_cache
+
+    if _query_embedding_cache is None:
+        with _embedding_cache_lock:
+            if _query_embedding_cache is None:
+                _query_embedding_cache = EmbeddingCache(
+                    namespace="qemb",
+                    max_entries=settings.query_embedding_cache_max_entries,
+                    max_bytes=settings.query_embedding_cache_max_bytes,
+                    ttl_seconds=settings.query_embedding_cache_ttl_seconds,
+                    use_redis=settings.query_embedding_cache_use_redis,
+                    lowercase=True
+                )
+
+    return _query_embedding_cache
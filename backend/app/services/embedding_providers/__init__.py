@@ -0,0 +1,32 @@
+from typing import Optional
+
+import httpx
+
+from app.config import settings
+from .base import EmbeddingProvider
+from .local_provider import HashingEmbeddingProvider
+from .openai_provider import OpenAIEmbeddingProvider
+
+
+def get_embedding_provider(
+    http_client: Optional[httpx.Client] = None,
+    async_http_client: Optional[httpx.AsyncClient] = None
+) -> EmbeddingProvider:
+    """Build the embedding provider selected in settings."""
+    if settings.embedding_provider == "openai":
+        return OpenAIEmbeddingProvider(
+            model=settings.embedding_model, http_client=http_client, async_http_client=async_http_client
+        )
+
+    if settings.embedding_provider == "local":
+        return HashingEmbeddingProvider(dimension=settings.local_embedding_dimension)
+
+    raise Exception(f"Unknown embedding provider: {settings.embedding_provider}")
+
+
+__all__ = [
+    "EmbeddingProvider",
+    "HashingEmbeddingProvider",
+    "OpenAIEmbeddingProvider",
+    "get_embedding_provider",
+]
@@ -0,0 +1,40 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List
+import asyncio
+import numpy as np
+
+
+class EmbeddingProvider(ABC):
+    """Turns batches of texts into float32 embedding matrices.
+
+    Providers also describe how ``EmbeddingService`` should batch work for
+    them: the token and item limits per call and how many calls may run at
+    once.
+    """
+
+    model: str
+    dimension: int
+    max_batch_tokens: int = 1_000_000
+    max_batch_items: int = 256
+    max_concurrency: int = 1
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a (len(texts), dimension) float32 matrix."""
+
+    async def embed_async(self, texts: List[str]) -> np.ndarray:
+        """``embed`` without blocking the event loop (on a worker thread unless overridden)."""
+        return await asyncio.to_thread(self.embed, texts)
+
+    def count_tokens(self, text: str) -> int:
+        """Estimate what a text costs against ``max_batch_tokens``."""
+        return len(text) // 4 + 1
+
+    @property
+    def batch_scale(self) -> float:
+        """Fraction of the batch limits to use right now (lowered under throttling)."""
+        return 1.0
+
+    def get_stats(self) -> Dict:
+        """Provider-specific statistics."""
+        return {}
@@ -0,0 +1,81 @@
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List
+import hashlib
+import re
+
+import numpy as np
+
+from app.services.embedding_providers.base import EmbeddingProvider
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=500_000)
+def _feature_hash(feature: str, projections: int, seed: int) -> bytes:
+    """Keyed hash of one feature, 32 bits per projection."""
+    return hashlib.blake2b(
+        feature.encode("utf-8"),
+        digest_size=4 * projections,
+        key=seed.to_bytes(8, "little")
+    ).digest()
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """Offline CPU embedder: hashed unigram/bigram features with a sparse random projection.
+
+    Each feature is hashed to ``projections`` signed columns (an Achlioptas-
+    style sparse projection of the hashed bag of words), weighted by
+    sublinear term frequency and L2-normalized, so cosine similarity
+    tracks lexical overlap. It needs no network or model files and is
+    deterministic for a given seed, which makes it suitable for
+    benchmarks, air-gapped tests and cheap bulk pre-indexing.
+    """
+
+    def __init__(self, dimension: int = 384, projections: int = 4, seed: int = 0):
+        self.dimension = dimension
+        self.projections = projections
+        self.seed = seed
+        self.model = f"local-hashing-{dimension}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into an L2-normalized (len(texts), dimension) float32 matrix."""
+        feature_ids: Dict[str, int] = {}
+        rows: List[int] = []
+        ids: List[int] = []
+        weights: List[int] = []
+
+        for row, text in enumerate(texts):
+            tokens = TOKEN_PATTERN.findall(text.lower())
+            features = Counter(tokens)
+            features.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+
+            for feature, count in features.items():
+                rows.append(row)
+                ids.append(feature_ids.setdefault(feature, len(feature_ids)))
+                weights.append(count)
+
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        if not rows:
+            return embeddings
+
+        # Projection table for the batch vocabulary: k signed columns per feature
+        hashes = np.frombuffer(
+            b"".join(_feature_hash(feature, self.projections, self.seed) for feature in feature_ids),
+            dtype="<u4"
+        ).reshape(len(feature_ids), self.projections)
+        columns = (hashes % self.dimension).astype(np.int64)
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+
+        ids = np.asarray(ids)
+        values = signs[ids] * (1.0 + np.log(np.asarray(weights, dtype=np.float64)))[:, None]
+        flat_positions = np.asarray(rows, dtype=np.int64)[:, None] * self.dimension + columns[ids]
+        embeddings[:] = np.bincount(
+            flat_positions.ravel(),
+            weights=values.ravel(),
+            minlength=len(texts) * self.dimension
+        ).reshape(len(texts), self.dimension)
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        return embeddings
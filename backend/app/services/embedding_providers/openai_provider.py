@@ -0,0 +1,121 @@
+from typing import Dict, List, Optional
+import asyncio
+import base64
+import logging
+
+import httpx
+import numpy as np
+import openai
+
+from app.config import settings
+from app.services.embedding_providers.base import EmbeddingProvider
+from app.services.rate_limiter import get_rate_controller
+from app.services.tokenizer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+OPENAI_EMBEDDING_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+
+def _is_oversized_request(error: openai.APIStatusError) -> bool:
+    """Whether the provider rejected a request for being too large."""
+    if error.status_code == 413:
+        return True
+    message = str(error).lower()
+    return error.status_code == 400 and any(
+        marker in message for marker in ("maximum context length", "too many tokens", "too large", "max_tokens_per_request")
+    )
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """OpenAI embeddings API, called through the shared rate controller."""
+
+    def __init__(
+        self,
+        model: str = "text-embedding-ada-002",
+        http_client: Optional[httpx.Client] = None,
+        async_http_client: Optional[httpx.AsyncClient] = None
+    ):
+        if model not in OPENAI_EMBEDDING_DIMENSIONS:
+            raise Exception(f"Unknown OpenAI embedding model: {model}")
+
+        self.model = model
+        self.dimension = OPENAI_EMBEDDING_DIMENSIONS[model]
+        self.max_batch_tokens = settings.embedding_batch_max_tokens
+        self.max_batch_items = settings.embedding_batch_max_items
+        self.max_concurrency = settings.embedding_max_concurrency
+
+        # Retries are handled by the shared rate controller, not the SDK
+        self.client = openai.OpenAI(api_key=settings.openai_api_key, max_retries=0, http_client=http_client)
+        self.async_client = openai.AsyncOpenAI(
+            api_key=settings.openai_api_key, max_retries=0, http_client=async_http_client
+        )
+        self.rate_controller = get_rate_controller(model, max_concurrency=self.max_concurrency)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Call the embeddings API, splitting batches the provider rejects as too large."""
+        try:
+            response = self.rate_controller.call(
+                lambda: self.client.embeddings.with_raw_response.create(
+                    model=self.model,
+                    input=texts,
+                    encoding_format="base64"
+                )
+            )
+        except openai.APIStatusError as e:
+            if len(texts) > 1 and _is_oversized_request(e):
+                middle = len(texts) // 2
+                logger.warning(f"Embedding batch of {len(texts)} too large, splitting in two")
+                return np.vstack([self.embed(texts[:middle]), self.embed(texts[middle:])])
+            raise
+
+        return self._decode_embeddings(response.data)
+
+    async def embed_async(self, texts: List[str]) -> np.ndarray:
+        """``embed`` on the async client, so waiting on the API never blocks the event loop."""
+        try:
+            response = await self.rate_controller.call_async(
+                lambda: self.async_client.embeddings.with_raw_response.create(
+                    model=self.model,
+                    input=texts,
+                    encoding_format="base64"
+                )
+            )
+        except openai.APIStatusError as e:
+            if len(texts) > 1 and _is_oversized_request(e):
+                middle = len(texts) // 2
+                logger.warning(f"Embedding batch of {len(texts)} too large, splitting in two")
+                halves = await asyncio.gather(self.embed_async(texts[:middle]), self.embed_async(texts[middle:]))
+                return np.vstack(halves)
+            raise
+
+        return self._decode_embeddings(response.data)
+
+    def count_tokens(self, text: str) -> int:
+        return count_tokens(text, self.model)
+
+    @property
+    def batch_scale(self) -> float:
+        return self.rate_controller.batch_scale
+
+    @staticmethod
+    def _decode_embeddings(data: List) -> np.ndarray:
+        """Decode base64 embeddings straight into one contiguous float32 matrix."""
+        rows = []
+        for item in data:
+            if isinstance(item.embedding, str):
+                rows.append(np.frombuffer(base64.b64decode(item.embedding), dtype=np.float32))
+            else:
+                rows.append(np.asarray(item.embedding, dtype=np.float32))
+
+        embeddings = np.empty((len(rows), len(rows[0])), dtype=np.float32)
+        for i, row in enumerate(rows):
+            embeddings[i] = row
+        return embeddings
+
+    def get_stats(self) -> Dict:
+        return {"rate_controller": self.rate_controller.get_stats()}
@@ -1,58 +1,201 @@
-import openai
-from typing import List, Dict
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional
+import asyncio
+import threading
+import time
 import logging
 from app.config import settings
+from app.services.embedding_cache import EmbeddingCache, get_embedding_cache
+from app.services.embedding_providers import EmbeddingProvider, get_embedding_provider
+from app.services.tokenizer import pack_batches_by_tokens
 
 logger = logging.getLogger(__name__)
 
-# Configure OpenAI
-openai.api_key = settings.openai_api_key
-
 
 class EmbeddingService:
-    def __init__(self, model: str = "text-embedding-ada-002"):
-        self.model = model
-        self.client = openai.OpenAI(api_key=settings.openai_api_key)
+    def __init__(self, provider: Optional[EmbeddingProvider] = None, cache: Optional[EmbeddingCache] = None):
+        self.provider = provider or get_embedding_provider()
+        self.model = self.provider.model
+        self.dimension = self.provider.dimension
+        self.max_batch_tokens = self.provider.max_batch_tokens
+        self.max_batch_items = self.provider.max_batch_items
+        self.max_concurrency = self.provider.max_concurrency
+        
+        if cache is None and settings.embedding_cache_enabled:
+            cache = get_embedding_cache()
+        self.cache = cache
+        
+        # Counters used to estimate what the cache saves
+        self.api_requests = 0
+        self.texts_embedded = 0
+        self.embedding_time_ms = 0.0
+        self._stats_lock = threading.Lock()
     
-    def get_embedding(self, text: str) -> List[float]:
-        """Get embedding for a single text."""
+    async def get_embedding_async(self, text: str) -> np.ndarray:
+        """Get embedding for a single text as a float32 vector."""
         try:
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=text
-            )
-            return response.data[0].embedding
+            return (await self.provider.embed_async([text]))[0]
         
         except Exception as e:
             logger.error(f"Failed to get embedding: {e}")
             raise Exception(f"Embedding generation failed: {e}")
     
-    def get_embeddings_batch(self, texts: List[str], batch_size: int = 100) -> List[List[float]]:
-        """Get embeddings for multiple texts in batches."""
+    def get_embeddings_batch(
+        self,
+        texts: List[str],
+        batch_size: Optional[int] = None,
+        use_cache: bool = True
+    ) -> np.ndarray:
+        """Get a (len(texts), dim) float32 matrix of embeddings, only sending cache misses to the API."""
         if not texts:
-            return []
+            return np.empty((0, 0), dtype=np.float32)
+        
+        if self.cache is None or not use_cache:
+            return self._embed_texts(texts, batch_size)
+        
+        cached = self.cache.get_many(self.model, texts)
+        
+        # Embed each distinct missing text once, even if it repeats in the input
+        missing_positions: Dict[str, List[int]] = {}
+        for i, (text, embedding) in enumerate(zip(texts, cached)):
+            if embedding is None:
+                missing_positions.setdefault(text, []).append(i)
+        
+        new_embeddings = None
+        if missing_positions:
+            missing_texts = list(missing_positions.keys())
+            new_embeddings = self._embed_texts(missing_texts, batch_size)
+            self.cache.set_many(self.model, missing_texts, new_embeddings)
+        
+        dimension = new_embeddings.shape[1] if new_embeddings is not None else len(cached[0])
+        embeddings = np.empty((len(texts), dimension), dtype=np.float32)
+        for i, embedding in enumerate(cached):
+            if embedding is not None:
+                embeddings[i] = embedding
+        for row, positions in enumerate(missing_positions.values()):
+            embeddings[positions] = new_embeddings[row]
+        
+        missing_count = sum(len(positions) for positions in missing_positions.values())
+        logger.info(
+            f"Embedding cache: {len(texts) - missing_count}/{len(texts)} hits, "
+            f"{len(missing_positions)} texts sent to the API"
+        )
+        return embeddings
+    
+    def _embed_texts(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """Call the provider with token-packed batches, several at a time."""
+        # Batch limits shrink while the provider is throttling us
+        batch_scale = self.provider.batch_scale
+        token_counts = [self.provider.count_tokens(text) for text in texts]
+        batches = pack_batches_by_tokens(
+            token_counts,
+            max_tokens=max(1, int(self.max_batch_tokens * batch_scale)),
+            max_items=max(1, int((batch_size or self.max_batch_items) * batch_scale))
+        )
+        
+        results = []
+        
+        def run_batch(batch_number: int, positions: List[int]):
+            batch_embeddings = self._embed_batch(batch_number, [texts[i] for i in positions])
+            results.append((positions, batch_embeddings))
+        
+        workers = min(self.max_concurrency, len(batches))
+        if workers <= 1:
+            for batch_number, positions in enumerate(batches, 1):
+                run_batch(batch_number, positions)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(run_batch, batch_number, positions)
+                    for batch_number, positions in enumerate(batches, 1)
+                ]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except Exception:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        
+        # Scatter each batch back to its input positions
+        embeddings = np.empty((len(texts), results[0][1].shape[1]), dtype=np.float32)
+        for positions, batch_embeddings in results:
+            embeddings[positions] = batch_embeddings
+        
+        logger.info(
+            f"Embedded {len(texts)} texts ({sum(token_counts)} tokens) "
+            f"in {len(batches)} batches with concurrency {max(workers, 1)}"
+        )
+        return embeddings
+    
+    async def get_embeddings_batch_async(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """Uncached ``get_embeddings_batch`` for the query path, without blocking the event loop.
         
-        embeddings = []
+        Batches are token-packed as in the sync path and sent at most
+        ``max_concurrency`` at a time; query embeddings have their own cache.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        
+        batch_scale = self.provider.batch_scale
+        batches = pack_batches_by_tokens(
+            [self.provider.count_tokens(text) for text in texts],
+            max_tokens=max(1, int(self.max_batch_tokens * batch_scale)),
+            max_items=max(1, int((batch_size or self.max_batch_items) * batch_scale))
+        )
+        semaphore = asyncio.Semaphore(max(1, self.max_concurrency))
+        
+        async def run_batch(batch_number: int, positions: List[int]) -> np.ndarray:
+            async with semaphore:
+                return await self._embed_batch_async(batch_number, [texts[i] for i in positions])
         
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
+        results = await asyncio.gather(*[
+            run_batch(batch_number, positions) for batch_number, positions in enumerate(batches, 1)
+        ])
+        
+        embeddings = np.empty((len(texts), results[0].shape[1]), dtype=np.float32)
+        for positions, batch_embeddings in zip(batches, results):
+            embeddings[positions] = batch_embeddings
+        return embeddings
+    
+    async def _embed_batch_async(self, batch_number: int, batch: List[str]) -> np.ndarray:
+        """``_embed_batch`` on the provider's async path."""
+        try:
+            start_time = time.time()
+            embeddings = await self.provider.embed_async(batch)
+            elapsed_ms = (time.time() - start_time) * 1000
             
-            try:
-                response = self.client.embeddings.create(
-                    model=self.model,
-                    input=batch
-                )
-                
-                batch_embeddings = [data.embedding for data in response.data]
-                embeddings.extend(batch_embeddings)
-                
-                logger.info(f"Generated embeddings for batch {i//batch_size + 1}, texts {i+1}-{min(i+batch_size, len(texts))}")
+            with self._stats_lock:
+                self.api_requests += 1
+                self.texts_embedded += len(batch)
+                self.embedding_time_ms += elapsed_ms
             
-            except Exception as e:
-                logger.error(f"Failed to get embeddings for batch {i//batch_size + 1}: {e}")
-                raise Exception(f"Batch embedding generation failed: {e}")
+            logger.info(f"Generated embeddings for batch {batch_number} ({len(batch)} texts) in {elapsed_ms:.0f}ms")
+            return embeddings
         
-        return embeddings
+        except Exception as e:
+            logger.error(f"Failed to get embeddings for batch {batch_number}: {e}")
+            raise Exception(f"Batch embedding generation failed: {e}")
+    
+    def _embed_batch(self, batch_number: int, batch: List[str]) -> np.ndarray:
+        """Send one batch of texts to the embedding provider."""
+        try:
+            start_time = time.time()
+            embeddings = self.provider.embed(batch)
+            elapsed_ms = (time.time() - start_time) * 1000
+            
+            with self._stats_lock:
+                self.api_requests += 1
+                self.texts_embedded += len(batch)
+                self.embedding_time_ms += elapsed_ms
+            
+            logger.info(f"Generated embeddings for batch {batch_number} ({len(batch)} texts) in {elapsed_ms:.0f}ms")
+            return embeddings
+        
+        except Exception as e:
+            logger.error(f"Failed to get embeddings for batch {batch_number}: {e}")
+            raise Exception(f"Batch embedding generation failed: {e}")
     
     def embed_chunks(self, chunks: List[Dict]) -> List[Dict]:
         """Add embeddings to document chunks."""
@@ -62,9 +205,30 @@ class EmbeddingService:
         texts = [chunk["content"] for chunk in chunks]
         embeddings = self.get_embeddings_batch(texts)
         
-        # Add embeddings to chunks
+        # Each chunk holds a row view into the batch matrix
         for chunk, embedding in zip(chunks, embeddings):
             chunk["embedding"] = embedding
         
         logger.info(f"Added embeddings to {len(chunks)} chunks")
-        return chunks
\ No newline at end of file
+        return chunks
+    
+    def get_stats(self) -> Dict:
+        """Get API usage and cache statistics."""
+        stats = {
+            "model": self.model,
+            "dimension": self.dimension,
+            "api_requests": self.api_requests,
+            "texts_embedded": self.texts_embedded,
+            "embedding_time_ms": round(self.embedding_time_ms, 1)
+        }
+        
+        if self.cache is not None:
+            cache_stats = self.cache.get_stats()
+            cache_hits = cache_stats["memory_hits"] + cache_stats["redis_hits"]
+            avg_ms_per_text = self.embedding_time_ms / self.texts_embedded if self.texts_embedded else 0.0
+            stats["cache"] = cache_stats
+            stats["estimated_time_saved_ms"] = round(cache_hits * avg_ms_per_text, 1)
+        
+        stats.update(self.provider.get_stats())
+        
+        return stats
\ No newline at end of file
@@ -0,0 +1,126 @@
+from typing import Dict, List, Optional
+import os
+import re
+import sqlite3
+import threading
+import logging
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+TERM_PATTERN = re.compile(r"\w+")
+MAX_QUERY_TERMS = 64
+
+# Words that appear in nearly every chunk; matching them alone says nothing about relevance
+STOPWORDS = frozenset("""
+    a about an and any are as at be been but by can could did do does for from had has have how i if in
+    into is it its me my no not of on or our should so than that the their them then there these they
+    this those to was we were what when where which who whom why will with would you your
+""".split())
+
+
+class LexicalIndex:
+    """BM25 inverted index over chunk text, kept next to the vector store.
+
+    Backed by an SQLite FTS5 table, so it needs no extra service. Chunks
+    are keyed by their vector ID, which lets lexical hits be fused with
+    dense results and hydrated like any other search result.
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS chunk_rows (
+                id INTEGER PRIMARY KEY,
+                vector_id TEXT NOT NULL UNIQUE,
+                document_id INTEGER NOT NULL,
+                chunk_index INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS chunk_rows_document_id ON chunk_rows (document_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunk_text USING fts5(content, tokenize='unicode61 remove_diacritics 2');
+        """)
+        self._connection.commit()
+
+    def replace_document(self, document_id: int, vector_ids: List[str], chunks: List[Dict]):
+        """Index a document's current chunks, replacing whatever was indexed before."""
+        with self._lock:
+            self._delete_rows("SELECT id FROM chunk_rows WHERE document_id = ?", (document_id,))
+            for vector_id, chunk in zip(vector_ids, chunks):
+                cursor = self._connection.execute(
+                    "INSERT INTO chunk_rows (vector_id, document_id, chunk_index) VALUES (?, ?, ?)",
+                    (vector_id, document_id, chunk["index"])
+                )
+                self._connection.execute(
+                    "INSERT INTO chunk_text (rowid, content) VALUES (?, ?)", (cursor.lastrowid, chunk["content"])
+                )
+            self._connection.commit()
+        logger.info(f"Lexically indexed {len(chunks)} chunks for document {document_id}")
+
+    def delete_document(self, document_id: int):
+        """Remove a document's chunks from the index."""
+        with self._lock:
+            self._delete_rows("SELECT id FROM chunk_rows WHERE document_id = ?", (document_id,))
+            self._connection.commit()
+
+    def _delete_rows(self, select_sql: str, params: tuple):
+        rows = [(row_id,) for (row_id,) in self._connection.execute(select_sql, params).fetchall()]
+        self._connection.executemany("DELETE FROM chunk_text WHERE rowid = ?", rows)
+        self._connection.executemany("DELETE FROM chunk_rows WHERE id = ?", rows)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        document_id: Optional[int] = None,
+        min_score: float = 0.0
+    ) -> List[Dict]:
+        """BM25 search matching any non-stopword query term; results are shaped like vector search results.
+
+        Hits scoring below ``min_score`` are dropped, so a query whose terms
+        are all common across the corpus returns nothing rather than
+        arbitrary chunks.
+        """
+        terms = [
+            term for term in dict.fromkeys(TERM_PATTERN.findall(query.lower())) if term not in STOPWORDS
+        ][:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+
+        match = " OR ".join(f'"{term}"' for term in terms)
+        sql = (
+            "SELECT chunk_rows.vector_id, chunk_rows.document_id, chunk_rows.chunk_index, bm25(chunk_text) AS rank "
+            "FROM chunk_text JOIN chunk_rows ON chunk_rows.id = chunk_text.rowid "
+            "WHERE chunk_text MATCH ?"
+        )
+        params: list = [match]
+        if document_id:
+            sql += " AND chunk_rows.document_id = ?"
+            params.append(document_id)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._connection.execute(sql, params).fetchall()
+
+        # FTS5's bm25() is lower-is-better; flip it so higher means more relevant
+        return [
+            {
+                "id": vector_id,
+                "score": -rank,
+                "document_id": row_document_id,
+                "chunk_index": chunk_index,
+                "content": None,
+                "word_count": None
+            }
+            for vector_id, row_document_id, chunk_index, rank in rows
+            if -rank >= min_score
+        ]
+
+
+def get_lexical_index() -> LexicalIndex:
+    """Build the lexical index configured in settings."""
+    return LexicalIndex(settings.lexical_index_path)
@@ -1,49 +1,48 @@
+import httpx
 import openai
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 import logging
 from app.config import settings
+from app.services.rate_limiter import get_rate_controller
+from app.services.context_packer import ContextPacker, format_context
 
 logger = logging.getLogger(__name__)
 
 
 class LLMService:
-    def __init__(self, model: str = "gpt-4"):
+    def __init__(
+        self,
+        model: str = "gpt-4",
+        async_http_client: Optional[httpx.AsyncClient] = None
+    ):
         self.model = model
-        self.client = openai.OpenAI(api_key=settings.openai_api_key)
+        # Retries are handled by the shared rate controller, not the SDK
+        self.async_client = openai.AsyncOpenAI(
+            api_key=settings.openai_api_key, max_retries=0, http_client=async_http_client
+        )
+        self.rate_controller = get_rate_controller(model)
         self.max_tokens = 1000
         self.temperature = 0.1
+        self.context_packer = (
+            ContextPacker(model=model, max_tokens=settings.context_max_tokens)
+            if settings.context_packing_enabled else None
+        )
     
-    def generate_answer(self, question: str, context_chunks: List[Dict]) -> str:
-        """Generate answer using retrieved context."""
+    async def generate_answer_async(
+        self,
+        question: str,
+        context_chunks: List[Dict],
+        context: Optional[str] = None
+    ) -> str:
+        """Generate answer using retrieved context (``context``: already built by ``build_context``)."""
         try:
-            # Build context from chunks
-            context = self._build_context(context_chunks)
-            
-            # Create prompt
-            prompt = self._create_prompt(question, context)
-            
-            # Generate response
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You are a helpful AI assistant that answers questions based on provided document context. 
-                        
-                        Rules:
-                        1. Only use information from the provided context
-                        2. If the context doesn't contain enough information, say so
-                        3. Be concise but comprehensive
-                        4. Cite specific parts of the context when possible
-                        5. If asked about something not in the context, politely decline"""
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=self.max_tokens,
-                temperature=self.temperature
+            response = await self.rate_controller.call_async(
+                lambda: self.async_client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=self._answer_messages(question, context_chunks, context),
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature
+                )
             )
             
             answer = response.choices[0].message.content
@@ -55,18 +54,74 @@ class LLMService:
             logger.error(f"Failed to generate answer: {e}")
             raise Exception(f"Answer generation failed: {e}")
     
-    def _build_context(self, chunks: List[Dict]) -> str:
-        """Build context string from retrieved chunks."""
-        if not chunks:
-            return "No relevant context found."
+    async def stream_answer_async(
+        self,
+        question: str,
+        context_chunks: List[Dict],
+        context: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Generate answer with the provider's streaming API, yielding text as it arrives."""
+        try:
+            # The request counts as in flight until the stream is finished or closed
+            async with self.rate_controller.stream_async(
+                lambda: self.async_client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=self._answer_messages(question, context_chunks, context),
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature,
+                    stream=True
+                )
+            ) as stream:
+                characters = 0
+                try:
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            characters += len(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                finally:
+                    # Release the connection even if the consumer stops early
+                    await stream.response.aclose()
+            logger.info(f"Streamed answer of {characters} characters")
+            
+        except Exception as e:
+            logger.error(f"Failed to stream answer: {e}")
+            raise Exception(f"Answer generation failed: {e}")
+    
+    def _answer_messages(self, question: str, context_chunks: List[Dict], context: Optional[str] = None) -> List[Dict]:
+        """Chat messages asking for an answer from the retrieved context."""
+        # Build context from chunks
+        if context is None:
+            context, _ = self.build_context(context_chunks)
+        
+        # Create prompt
+        prompt = self._create_prompt(question, context)
         
-        context_parts = []
-        for i, chunk in enumerate(chunks, 1):
-            context_parts.append(f"[Context {i}]")
-            context_parts.append(chunk["content"])
-            context_parts.append("")  # Empty line separator
+        return [
+            {
+                "role": "system",
+                "content": """You are a helpful AI assistant that answers questions based on provided document context. 
+                
+                Rules:
+                1. Only use information from the provided context
+                2. If the context doesn't contain enough information, say so
+                3. Be concise but comprehensive
+                4. Cite specific parts of the context when possible
+                5. If asked about something not in the context, politely decline"""
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+    
+    def build_context(self, chunks: List[Dict]) -> Tuple[str, List[Dict]]:
+        """Context string from retrieved chunks, packed to the token budget when enabled,
+        and the chunks it actually includes (the ones to cite as sources)."""
+        if self.context_packer is None or not chunks:
+            return format_context([chunk["content"] for chunk in chunks]), chunks
         
-        return "\n".join(context_parts)
+        context, included, _ = self.context_packer.pack(chunks)
+        return context, included
     
     def _create_prompt(self, question: str, context: str) -> str:
         """Create the prompt for the LLM."""
@@ -79,27 +134,37 @@ Question: {question}
 
 Answer:"""
     
-    def summarize_document(self, text: str, max_length: int = 200) -> str:
+    async def summarize_document_async(self, text: str, max_length: int = 200) -> str:
         """Generate a summary of document text."""
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"You are a helpful assistant that creates concise summaries. Keep summaries under {max_length} words."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Please provide a concise summary of the following text:\n\n{text}"
-                    }
-                ],
-                max_tokens=max_length * 2,  # Rough estimate for tokens
-                temperature=0.1
+            response = await self.rate_controller.call_async(
+                lambda: self.async_client.chat.completions.with_raw_response.create(
+                    model=self.model,
+                    messages=self._summary_messages(text, max_length),
+                    max_tokens=max_length * 2,  # Rough estimate for tokens
+                    temperature=0.1
+                )
             )
             
             return response.choices[0].message.content
             
         except Exception as e:
             logger.error(f"Failed to generate summary: {e}")
-            return "Summary generation failed."
\ No newline at end of file
+            return "Summary generation failed."
+    
+    @staticmethod
+    def _summary_messages(text: str, max_length: int) -> List[Dict]:
+        return [
+            {
+                "role": "system",
+                "content": f"You are a helpful assistant that creates concise summaries. Keep summaries under {max_length} words."
+            },
+            {
+                "role": "user",
+                "content": f"Please provide a concise summary of the following text:\n\n{text}"
+            }
+        ]
+    
+    def get_stats(self) -> Dict:
+        """Get context packing statistics."""
+        return {"context_packing": self.context_packer.get_stats() if self.context_packer else None}
@@ -0,0 +1,437 @@
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Set, Tuple
+import asyncio
+import fcntl
+import json
+import os
+import threading
+import logging
+
+import numpy as np
+
+from app.config import settings
+from app.services.vector_ids import chunk_point_ids, chunk_payload
+
+logger = logging.getLogger(__name__)
+
+
+class NumpyVectorService:
+    """In-process exact-search vector store with the same interface as ``VectorService``.
+
+    Unit-normalized vectors live in a memory-mapped float32 file
+    (``<collection>.f32``); ids and payloads live in a JSON sidecar
+    (``<collection>.json``). Search is a single matrix-vector product
+    with ``argpartition`` top-k, so it is exact and needs no separate
+    service. Meant for small installs, tests and offline benchmarks.
+
+    Each write rewrites the whole sidecar, so the backend suits a single
+    API process. Writers take an exclusive ``flock`` on
+    ``<collection>.lock`` and reload whatever another process (e.g.
+    ``reindex.py`` next to the server) wrote first, so their changes are
+    never overwritten; readers pick those changes up on their next call.
+    """
+
+    def __init__(
+        self,
+        vector_size: int,
+        collection_name: Optional[str] = None,
+        storage_dir: Optional[str] = None
+    ):
+        self.vector_size = vector_size
+        self.collection_name = collection_name or settings.qdrant_collection_name
+        self.storage_dir = storage_dir or settings.numpy_vector_dir
+        self.vectors_path = os.path.join(self.storage_dir, f"{self.collection_name}.f32")
+        self.payloads_path = os.path.join(self.storage_dir, f"{self.collection_name}.json")
+        self.lock_path = os.path.join(self.storage_dir, f"{self.collection_name}.lock")
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int, int]] = None
+
+        self.ids: List[str] = []
+        self.payloads: List[Dict] = []
+        self.document_ids = np.empty(0, dtype=np.int64)
+        self.vectors = np.empty((0, vector_size), dtype=np.float32)
+
+        self._load()
+
+    def _load(self):
+        """Open the stored collection, or start an empty one."""
+        try:
+            os.makedirs(self.storage_dir, exist_ok=True)
+            with self._exclusive():
+                if self._stamp is None:
+                    open(self.vectors_path, "wb").close()
+                    logger.info(f"Created local vector collection: {self.collection_name}")
+                    return
+            logger.info(f"Loaded local vector collection {self.collection_name} ({len(self.ids)} points)")
+
+        except Exception as e:
+            logger.error(f"Failed to load local vector collection: {e}")
+            raise Exception(f"Vector database initialization failed: {e}")
+
+    def _sidecar_stamp(self) -> Optional[Tuple[int, int, int]]:
+        """Identify the sidecar on disk; ``os.replace`` gives every rewrite a new inode."""
+        try:
+            stat = os.stat(self.payloads_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the thread and cross-process locks over state that matches the files on disk."""
+        with self._lock, open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            stamp = self._sidecar_stamp()
+            if stamp is not None and stamp != self._stamp:
+                self._read_state()
+            yield
+
+    def _refresh(self):
+        """Reload if another process rewrote the sidecar since this one last read or wrote it."""
+        if self._sidecar_stamp() != self._stamp:
+            with self._exclusive():
+                pass
+
+    def _read_state(self):
+        """Read ids and payloads from the sidecar and map the matching vectors. Caller holds both locks."""
+        with open(self.payloads_path) as f:
+            state = json.load(f)
+        if state["vector_size"] != self.vector_size:
+            raise Exception(
+                f"Collection {self.collection_name} stores {state['vector_size']}-d vectors but the "
+                f"embedding provider produces {self.vector_size}-d vectors; "
+                f"set QDRANT_COLLECTION_NAME to use a separate collection"
+            )
+
+        self.ids = state["ids"]
+        self.payloads = state["payloads"]
+        self.document_ids = np.array([payload["document_id"] for payload in self.payloads], dtype=np.int64)
+
+        # Drop rows appended by a store that never reached the sidecar
+        expected_bytes = len(self.ids) * self.vector_size * 4
+        if os.path.getsize(self.vectors_path) > expected_bytes:
+            os.truncate(self.vectors_path, expected_bytes)
+        self._map_vectors()
+        self._stamp = self._sidecar_stamp()
+
+    def _map_vectors(self):
+        """Memory-map the vector file read-only; an empty collection has nothing to map."""
+        if self.ids:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(len(self.ids), self.vector_size))
+        else:
+            self.vectors = np.empty((0, self.vector_size), dtype=np.float32)
+
+    def _save_payloads(self):
+        """Atomically rewrite the JSON sidecar. Caller holds both locks."""
+        temp_path = f"{self.payloads_path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"vector_size": self.vector_size, "ids": self.ids, "payloads": self.payloads}, f)
+        os.replace(temp_path, self.payloads_path)
+        self._stamp = self._sidecar_stamp()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+    def store_chunks(
+        self,
+        document_id: int,
+        chunks: List[Dict],
+        vector_ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Store document chunks in vector database, replacing points with the same IDs."""
+        if not chunks:
+            return []
+
+        vector_ids = vector_ids or chunk_point_ids(document_id, chunks)
+        vectors = self._normalize(
+            np.vstack([chunk["embedding"] for chunk in chunks]).astype(np.float32, copy=False)
+        )
+        payloads = [chunk_payload(document_id, chunk, settings.vector_payload_content) for chunk in chunks]
+
+        try:
+            with self._exclusive():
+                replaced = set(vector_ids)
+                if any(point_id in replaced for point_id in self.ids):
+                    self._keep_rows(np.array([point_id not in replaced for point_id in self.ids], dtype=bool))
+
+                with open(self.vectors_path, "ab") as f:
+                    f.write(vectors.tobytes())
+                self.ids.extend(vector_ids)
+                self.payloads.extend(payloads)
+                self.document_ids = np.concatenate([
+                    self.document_ids, np.full(len(chunks), document_id, dtype=np.int64)
+                ])
+                self._save_payloads()
+                self._map_vectors()
+
+            logger.info(f"Stored {len(vector_ids)} chunks for document {document_id}")
+            return vector_ids
+
+        except Exception as e:
+            logger.error(f"Failed to store chunks: {e}")
+            raise Exception(f"Vector storage failed: {e}")
+
+    def search_similar(
+        self,
+        query_embedding: np.ndarray,
+        limit: int = 5,
+        document_id: Optional[int] = None,
+        score_threshold: float = 0.7,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
+        with_vectors: bool = False,
+        document_ids: Optional[List[int]] = None
+    ) -> List[Dict]:
+        """Search for similar chunks.
+
+        Search is always exact, so ``rescore`` and ``oversampling`` are
+        accepted for interface compatibility and ignored.
+        """
+        return self.search_similar_batch(
+            np.asarray(query_embedding, dtype=np.float32)[None, :], [limit], [document_id], [score_threshold],
+            with_vectors=with_vectors, document_id_sets=[document_ids]
+        )[0]
+
+    def search_similar_batch(
+        self,
+        query_embeddings: np.ndarray,
+        limits: List[int],
+        document_ids: List[Optional[int]],
+        score_thresholds: List[float],
+        with_vectors: bool = False,
+        document_id_sets: Optional[List[Optional[List[int]]]] = None
+    ) -> List[List[Dict]]:
+        """Score unfiltered query rows with one matrix product, then take per-query top-k.
+
+        Queries filtered to a document (or any of ``document_id_sets``)
+        only score that document's rows.
+        """
+        try:
+            self._refresh()
+            with self._lock:
+                vectors, payloads, ids, point_document_ids = self.vectors, self.payloads, self.ids, self.document_ids
+
+            queries = self._normalize(np.asarray(query_embeddings, dtype=np.float32))
+            document_id_sets = document_id_sets or [None] * len(queries)
+            unfiltered = np.array([not document_id and not id_set for document_id, id_set in zip(document_ids, document_id_sets)])
+            unfiltered_scores = iter(queries[unfiltered] @ vectors.T) if unfiltered.any() else iter(())
+
+            batch_results = []
+            for query, is_unfiltered, limit, document_id, id_set, score_threshold in zip(
+                queries, unfiltered, limits, document_ids, document_id_sets, score_thresholds
+            ):
+                if is_unfiltered:
+                    rows = np.arange(len(ids))
+                    scores = next(unfiltered_scores)
+                else:
+                    rows = self._filter_rows(point_document_ids, document_id, id_set)
+                    scores = vectors[rows] @ query
+
+                if len(scores) > limit:
+                    top = np.argpartition(-scores, limit)[:limit]
+                else:
+                    top = np.arange(len(scores))
+                top = top[np.argsort(-scores[top])]
+
+                results = []
+                for position in top:
+                    score = float(scores[position])
+                    if score < score_threshold:
+                        break
+                    row = rows[position]
+                    results.append(self._format_result(ids, payloads, vectors, row, score, with_vectors))
+                batch_results.append(results)
+
+            logger.info(f"Found {sum(len(results) for results in batch_results)} similar chunks")
+            return batch_results
+
+        except Exception as e:
+            logger.error(f"Failed to search vectors: {e}")
+            raise Exception(f"Vector search failed: {e}")
+
+    def search_grouped(
+        self,
+        query_embedding: np.ndarray,
+        limit: int = 5,
+        group_size: int = 1,
+        document_id: Optional[int] = None,
+        score_threshold: float = 0.7,
+        with_vectors: bool = False,
+        document_ids: Optional[List[int]] = None
+    ) -> List[Dict]:
+        """Search with at most ``group_size`` hits per document, over ``limit`` documents."""
+        try:
+            self._refresh()
+            with self._lock:
+                vectors, payloads, ids, point_document_ids = self.vectors, self.payloads, self.ids, self.document_ids
+
+            query = self._normalize(np.asarray(query_embedding, dtype=np.float32))
+            rows = self._filter_rows(point_document_ids, document_id, document_ids)
+            scores = vectors[rows] @ query
+            order = np.argsort(-scores)
+
+            results = []
+            per_document: Dict[int, int] = {}
+            for position in order:
+                score = float(scores[position])
+                if score < score_threshold:
+                    break
+                row = rows[position]
+                row_document_id = int(point_document_ids[row])
+                if row_document_id not in per_document and len(per_document) >= limit:
+                    continue
+                if per_document.get(row_document_id, 0) >= group_size:
+                    continue
+                per_document[row_document_id] = per_document.get(row_document_id, 0) + 1
+                results.append(self._format_result(ids, payloads, vectors, row, score, with_vectors))
+
+            logger.info(f"Found {len(results)} similar chunks in {len(per_document)} documents")
+            return results
+
+        except Exception as e:
+            logger.error(f"Failed to search vector groups: {e}")
+            raise Exception(f"Vector search failed: {e}")
+
+    async def search_similar_async(self, query_embedding: np.ndarray, **kwargs) -> List[Dict]:
+        """``search_similar`` on a worker thread, keeping the event loop free."""
+        return await asyncio.to_thread(self.search_similar, query_embedding, **kwargs)
+
+    async def search_similar_batch_async(self, query_embeddings: np.ndarray, *args, **kwargs) -> List[List[Dict]]:
+        """``search_similar_batch`` on a worker thread, keeping the event loop free."""
+        return await asyncio.to_thread(self.search_similar_batch, query_embeddings, *args, **kwargs)
+
+    async def search_grouped_async(self, query_embedding: np.ndarray, **kwargs) -> List[Dict]:
+        """``search_grouped`` on a worker thread, keeping the event loop free."""
+        return await asyncio.to_thread(self.search_grouped, query_embedding, **kwargs)
+
+    @staticmethod
+    def _filter_rows(
+        point_document_ids: np.ndarray,
+        document_id: Optional[int],
+        document_ids: Optional[List[int]] = None
+    ) -> np.ndarray:
+        """Rows matching a document and/or any of a set of documents."""
+        mask = np.ones(len(point_document_ids), dtype=bool)
+        if document_id:
+            mask &= point_document_ids == document_id
+        if document_ids:
+            mask &= np.isin(point_document_ids, document_ids)
+        return np.flatnonzero(mask)
+
+    def get_vectors(self, vector_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Fetch stored (normalized) embeddings by point ID."""
+        self._refresh()
+        with self._lock:
+            wanted = set(vector_ids)
+            return {
+                point_id: np.array(self.vectors[row])
+                for row, point_id in enumerate(self.ids) if point_id in wanted
+            }
+
+    async def get_vectors_async(self, vector_ids: List[str]) -> Dict[str, np.ndarray]:
+        """``get_vectors`` on a worker thread, keeping the event loop free."""
+        return await asyncio.to_thread(self.get_vectors, vector_ids)
+
+    @staticmethod
+    def _format_result(ids, payloads, vectors, row: int, score: float, with_vectors: bool) -> Dict:
+        result = {"id": ids[row], "score": score, "content": None, **payloads[row]}
+        if with_vectors:
+            result["vector"] = np.array(vectors[row])
+        return result
+
+    def _keep_rows(self, keep_mask: np.ndarray):
+        """Drop rows not in ``keep_mask``, compacting the vector file. Caller holds both locks."""
+        keep = np.flatnonzero(keep_mask)
+        temp_path = f"{self.vectors_path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(np.ascontiguousarray(self.vectors[keep]).tobytes())
+        self.vectors = np.empty((0, self.vector_size), dtype=np.float32)  # release the old mapping
+        os.replace(temp_path, self.vectors_path)
+
+        self.ids = [self.ids[row] for row in keep]
+        self.payloads = [self.payloads[row] for row in keep]
+        self.document_ids = self.document_ids[keep]
+        self._save_payloads()
+        self._map_vectors()
+
+    def get_document_point_ids(self, document_id: int) -> Dict[str, int]:
+        """Map each stored point ID of a document to its chunk index."""
+        self._refresh()
+        with self._lock:
+            return {
+                self.ids[row]: self.payloads[row]["chunk_index"]
+                for row in np.flatnonzero(self.document_ids == document_id)
+            }
+
+    def get_document_ids(self) -> Set[int]:
+        """IDs of every document with at least one stored point."""
+        self._refresh()
+        with self._lock:
+            return set(self.document_ids.tolist())
+
+    def update_chunk_indexes(self, chunk_indexes: Dict[str, int]):
+        """Set new chunk indexes on existing points."""
+        if not chunk_indexes:
+            return
+
+        try:
+            with self._exclusive():
+                # Copy-on-write so concurrent searches keep a consistent snapshot
+                self.payloads = [
+                    {**payload, "chunk_index": chunk_indexes[point_id]} if point_id in chunk_indexes else payload
+                    for point_id, payload in zip(self.ids, self.payloads)
+                ]
+                self._save_payloads()
+
+        except Exception as e:
+            logger.error(f"Failed to update chunk indexes: {e}")
+            raise Exception(f"Vector update failed: {e}")
+
+    def delete_points(self, vector_ids: List[str]):
+        """Delete points by ID."""
+        if not vector_ids:
+            return
+
+        try:
+            with self._exclusive():
+                removed = set(vector_ids)
+                self._keep_rows(np.array([point_id not in removed for point_id in self.ids], dtype=bool))
+            logger.info(f"Deleted {len(vector_ids)} points")
+
+        except Exception as e:
+            logger.error(f"Failed to delete points: {e}")
+            raise Exception(f"Vector deletion failed: {e}")
+
+    def delete_document_chunks(self, document_id: int):
+        """Delete all chunks for a document, compacting the vector file."""
+        try:
+            with self._exclusive():
+                keep_mask = self.document_ids != document_id
+                if keep_mask.all():
+                    return
+                self._keep_rows(keep_mask)
+
+            logger.info(f"Deleted chunks for document {document_id}")
+
+        except Exception as e:
+            logger.error(f"Failed to delete document chunks: {e}")
+            raise Exception(f"Vector deletion failed: {e}")
+
+    def close(self):
+        """Nothing to release; kept for interface compatibility."""
+
+    async def aclose(self):
+        """Nothing to release; kept for interface compatibility."""
+
+    def get_collection_stats(self) -> Dict:
+        """Get collection statistics."""
+        self._refresh()
+        return {
+            "backend": "numpy",
+            "total_points": len(self.ids),
+            "vector_size": self.vector_size,
+            "distance": "Cosine",
+            "storage_bytes": len(self.ids) * self.vector_size * 4
+        }
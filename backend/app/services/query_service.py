@@ -1,23 +1,77 @@
-from sqlalchemy.orm import Session
-from typing import List, Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+import asyncio
 import time
 import logging
+import numpy as np
 
+from app.config import settings
 from app.services.embedding_service import EmbeddingService
-from app.services.vector_service import VectorService
+from app.services.embedding_cache import get_query_embedding_cache
+from app.services.answer_cache import SemanticAnswerCache, get_answer_cache
+from app.services.retrieval_cache import RetrievalCache, get_retrieval_cache
+from app.services.document_metadata import (
+    DocumentMetadataCache, get_document_metadata_cache, load_document_metadata
+)
+from app.services.embedding_batcher import QueryEmbeddingBatcher
+from app.services.vector_service import get_vector_service
+from app.services.chunk_store import ChunkStore, get_chunk_store
+from app.services.lexical_index import LexicalIndex, get_lexical_index
+from app.services.document_router import DocumentRouter, get_document_router
+from app.services.document_service import completed_document_ids
+from app.services.reranking import reciprocal_rank_fusion, maximal_marginal_relevance, cap_per_document
 from app.services.llm_service import LLMService
-from app.services.response_formatter import ResponseFormatter
+from app.services.response_formatter import ResponseFormatter, StreamingAnswerFormatter
 from app.models.document import Document
 
 logger = logging.getLogger(__name__)
 
 
 class QueryService:
-    def __init__(self):
-        self.embedding_service = EmbeddingService()
-        self.vector_service = VectorService()
-        self.llm_service = LLMService()
+    def __init__(
+        self,
+        embedding_service: Optional[EmbeddingService] = None,
+        vector_service=None,
+        llm_service: Optional[LLMService] = None,
+        chunk_store: Optional[ChunkStore] = None,
+        lexical_index: Optional[LexicalIndex] = None,
+        document_router: Optional[DocumentRouter] = None,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        retrieval_cache: Optional[RetrievalCache] = None,
+        metadata_cache: Optional[DocumentMetadataCache] = None
+    ):
+        self.embedding_service = embedding_service or EmbeddingService()
+        self.vector_service = vector_service or get_vector_service(self.embedding_service.dimension)
+        self.llm_service = llm_service or LLMService()
+        self.chunk_store = chunk_store or get_chunk_store()
+        self.lexical_index = lexical_index
+        if self.lexical_index is None and settings.hybrid_search_enabled:
+            self.lexical_index = get_lexical_index()
+        self.document_router = document_router
+        if self.document_router is None and settings.document_routing_enabled:
+            self.document_router = get_document_router(self.embedding_service.dimension)
+        # (monotonic time of the last check, whether every completed document had a centroid)
+        self._routing_coverage: Tuple[float, bool] = (float("-inf"), False)
         self.response_formatter = ResponseFormatter()
+        self.query_embedding_cache = (
+            get_query_embedding_cache() if settings.query_embedding_cache_enabled else None
+        )
+        self.answer_cache = answer_cache
+        if self.answer_cache is None and settings.answer_cache_enabled:
+            self.answer_cache = get_answer_cache()
+        self.retrieval_cache = retrieval_cache
+        if self.retrieval_cache is None and settings.retrieval_cache_enabled:
+            self.retrieval_cache = get_retrieval_cache()
+        self.metadata_cache = metadata_cache
+        if self.metadata_cache is None and settings.document_metadata_cache_enabled:
+            self.metadata_cache = get_document_metadata_cache()
+        self.embedding_batcher = None
+        if settings.query_embedding_batching_enabled:
+            self.embedding_batcher = QueryEmbeddingBatcher(
+                self.embedding_service,
+                max_wait_ms=settings.query_embedding_batch_window_ms,
+                max_batch_size=settings.query_embedding_batch_max_size
+            )
     
     async def process_query(
         self,
@@ -25,7 +79,7 @@ class QueryService:
         document_id: Optional[int] = None,
         max_results: int = 5,
         score_threshold: float = 0.7,
-        db: Session = None
+        db: AsyncSession = None
     ) -> Dict:
         """Process a query through the complete pipeline."""
         start_time = time.time()
@@ -34,32 +88,35 @@ class QueryService:
             logger.info(f"Processing query: '{question}' for document_id: {document_id}")
             
             # Step 1: Generate query embedding
-            query_embedding = self.embedding_service.get_embedding(question)
+            query_embedding = await self._get_query_embedding(question)
             
-            # Step 2: Retrieve similar chunks
-            similar_chunks = self.vector_service.search_similar(
-                query_embedding=query_embedding,
-                limit=max_results,
-                document_id=document_id,
-                score_threshold=score_threshold
+            answer_scope = SemanticAnswerCache.make_scope(document_id, max_results, score_threshold)
+            answer_version, cached_response = await self._get_cached_answer(
+                question, query_embedding, answer_scope, start_time
             )
+            if cached_response is not None:
+                return cached_response
             
-            if not similar_chunks:
-                return self._create_no_results_response(question, start_time)
+            # Step 2-3: Retrieve similar chunks and enrich them with document metadata
+            enriched_chunks = await self._retrieve(
+                question, query_embedding, document_id, max_results, score_threshold, db
+            )
             
-            # Step 3: Enrich chunks with document metadata
-            enriched_chunks = self._enrich_chunks_with_metadata(similar_chunks, db)
+            if not enriched_chunks:
+                return self._create_no_results_response(question, start_time)
             
-            # Step 4: Generate answer
-            answer = self.llm_service.generate_answer(question, enriched_chunks)
+            # Step 4: Generate answer; sources are the chunks that fit in the context
+            context, context_chunks = self.llm_service.build_context(enriched_chunks)
+            answer = await self.llm_service.generate_answer_async(question, context_chunks, context=context)
             
             # Step 5: Format response
             response = self.response_formatter.format_response(
                 question=question,
                 answer=answer,
-                chunks=enriched_chunks,
+                chunks=context_chunks,
                 processing_time_ms=int((time.time() - start_time) * 1000)
             )
+            await self._cache_answer(query_embedding, answer_scope, response, answer_version)
             
             logger.info(f"Query processed successfully in {response['processing_time_ms']}ms")
             return response
@@ -68,34 +125,564 @@ class QueryService:
             logger.error(f"Query processing failed: {e}")
             raise Exception(f"Query processing failed: {e}")
     
-    def _enrich_chunks_with_metadata(self, chunks: List[Dict], db: Session) -> List[Dict]:
-        """Add document metadata to chunks."""
-        if not db:
-            return chunks
+    async def stream_query(
+        self,
+        question: str,
+        document_id: Optional[int] = None,
+        max_results: int = 5,
+        score_threshold: float = 0.7,
+        db: AsyncSession = None
+    ) -> AsyncIterator[Dict]:
+        """Process a query, yielding events as each stage finishes.
         
-        enriched_chunks = []
-        document_cache = {}
+        A ``sources`` event is sent as soon as retrieval is done, then
+        ``token`` events with answer text as the provider streams it
+        (cleaned incrementally), then ``done`` with the same response
+        ``process_query`` would return. Failures yield an ``error`` event.
+        """
+        start_time = time.time()
         
-        for chunk in chunks:
-            doc_id = chunk["document_id"]
+        try:
+            logger.info(f"Streaming query: '{question}' for document_id: {document_id}")
+            query_embedding = await self._get_query_embedding(question)
             
-            # Get document info (with caching)
-            if doc_id not in document_cache:
-                document = db.query(Document).filter(Document.id == doc_id).first()
-                document_cache[doc_id] = document
+            answer_scope = SemanticAnswerCache.make_scope(document_id, max_results, score_threshold)
+            answer_version, response = await self._get_cached_answer(question, query_embedding, answer_scope, start_time)
+            if response is None:
+                enriched_chunks = await self._retrieve(
+                    question, query_embedding, document_id, max_results, score_threshold, db
+                )
+                if not enriched_chunks:
+                    response = self._create_no_results_response(question, start_time)
             
-            document = document_cache[doc_id]
+            if response is not None:
+                yield {"event": "sources", "data": {"question": question, "sources": response["sources"]}}
+                yield {"event": "token", "data": {"text": response["answer"]}}
+                yield {"event": "done", "data": response}
+                return
             
-            enriched_chunk = {
-                **chunk,
-                "document_filename": document.original_filename if document else "Unknown",
-                "document_type": document.file_type if document else "Unknown"
+            context, context_chunks = self.llm_service.build_context(enriched_chunks)
+            yield {
+                "event": "sources",
+                "data": {"question": question, "sources": self.response_formatter.format_sources(context_chunks)}
             }
             
-            enriched_chunks.append(enriched_chunk)
+            formatter = StreamingAnswerFormatter()
+            pieces = []
+            answer_stream = self.llm_service.stream_answer_async(question, context_chunks, context=context)
+            try:
+                async for delta in answer_stream:
+                    pieces.append(delta)
+                    text = formatter.feed(delta)
+                    if text:
+                        yield {"event": "token", "data": {"text": text}}
+            finally:
+                await answer_stream.aclose()
+            
+            text = formatter.finish()
+            if text:
+                yield {"event": "token", "data": {"text": text}}
+            
+            response = self.response_formatter.format_response(
+                question=question,
+                answer="".join(pieces),
+                chunks=context_chunks,
+                processing_time_ms=int((time.time() - start_time) * 1000)
+            )
+            await self._cache_answer(query_embedding, answer_scope, response, answer_version)
+            
+            logger.info(f"Query streamed successfully in {response['processing_time_ms']}ms")
+            yield {"event": "done", "data": response}
+            
+        except Exception as e:
+            logger.error(f"Streaming query failed: {e}")
+            yield {"event": "error", "data": {"detail": f"Query processing failed: {e}"}}
+    
+    async def process_query_batch(self, queries: List[Dict], db: AsyncSession = None) -> AsyncIterator[Dict]:
+        """Answer many queries, yielding each result as soon as it is ready.
+        
+        All questions are embedded in one batched call and searched in one
+        vector-database round-trip; LLM calls then run concurrently on the
+        event loop, at most
+        ``query_batch_llm_concurrency`` at a time. Questions answered from
+        the semantic answer cache skip retrieval and generation; those in
+        the retrieval cache skip the search. Each result
+        carries the ``index`` of its query; a failed query yields an
+        ``error`` instead of failing the batch.
+        """
+        start_time = time.time()
+        questions = [query["question"] for query in queries]
+        logger.info(f"Processing batch of {len(questions)} queries")
+        
+        try:
+            query_embeddings = await self._get_query_embeddings(questions)
+            scopes = [
+                SemanticAnswerCache.make_scope(
+                    query.get("document_id"), query.get("max_results", 5), query.get("score_threshold", 0.7)
+                )
+                for query in queries
+            ]
+            cached_answers = await asyncio.gather(*[
+                self._get_cached_answer(question, embedding, scope, start_time)
+                for question, embedding, scope in zip(questions, query_embeddings, scopes)
+            ])
+            answer_versions = [version for version, _ in cached_answers]
+            cached_responses = [response for _, response in cached_answers]
+            
+            batch_chunks: List[List[Dict]] = [[] for _ in queries]
+            retrieval_entries: Dict[int, Tuple[Optional[str], Optional[int]]] = {}
+            unanswered = [index for index, response in enumerate(cached_responses) if response is None]
+            lookups = await asyncio.gather(*[
+                self._lookup_retrieval(
+                    queries[index]["question"], query_embeddings[index], queries[index].get("document_id"),
+                    queries[index].get("max_results", 5), queries[index].get("score_threshold", 0.7), db
+                )
+                for index in unanswered
+            ])
+            for index, (cache_key, version, cached_chunks) in zip(unanswered, lookups):
+                if cached_chunks is not None:
+                    batch_chunks[index] = cached_chunks
+                else:
+                    retrieval_entries[index] = (cache_key, version)
+            
+            to_search = list(retrieval_entries)
+            if to_search:
+                search_queries = [queries[index] for index in to_search]
+                search_embeddings = query_embeddings[to_search]
+                search_results = await self.vector_service.search_similar_batch_async(
+                    search_embeddings,
+                    limits=[self._candidate_limit(query.get("max_results", 5)) for query in search_queries],
+                    document_ids=[query.get("document_id") for query in search_queries],
+                    score_thresholds=[query.get("score_threshold", 0.7) for query in search_queries],
+                    with_vectors=settings.mmr_enabled,
+                    document_id_sets=await self._route_batch(
+                        search_embeddings, [query.get("document_id") for query in search_queries], db
+                    )
+                )
+                for index, query, embedding, chunks in zip(to_search, search_queries, search_embeddings, search_results):
+                    batch_chunks[index] = await self._select_chunks(
+                        query["question"], embedding, chunks, query.get("max_results", 5),
+                        query.get("document_id"), query.get("score_threshold", 0.7)
+                    )
+                await asyncio.to_thread(
+                    self._hydrate_content, [chunk for index in to_search for chunk in batch_chunks[index]]
+                )
+                # One metadata lookup for the whole batch, then split back per query
+                enriched = iter(await self._enrich_chunks_with_metadata(
+                    [chunk for index in to_search for chunk in batch_chunks[index]], db
+                ))
+                for index in to_search:
+                    batch_chunks[index] = [next(enriched) for _ in batch_chunks[index]]
+                    await self._store_retrieval(*retrieval_entries[index], batch_chunks[index])
+        except Exception as e:
+            logger.error(f"Batch retrieval failed: {e}")
+            for index, question in enumerate(questions):
+                yield {"index": index, "question": question, "error": f"Query processing failed: {e}"}
+            return
+        
+        semaphore = asyncio.Semaphore(settings.query_batch_llm_concurrency)
         
+        async def answer(index: int, question: str, enriched_chunks: List[Dict]) -> Dict:
+            try:
+                if cached_responses[index] is not None:
+                    return {"index": index, **cached_responses[index]}
+                if not enriched_chunks:
+                    return {"index": index, **self._create_no_results_response(question, start_time)}
+                
+                context, context_chunks = self.llm_service.build_context(enriched_chunks)
+                async with semaphore:
+                    answer_text = await self.llm_service.generate_answer_async(
+                        question, context_chunks, context=context
+                    )
+                
+                response = self.response_formatter.format_response(
+                    question=question,
+                    answer=answer_text,
+                    chunks=context_chunks,
+                    processing_time_ms=int((time.time() - start_time) * 1000)
+                )
+                await self._cache_answer(query_embeddings[index], scopes[index], response, answer_versions[index])
+                return {"index": index, **response}
+            except Exception as e:
+                logger.error(f"Query {index} in batch failed: {e}")
+                return {"index": index, "question": question, "error": f"Query processing failed: {e}"}
+        
+        tasks = [
+            asyncio.ensure_future(answer(index, question, enriched_chunks))
+            for index, (question, enriched_chunks) in enumerate(zip(questions, batch_chunks))
+        ]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            for task in tasks:
+                task.cancel()
+        
+        logger.info(f"Batch of {len(questions)} queries processed in {int((time.time() - start_time) * 1000)}ms")
+    
+    async def _retrieve(
+        self,
+        question: str,
+        query_embedding: np.ndarray,
+        document_id: Optional[int],
+        max_results: int,
+        score_threshold: float,
+        db: AsyncSession
+    ) -> List[Dict]:
+        """Search, select, hydrate and enrich chunks, reusing cached results when possible.
+        
+        Searches go through the async vector client; chunk store lookups
+        are synchronous and run on a worker thread.
+        """
+        cache_key, version, enriched_chunks = await self._lookup_retrieval(
+            question, query_embedding, document_id, max_results, score_threshold, db
+        )
+        if enriched_chunks is not None:
+            return enriched_chunks
+        
+        candidates = await self._search_candidates(query_embedding, max_results, document_id, score_threshold, db)
+        similar_chunks = await self._select_chunks(
+            question, query_embedding, candidates, max_results, document_id, score_threshold
+        )
+        await asyncio.to_thread(self._hydrate_content, similar_chunks)
+        enriched_chunks = await self._enrich_chunks_with_metadata(similar_chunks, db)
+        await self._store_retrieval(cache_key, version, enriched_chunks)
         return enriched_chunks
     
+    async def _lookup_retrieval(
+        self,
+        question: str,
+        query_embedding: np.ndarray,
+        document_id: Optional[int],
+        max_results: int,
+        score_threshold: float,
+        db: AsyncSession
+    ) -> Tuple[Optional[str], Optional[int], Optional[List[Dict]]]:
+        """Check the retrieval cache: (key, version to stamp a new entry with, cached chunks).
+        
+        Only lookups with a database session are cached, since entries hold
+        enriched chunks. The version is read before searching, so a document
+        change during the search leaves the new entry already stale.
+        """
+        if self.retrieval_cache is None or db is None:
+            return None, None, None
+        
+        # Lexical hits depend on the question text, not just its embedding
+        cache_key = self.retrieval_cache.make_key(
+            query_embedding, document_id, max_results, score_threshold,
+            question=question if self.lexical_index is not None else None
+        )
+        version, cached_chunks = await self._call_cache(
+            self.retrieval_cache, self.retrieval_cache.lookup, cache_key, document_id
+        )
+        if cached_chunks is not None:
+            return cache_key, None, cached_chunks
+        return cache_key, version, None
+    
+    async def _store_retrieval(self, cache_key: Optional[str], version: Optional[int], enriched_chunks: List[Dict]):
+        if cache_key is not None and version is not None:
+            await self._call_cache(self.retrieval_cache, self.retrieval_cache.put, cache_key, enriched_chunks, version)
+    
+    @staticmethod
+    async def _call_cache(cache, method, *args):
+        """Call a cache method, on a worker thread when it may make a (blocking) Redis round-trip."""
+        if cache.use_redis:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+    
+    async def _get_cached_answer(
+        self,
+        question: str,
+        query_embedding: np.ndarray,
+        scope: str,
+        start_time: float
+    ) -> Tuple[Optional[int], Optional[Dict]]:
+        """(answer cache version, a cached response to a near-identical question re-labelled for this one)."""
+        if self.answer_cache is None:
+            return None, None
+        
+        version, response = await self._call_cache(self.answer_cache, self.answer_cache.lookup, query_embedding, scope)
+        if response is None:
+            return version, None
+        
+        logger.info(f"Answered '{question}' from the semantic answer cache")
+        return version, {
+            **response,
+            "question": question,
+            "processing_time_ms": int((time.time() - start_time) * 1000),
+            "cached": True
+        }
+    
+    async def _cache_answer(self, query_embedding: np.ndarray, scope: str, response: Dict, version: Optional[int]):
+        """Remember a response, stamped with the versions of the documents it was answered from."""
+        if self.answer_cache is None or version is None or not response["sources"]:
+            return
+        
+        await self._call_cache(
+            self.answer_cache, self.answer_cache.put,
+            query_embedding, scope, response, {source["document_id"] for source in response["sources"]}, version
+        )
+    
+    async def _get_query_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Embed many questions in one batched call, reusing cached vectors."""
+        model = self.embedding_service.model
+        embeddings = np.empty((len(texts), self.embedding_service.dimension), dtype=np.float32)
+        
+        cached = (
+            await self._call_cache(self.query_embedding_cache, self.query_embedding_cache.get_many, model, texts)
+            if self.query_embedding_cache is not None else [None] * len(texts)
+        )
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        for i, embedding in enumerate(cached):
+            if embedding is not None:
+                embeddings[i] = embedding
+        
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            new_embeddings = await self.embedding_service.get_embeddings_batch_async(missing_texts)
+            embeddings[missing] = new_embeddings
+            if self.query_embedding_cache is not None:
+                await self._call_cache(
+                    self.query_embedding_cache, self.query_embedding_cache.set_many,
+                    model, missing_texts, list(new_embeddings)
+                )
+        
+        return embeddings
+    
+    async def _get_query_embedding(self, text: str) -> np.ndarray:
+        """Get a query embedding, reusing cached vectors for repeated questions."""
+        model = self.embedding_service.model
+        
+        if self.query_embedding_cache is not None:
+            cached = (await self._call_cache(
+                self.query_embedding_cache, self.query_embedding_cache.get_many, model, [text]
+            ))[0]
+            if cached is not None:
+                return cached
+        
+        if self.embedding_batcher is not None:
+            embedding = await self.embedding_batcher.embed(text)
+        else:
+            embedding = await self.embedding_service.get_embedding_async(text)
+        
+        if self.query_embedding_cache is not None:
+            await self._call_cache(self.query_embedding_cache, self.query_embedding_cache.set_many, model, [text], [embedding])
+        return embedding
+    
+    def _candidate_limit(self, max_results: int) -> int:
+        """Results to fetch per retriever: extra candidates when they will be fused or re-ranked."""
+        limit = max_results
+        if self.lexical_index is not None:
+            limit = max(limit, settings.hybrid_candidates)
+        if settings.mmr_enabled or settings.max_chunks_per_document:
+            limit = max(limit, settings.rerank_candidates)
+        return limit
+    
+    async def _search_candidates(
+        self,
+        query_embedding: np.ndarray,
+        max_results: int,
+        document_id: Optional[int],
+        score_threshold: float,
+        db: AsyncSession = None
+    ) -> List[Dict]:
+        """Dense candidates, grouped by document in the vector store when a cap is set.
+        
+        With document routing on, corpus-wide queries only search chunks of
+        the documents whose centroids are closest to the query.
+        """
+        routed_ids = None
+        if not document_id and await self._routing_ready(db):
+            routed_ids = await self.document_router.route_async(query_embedding, settings.routing_documents) or None
+        
+        if settings.max_chunks_per_document and not document_id:
+            return await self.vector_service.search_grouped_async(
+                query_embedding=query_embedding,
+                limit=self._candidate_limit(max_results),
+                group_size=settings.max_chunks_per_document,
+                score_threshold=score_threshold,
+                with_vectors=settings.mmr_enabled,
+                document_ids=routed_ids
+            )
+        
+        return await self.vector_service.search_similar_async(
+            query_embedding=query_embedding,
+            limit=self._candidate_limit(max_results),
+            document_id=document_id,
+            score_threshold=score_threshold,
+            with_vectors=settings.mmr_enabled,
+            document_ids=routed_ids
+        )
+    
+    async def _route_batch(
+        self,
+        query_embeddings: np.ndarray,
+        document_ids: List[Optional[int]],
+        db: AsyncSession = None
+    ) -> Optional[List[Optional[List[int]]]]:
+        """Candidate documents per batch query (``None``: search everything)."""
+        if not await self._routing_ready(db):
+            return None
+        
+        routes = await self.document_router.route_batch_async(query_embeddings, settings.routing_documents)
+        return [None if document_id else (routed_ids or None) for routed_ids, document_id in zip(routes, document_ids)]
+    
+    async def _routing_ready(self, db: AsyncSession) -> bool:
+        """Whether routing is on and every completed document has a centroid.
+        
+        Routing restricts the search to documents with centroids, so while
+        some are missing (e.g. documents processed before routing was
+        enabled and not yet backfilled) queries fall back to flat search.
+        Coverage is re-checked at most every ``routing_coverage_check_seconds``.
+        """
+        if self.document_router is None or db is None:
+            return False
+        
+        checked_at, ready = self._routing_coverage
+        if time.monotonic() - checked_at < settings.routing_coverage_check_seconds:
+            return ready
+        
+        try:
+            completed = await completed_document_ids(db)
+            centroids = await asyncio.to_thread(self.document_router.get_document_ids)
+            missing = completed - centroids
+            ready = not missing
+            if not ready:
+                logger.warning(
+                    f"Document routing skipped: {len(missing)} of {len(completed)} completed documents "
+                    f"have no centroid (run reindex.py --centroids)"
+                )
+        except Exception as e:
+            logger.warning(f"Document routing coverage check failed: {e}")
+            ready = False
+        
+        self._routing_coverage = (time.monotonic(), ready)
+        return ready
+    
+    async def _select_chunks(
+        self,
+        question: str,
+        query_embedding: np.ndarray,
+        candidates: List[Dict],
+        max_results: int,
+        document_id: Optional[int] = None,
+        score_threshold: float = 0.0
+    ) -> List[Dict]:
+        """Fuse, cap and diversify candidates down to ``max_results`` chunks."""
+        chunks = await self._fuse_lexical(
+            question, candidates, self._candidate_limit(max_results), document_id, score_threshold
+        )
+        
+        if settings.max_chunks_per_document:
+            chunks = cap_per_document(chunks, settings.max_chunks_per_document)
+        if settings.mmr_enabled:
+            chunks = await self._diversify(chunks, max_results)
+        
+        chunks = chunks[:max_results]
+        await self._score_lexical_hits(query_embedding, chunks)
+        for chunk in chunks:
+            chunk.pop("vector", None)
+        return chunks
+    
+    async def _fuse_lexical(
+        self,
+        question: str,
+        dense_chunks: List[Dict],
+        limit: int,
+        document_id: Optional[int] = None,
+        score_threshold: float = 0.0
+    ) -> List[Dict]:
+        """Merge BM25 hits into dense results by reciprocal rank (no-op unless hybrid search is on).
+        
+        Lexical hits are only fused in when some dense candidate passes the
+        score threshold, so a question unrelated to the corpus still gets
+        the no-results answer instead of chunks sharing a word with it.
+        """
+        if self.lexical_index is None:
+            return dense_chunks
+        
+        dense_chunks = [chunk for chunk in dense_chunks if chunk["score"] >= score_threshold]
+        if not dense_chunks:
+            return []
+        
+        lexical_chunks = await asyncio.to_thread(
+            self.lexical_index.search, question, settings.hybrid_candidates, document_id, settings.lexical_min_score
+        )
+        return reciprocal_rank_fusion([dense_chunks, lexical_chunks], k=settings.rrf_k, limit=limit)
+    
+    async def _score_lexical_hits(self, query_embedding: np.ndarray, chunks: List[Dict]):
+        """Give chunks only BM25 found their cosine similarity to the question as ``score``.
+        
+        Keeps ``score`` meaning the same thing with and without hybrid search;
+        the fused ranking value is in ``fused_score``.
+        """
+        unscored = [chunk for chunk in chunks if chunk.get("score") is None]
+        if not unscored:
+            return
+        
+        missing = [str(chunk["id"]) for chunk in unscored if chunk.get("vector") is None]
+        fetched = await self.vector_service.get_vectors_async(missing) if missing else {}
+        query_norm = float(np.linalg.norm(query_embedding))
+        for chunk in unscored:
+            vector = chunk.get("vector")
+            if vector is None:
+                vector = fetched.get(str(chunk["id"]))
+            norm = float(np.linalg.norm(vector)) * query_norm if vector is not None else 0.0
+            chunk["score"] = float(np.dot(vector, query_embedding)) / norm if norm > 0 else 0.0
+    
+    async def _diversify(self, chunks: List[Dict], max_results: int) -> List[Dict]:
+        """Re-order candidates by MMR so near-duplicate passages don't crowd the context."""
+        if len(chunks) <= 1:
+            return chunks
+        
+        # Lexical-only hits come without vectors; fetch those in one call
+        missing = [str(chunk["id"]) for chunk in chunks if chunk.get("vector") is None]
+        fetched = await self.vector_service.get_vectors_async(missing) if missing else {}
+        for chunk in chunks:
+            if chunk.get("vector") is None and str(chunk["id"]) in fetched:
+                chunk["vector"] = fetched[str(chunk["id"])]
+        zeros = np.zeros(self.embedding_service.dimension, dtype=np.float32)
+        embeddings = np.vstack([
+            chunk["vector"] if chunk.get("vector") is not None else zeros for chunk in chunks
+        ])
+        
+        # Relevance from the incoming ranking score (fused when hybrid, else cosine), scaled to [0, 1]
+        scores = np.array([chunk.get("fused_score", chunk["score"]) for chunk in chunks], dtype=np.float32)
+        relevance = scores / scores.max() if scores.max() > 0 else scores
+        
+        order = maximal_marginal_relevance(relevance, embeddings, settings.mmr_lambda, max_results)
+        return [chunks[i] for i in order]
+    
+    def _hydrate_content(self, chunks: List[Dict]):
+        """Fill in text for results from lean payloads with one chunk store lookup."""
+        missing = [chunk for chunk in chunks if chunk.get("content") is None]
+        if not missing:
+            return
+        
+        contents = self.chunk_store.get_many([str(chunk["id"]) for chunk in missing])
+        for chunk in missing:
+            chunk["content"] = contents.get(str(chunk["id"]), "")
+    
+    async def _enrich_chunks_with_metadata(self, chunks: List[Dict], db: AsyncSession) -> List[Dict]:
+        """Add document metadata to chunks, loading all uncached documents in one query."""
+        if not db:
+            return chunks
+        
+        document_ids = [chunk["document_id"] for chunk in chunks]
+        if self.metadata_cache is not None:
+            metadata = await self.metadata_cache.get_many(document_ids, db)
+        else:
+            metadata = await load_document_metadata(document_ids, db)
+        
+        return [
+            {
+                **chunk,
+                "document_filename": metadata.get(chunk["document_id"], {}).get("filename", "Unknown"),
+                "document_type": metadata.get(chunk["document_id"], {}).get("file_type", "Unknown")
+            }
+            for chunk in chunks
+        ]
+    
     def _create_no_results_response(self, question: str, start_time: float) -> Dict:
         """Create response when no relevant documents are found."""
         return {
@@ -105,21 +692,22 @@ class QueryService:
             "processing_time_ms": int((time.time() - start_time) * 1000)
         }
     
-    async def get_document_summary(self, document_id: int, db: Session) -> Dict:
+    async def get_document_summary(self, document_id: int, db: AsyncSession) -> Dict:
         """Get AI-generated summary of a document."""
         try:
             # Get document
-            document = db.query(Document).filter(Document.id == document_id).first()
+            document = await db.get(Document, document_id)
             if not document:
                 raise Exception("Document not found")
             
             # Get some chunks for summary
-            chunks = self.vector_service.search_similar(
-                query_embedding=self.embedding_service.get_embedding("summary overview"),
+            chunks = await self.vector_service.search_similar_async(
+                query_embedding=await self._get_query_embedding("summary overview"),
                 document_id=document_id,
                 limit=3,
                 score_threshold=0.0  # Get any chunks
             )
+            await asyncio.to_thread(self._hydrate_content, chunks)
             
             if not chunks:
                 return {"summary": "No content available for summary"}
@@ -128,7 +716,7 @@ class QueryService:
             combined_text = "\n\n".join([chunk["content"] for chunk in chunks])
             
             # Generate summary
-            summary = self.llm_service.summarize_document(combined_text)
+            summary = await self.llm_service.summarize_document_async(combined_text)
             
             return {
                 "document_id": document_id,
@@ -139,4 +727,19 @@ class QueryService:
             
         except Exception as e:
             logger.error(f"Failed to generate document summary: {e}")
-            raise Exception(f"Summary generation failed: {e}")
\ No newline at end of file
+            raise Exception(f"Summary generation failed: {e}")
+    
+    def get_stats(self) -> Dict:
+        """Get query pipeline cache and batching statistics."""
+        return {
+            "query_embedding_cache": (
+                self.query_embedding_cache.get_stats() if self.query_embedding_cache else None
+            ),
+            "query_embedding_batcher": (
+                self.embedding_batcher.get_stats() if self.embedding_batcher else None
+            ),
+            "answer_cache": self.answer_cache.get_stats() if self.answer_cache else None,
+            "retrieval_cache": self.retrieval_cache.get_stats() if self.retrieval_cache else None,
+            "document_metadata_cache": self.metadata_cache.get_stats() if self.metadata_cache else None,
+            **self.llm_service.get_stats()
+        }
\ No newline at end of file
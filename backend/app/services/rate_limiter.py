@@ -0,0 +1,335 @@
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional
+import asyncio
+import random
+import re
+import threading
+import time
+import logging
+
+import openai
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_controllers: Dict[str, "AdaptiveRateController"] = {}
+_controllers_lock = threading.Lock()
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+)
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI reset headers such as "1s", "6m0s" or "20ms" into seconds."""
+    if not value:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    matches = _DURATION_PATTERN.findall(value)
+    if not matches:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in matches)
+
+
+class AdaptiveRateController:
+    """Client-side AIMD controller for provider calls.
+
+    Concurrency and batch size grow additively while requests succeed and
+    are cut multiplicatively on 429/5xx responses. Rate-limit headers pause
+    new requests until the provider's window resets, and failed calls are
+    retried with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_retries: int = 6,
+        base_backoff_seconds: float = 0.5,
+        max_backoff_seconds: float = 30.0,
+        min_batch_scale: float = 1 / 64
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.min_batch_scale = min_batch_scale
+
+        self.concurrency_limit = float(max_concurrency)
+        self.batch_scale = 1.0
+        self.in_flight = 0
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+        # Coroutines waiting for a slot, oldest first: (their event loop, future resolved with the slot)
+        self._async_waiters: deque = deque()
+        self._async_wake_at = 0.0
+
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failures = 0
+
+    @contextmanager
+    def slot(self):
+        """Hold one in-flight request slot, waiting for capacity or a pause to end."""
+        with self._condition:
+            while True:
+                wait_seconds = self._paused_until - time.monotonic()
+                if wait_seconds <= 0 and self._has_capacity():
+                    break
+                self._condition.wait(timeout=wait_seconds if wait_seconds > 0 else None)
+            self.in_flight += 1
+
+        try:
+            yield
+        finally:
+            self._release_slot()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        """``slot`` for coroutines: waits without blocking the event loop.
+
+        Waiting coroutines queue in arrival order and are handed slots as
+        they are released or the limit grows, so nothing polls.
+        """
+        loop = asyncio.get_running_loop()
+        with self._condition:
+            if not self._async_waiters and self._paused_until <= time.monotonic() and self._has_capacity():
+                self.in_flight += 1
+                future = None
+            else:
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+                self._grant_async_slots()
+
+        if future is not None:
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._condition:
+                    try:
+                        self._async_waiters.remove((loop, future))
+                    except ValueError:
+                        # Granted a slot just as it was cancelled: pass the slot on
+                        self.in_flight -= 1
+                        self._grant_async_slots()
+                        self._condition.notify_all()
+                raise
+
+        try:
+            yield
+        finally:
+            self._release_slot()
+
+    def _release_slot(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._grant_async_slots()
+            self._condition.notify_all()
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < max(int(self.concurrency_limit), self.min_concurrency)
+
+    def _grant_async_slots(self):
+        """Hand free slots to queued coroutines, oldest first (caller holds the lock).
+
+        During a pause, a timer on the oldest waiter's loop grants them once
+        it ends.
+        """
+        wait_seconds = self._paused_until - time.monotonic()
+        if wait_seconds > 0:
+            if self._async_waiters and self._async_wake_at != self._paused_until:
+                self._async_wake_at = self._paused_until
+                loop = self._async_waiters[0][0]
+                loop.call_soon_threadsafe(loop.call_later, wait_seconds, self._wake_async_waiters)
+            return
+
+        while self._async_waiters and self._has_capacity():
+            loop, future = self._async_waiters.popleft()
+            self.in_flight += 1
+            loop.call_soon_threadsafe(_resolve, future)
+
+    def _wake_async_waiters(self):
+        with self._condition:
+            self._async_wake_at = 0.0
+            self._grant_async_slots()
+
+    def call(self, request: Callable[[], Any]) -> Any:
+        """Run a raw-response provider call with adaptive limits and retries.
+
+        ``request`` must return an ``openai`` raw response; the parsed
+        body is returned.
+        """
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+
+            with self.slot():
+                try:
+                    raw_response = request()
+                    self.on_success(raw_response.headers)
+                    return raw_response.parse()
+
+                except RETRYABLE_ERRORS as e:
+                    retry_after = self._on_retryable_error(e, attempt)
+                    if attempt >= self.max_retries:
+                        raise
+
+            self.retries += 1
+            time.sleep(self._backoff(attempt, retry_after))
+
+    async def call_async(self, request: Callable[[], Awaitable[Any]]) -> Any:
+        """``call`` for async clients: ``request`` returns an awaitable raw response."""
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+
+            async with self.async_slot():
+                try:
+                    raw_response = await request()
+                    self.on_success(raw_response.headers)
+                    return raw_response.parse()
+
+                except RETRYABLE_ERRORS as e:
+                    retry_after = self._on_retryable_error(e, attempt)
+                    if attempt >= self.max_retries:
+                        raise
+
+            self.retries += 1
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    @asynccontextmanager
+    async def stream_async(self, request: Callable[[], Awaitable[Any]]):
+        """``call_async`` for streaming responses: the parsed stream is yielded
+        and its slot stays in flight until the block exits."""
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+
+            async with self.async_slot():
+                try:
+                    raw_response = await request()
+                    self.on_success(raw_response.headers)
+                except RETRYABLE_ERRORS as e:
+                    retry_after = self._on_retryable_error(e, attempt)
+                    if attempt >= self.max_retries:
+                        raise
+                else:
+                    yield raw_response.parse()
+                    return
+
+            self.retries += 1
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    def _on_retryable_error(self, error: Exception, attempt: int) -> Optional[float]:
+        """Throttle after a failed call; returns the server's Retry-After, if any."""
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        retry_after = self._retry_after(headers)
+        self.on_throttle(retry_after, rate_limited=isinstance(error, openai.RateLimitError))
+
+        if attempt >= self.max_retries:
+            self.failures += 1
+        else:
+            logger.warning(
+                f"{self.name}: provider call failed ({error.__class__.__name__}), "
+                f"retry {attempt + 1}/{self.max_retries}"
+            )
+        return retry_after
+
+    def on_success(self, headers: Mapping[str, str]):
+        """Additive increase, unless the headers say the window is nearly spent."""
+        with self._condition:
+            self.requests += 1
+            self.concurrency_limit = min(
+                float(self.max_concurrency),
+                self.concurrency_limit + 1.0 / max(self.concurrency_limit, 1.0)
+            )
+            self.batch_scale = min(1.0, self.batch_scale + 1 / 16)
+
+            pause_seconds = self._exhausted_window_reset(headers)
+            if pause_seconds:
+                self._paused_until = max(self._paused_until, time.monotonic() + pause_seconds)
+                logger.info(f"{self.name}: rate limit window exhausted, pausing {pause_seconds:.2f}s")
+
+            self._grant_async_slots()
+            self._condition.notify_all()
+
+    def on_throttle(self, retry_after: Optional[float] = None, rate_limited: bool = True):
+        """Multiplicative decrease after a 429, 5xx or connection failure."""
+        with self._condition:
+            self.throttled += 1
+            self.concurrency_limit = max(float(self.min_concurrency), self.concurrency_limit / 2)
+            if rate_limited:
+                self.batch_scale = max(self.min_batch_scale, self.batch_scale / 2)
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+        cap = min(self.max_backoff_seconds, self.base_backoff_seconds * (2 ** attempt))
+        return max(retry_after or 0.0, random.uniform(0, cap))
+
+    @staticmethod
+    def _retry_after(headers: Mapping[str, str]) -> Optional[float]:
+        if headers.get("retry-after-ms"):
+            try:
+                return float(headers["retry-after-ms"]) / 1000
+            except ValueError:
+                pass
+        return parse_reset_duration(headers.get("retry-after"))
+
+    @staticmethod
+    def _exhausted_window_reset(headers: Mapping[str, str]) -> Optional[float]:
+        """Seconds until reset if the request or token budget is used up."""
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                if int(remaining) <= 0:
+                    return parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            except ValueError:
+                continue
+        return None
+
+    def get_stats(self) -> Dict:
+        """Get controller state and counters."""
+        return {
+            "concurrency_limit": round(self.concurrency_limit, 2),
+            "batch_scale": round(self.batch_scale, 3),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "failures": self.failures
+        }
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+def get_rate_controller(name: str, max_concurrency: Optional[int] = None) -> AdaptiveRateController:
+    """Get the process-wide controller for a provider model."""
+    if name not in _controllers:
+        with _controllers_lock:
+            if name not in _controllers:
+                _controllers[name] = AdaptiveRateController(
+                    name=name,
+                    max_concurrency=max_concurrency or settings.openai_max_concurrency,
+                    max_retries=settings.openai_max_retries
+                )
+    return _controllers[name]
@@ -0,0 +1,85 @@
+from typing import Dict, List
+
+import numpy as np
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Dict]], k: int = 60, limit: int = 5) -> List[Dict]:
+    """Merge ranked result lists by reciprocal rank, keyed by result ``id``.
+
+    Each result scores ``sum(1 / (k + rank))`` over the lists it appears
+    in, stored as ``fused_score`` and normalized so a result ranked first
+    in every list scores 1.0. ``score`` keeps the result's score from the
+    first list (``None`` if only later lists found it), and each list's
+    score is kept in the ``fused_scores`` list (a list rather than a dict
+    keyed by list number, so it survives a JSON round-trip unchanged).
+    """
+    fused: Dict[str, Dict] = {}
+    totals: Dict[str, float] = {}
+
+    for list_number, results in enumerate(result_lists):
+        for rank, result in enumerate(results, start=1):
+            key = str(result["id"])
+            if key not in fused:
+                fused[key] = {**result, "fused_scores": [None] * len(result_lists)}
+            elif fused[key].get("content") is None and result.get("content") is not None:
+                fused[key]["content"] = result["content"]
+            if fused[key].get("vector") is None and result.get("vector") is not None:
+                fused[key]["vector"] = result["vector"]
+            fused[key]["fused_scores"][list_number] = result["score"]
+            totals[key] = totals.get(key, 0.0) + 1.0 / (k + rank)
+
+    best_possible = len(result_lists) / (k + 1)
+    ranked = sorted(fused, key=lambda key: totals[key], reverse=True)[:limit]
+    return [
+        {**fused[key], "score": fused[key]["fused_scores"][0], "fused_score": totals[key] / best_possible}
+        for key in ranked
+    ]
+
+
+def maximal_marginal_relevance(
+    relevance: np.ndarray,
+    embeddings: np.ndarray,
+    lambda_mult: float = 0.5,
+    limit: int = 5
+) -> List[int]:
+    """Greedy MMR selection; returns candidate positions in pick order.
+
+    Each step picks ``argmax(lambda * relevance - (1 - lambda) * redundancy)``
+    where redundancy is the highest cosine similarity to anything already
+    picked. Pairwise similarities come from one matrix product and the
+    redundancy vector is updated in place, so selection is O(n * limit).
+    """
+    count = len(relevance)
+    if count == 0:
+        return []
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    unit = np.divide(embeddings, norms, out=np.zeros_like(embeddings, dtype=np.float32), where=norms > 0)
+    similarity = unit @ unit.T
+
+    redundancy = np.zeros(count, dtype=np.float32)
+    available = np.ones(count, dtype=bool)
+    selected: List[int] = []
+
+    for _ in range(min(limit, count)):
+        marginal = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        marginal[~available] = -np.inf
+        pick = int(np.argmax(marginal))
+
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(redundancy, similarity[pick], out=redundancy)
+
+    return selected
+
+
+def cap_per_document(chunks: List[Dict], max_per_document: int) -> List[Dict]:
+    """Keep at most ``max_per_document`` chunks from each document, preserving order."""
+    counts: Dict[int, int] = {}
+    capped = []
+    for chunk in chunks:
+        count = counts.get(chunk["document_id"], 0)
+        if count < max_per_document:
+            counts[chunk["document_id"]] = count + 1
+            capped.append(chunk)
+    return capped
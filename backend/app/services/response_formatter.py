@@ -4,6 +4,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+WHITESPACE_PATTERN = re.compile(r'(\s+)')
+EMPTY_ANSWER = "I couldn't generate an answer based on the available information."
+
 
 class ResponseFormatter:
     def __init__(self):
@@ -19,7 +22,7 @@ class ResponseFormatter:
         """Format the complete query response."""
         try:
             # Format sources
-            sources = self._format_sources(chunks)
+            sources = self.format_sources(chunks)
             
             # Clean and format answer
             formatted_answer = self._format_answer(answer)
@@ -40,7 +43,7 @@ class ResponseFormatter:
                 "processing_time_ms": processing_time_ms
             }
     
-    def _format_sources(self, chunks: List[Dict]) -> List[Dict]:
+    def format_sources(self, chunks: List[Dict]) -> List[Dict]:
         """Format source information from chunks."""
         sources = []
         
@@ -69,7 +72,7 @@ class ResponseFormatter:
     def _format_answer(self, answer: str) -> str:
         """Clean and format the LLM answer."""
         if not answer:
-            return "I couldn't generate an answer based on the available information."
+            return EMPTY_ANSWER
         
         # Remove extra whitespace
         answer = re.sub(r'\s+', ' ', answer.strip())
@@ -102,4 +105,45 @@ class ResponseFormatter:
             }
             formatted_history.append(formatted_entry)
         
-        return formatted_history
\ No newline at end of file
+        return formatted_history
+
+
+class StreamingAnswerFormatter:
+    """Applies ``ResponseFormatter._format_answer`` cleanup to an answer arriving in pieces.
+
+    Whitespace runs are collapsed across piece boundaries and trailing
+    whitespace is held back until more text follows, so the concatenated
+    output equals formatting the full answer at once.
+    """
+    
+    def __init__(self):
+        self._received = False
+        self._started = False
+        self._pending_space = False
+        self._last_text = ""
+    
+    def feed(self, delta: str) -> str:
+        """Cleaned text to emit for the next piece of the answer (may be empty)."""
+        self._received = self._received or bool(delta)
+        output = []
+        for piece in WHITESPACE_PATTERN.split(delta):
+            if not piece:
+                continue
+            if piece.isspace():
+                self._pending_space = self._started
+                continue
+            if self._pending_space:
+                output.append(" ")
+                self._pending_space = False
+            output.append(piece)
+            self._started = True
+            self._last_text = piece
+        return "".join(output)
+    
+    def finish(self) -> str:
+        """Text to emit once the answer is complete."""
+        if not self._received:
+            return EMPTY_ANSWER
+        if self._started and not self._last_text.endswith(('.', '!', '?')):
+            return '.'
+        return ""
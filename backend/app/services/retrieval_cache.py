@@ -0,0 +1,151 @@
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import threading
+import logging
+
+import numpy as np
+
+from app.config import settings
+from app.core.cache import LRUCache, get_redis_client
+from app.services.document_versions import DocumentVersions
+
+logger = logging.getLogger(__name__)
+
+_retrieval_cache: Optional["RetrievalCache"] = None
+_retrieval_cache_lock = threading.Lock()
+
+
+class RetrievalCache:
+    """Two-level cache of enriched retrieval results: in-process LRU in front of Redis.
+
+    Entries are keyed by (query embedding hash, document filter, limit,
+    score threshold) and stamped with a version counter: the document's
+    own counter for document-scoped queries, a global one for corpus-wide
+    queries (any document change can alter those). Every document change
+    bumps both counters (see ``DocumentVersions``), so a stale entry is
+    never served; while the counters can't be read, lookups bypass the cache.
+    """
+
+    def __init__(
+        self,
+        namespace: str = "ret",
+        max_entries: int = 2000,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[int] = None,
+        use_redis: bool = True
+    ):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self.memory = LRUCache(max_entries=max_entries, max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+        self.versions = DocumentVersions(namespace, use_redis)
+        self.memory_hits = 0
+        self.redis_hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def make_key(
+        self,
+        query_embedding: np.ndarray,
+        document_id: Optional[int],
+        limit: int,
+        score_threshold: float,
+        question: Optional[str] = None
+    ) -> str:
+        """Cache key for a retrieval; ``question`` is included when results also depend on the text."""
+        digest = hashlib.sha256(np.asarray(query_embedding, dtype=np.float32).tobytes())
+        if question is not None:
+            digest.update(" ".join(question.lower().split()).encode("utf-8"))
+        return f"{self.namespace}:{document_id or '*'}:{limit}:{score_threshold}:{digest.hexdigest()}"
+
+    def current_version(self, document_id: Optional[int]) -> Optional[int]:
+        """The counter entries for this document filter are stamped with (None: don't cache)."""
+        return self.versions.current(document_id)
+
+    def bump_document(self, document_id: int):
+        """Invalidate cached results for a document and all corpus-wide results."""
+        if not self.versions.bump(document_id):
+            logger.warning(f"Retrieval cache bypassed until document {document_id}'s version bump reaches Redis")
+
+    def get(self, key: str, document_id: Optional[int]) -> Optional[List[Dict]]:
+        """Cached chunks for a key, or None if missing, stale or the version can't be checked."""
+        return self.lookup(key, document_id)[1]
+
+    def lookup(self, key: str, document_id: Optional[int]) -> Tuple[Optional[int], Optional[List[Dict]]]:
+        """(current version to stamp a new entry with, cached chunks or None)."""
+        version = self.current_version(document_id)
+        if version is None:
+            self.bypassed += 1
+            return None, None
+
+        packed = self.memory.get(key)
+        from_redis = False
+
+        redis_client = get_redis_client() if self.use_redis and packed is None else None
+        if redis_client is not None:
+            try:
+                packed = redis_client.get(key)
+                from_redis = packed is not None
+            except Exception as e:
+                logger.warning(f"Redis retrieval cache lookup failed: {e}")
+
+        if packed is None:
+            self.misses += 1
+            return version, None
+
+        entry = json.loads(packed)
+        if entry["version"] != version:
+            self.memory.delete(key)
+            self.stale += 1
+            return version, None
+
+        if from_redis:
+            self.memory.set(key, packed, size=len(packed))
+            self.redis_hits += 1
+        else:
+            self.memory_hits += 1
+        return version, entry["chunks"]
+
+    def put(self, key: str, chunks: List[Dict], version: int):
+        """Store chunks stamped with the version read before they were retrieved."""
+        packed = json.dumps({"version": version, "chunks": chunks}, default=float).encode("utf-8")
+        self.memory.set(key, packed, size=len(packed))
+
+        redis_client = get_redis_client() if self.use_redis else None
+        if redis_client is not None:
+            try:
+                redis_client.set(key, packed, ex=self.ttl_seconds)
+            except Exception as e:
+                logger.warning(f"Redis retrieval cache write failed: {e}")
+
+    def get_stats(self) -> Dict:
+        """Get cache hit/miss statistics."""
+        lookups = self.memory_hits + self.redis_hits + self.stale + self.misses + self.bypassed
+        return {
+            "memory_hits": self.memory_hits,
+            "redis_hits": self.redis_hits,
+            "stale": self.stale,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round((self.memory_hits + self.redis_hits) / lookups, 4) if lookups else 0.0,
+            "memory": self.memory.get_stats()
+        }
+
+
+def get_retrieval_cache() -> RetrievalCache:
+    """Get the process-wide retrieval result cache."""
+    global _retrieval_cache
+
+    if _retrieval_cache is None:
+        with _retrieval_cache_lock:
+            if _retrieval_cache is None:
+                _retrieval_cache = RetrievalCache(
+                    max_entries=settings.retrieval_cache_max_entries,
+                    max_bytes=settings.retrieval_cache_max_bytes,
+                    ttl_seconds=settings.retrieval_cache_ttl_seconds,
+                    use_redis=settings.retrieval_cache_use_redis
+                )
+
+    return _retrieval_cache
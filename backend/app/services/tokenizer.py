@@ -0,0 +1,78 @@
+from typing import Dict, List, Optional, Sequence
+import threading
+import logging
+
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio for English text, used when the
+# tokenizer files can't be loaded (e.g. air-gapped installs)
+FALLBACK_CHARS_PER_TOKEN = 4
+
+_encodings: Dict[str, Optional[tiktoken.Encoding]] = {}
+_encodings_lock = threading.Lock()
+
+
+def get_encoding(model: str) -> Optional[tiktoken.Encoding]:
+    """Get the tiktoken encoding for a model, or None if it can't be loaded."""
+    if model in _encodings:
+        return _encodings[model]
+
+    with _encodings_lock:
+        if model not in _encodings:
+            try:
+                try:
+                    encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                logger.warning(f"Tokenizer for {model} unavailable, estimating token counts: {e}")
+                encoding = None
+            _encodings[model] = encoding
+
+    return _encodings[model]
+
+
+def count_tokens(text: str, model: str) -> int:
+    """Count the tokens a text costs for the given model."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return max(1, -(-len(text) // FALLBACK_CHARS_PER_TOKEN))
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    """The longest prefix of a text that fits in ``max_tokens`` for the given model."""
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * FALLBACK_CHARS_PER_TOKEN]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def pack_batches_by_tokens(
+    token_counts: Sequence[int],
+    max_tokens: int,
+    max_items: int
+) -> List[List[int]]:
+    """Group item positions into consecutive batches under a token and item budget.
+
+    An item larger than the token budget on its own gets a batch to itself.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    current_tokens = 0
+
+    for i, tokens in enumerate(token_counts):
+        if current and (current_tokens + tokens > max_tokens or len(current) >= max_items):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+
+        current.append(i)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+
+    return batches
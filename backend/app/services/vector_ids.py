@@ -0,0 +1,41 @@
+from collections import defaultdict
+from typing import Dict, List
+import hashlib
+import uuid
+
+# Fixed namespace so the same chunk always maps to the same point ID
+CHUNK_ID_NAMESPACE = uuid.UUID("7c1f2b9e-3d4a-5e6f-8a9b-0c1d2e3f4a5b")
+
+
+def chunk_point_ids(document_id: int, chunks: List[Dict]) -> List[str]:
+    """Deterministic point IDs from (document_id, content hash, occurrence).
+
+    Identical chunk text within one document is told apart by its
+    occurrence number, so reprocessing unchanged text yields the same IDs
+    and only new or edited chunks get new ones.
+    """
+    seen: Dict[str, int] = defaultdict(int)
+    point_ids = []
+    for chunk in chunks:
+        content_hash = hashlib.sha256(chunk["content"].encode("utf-8")).hexdigest()
+        occurrence = seen[content_hash]
+        seen[content_hash] += 1
+        point_ids.append(str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{document_id}:{content_hash}:{occurrence}")))
+    return point_ids
+
+
+def chunk_payload(document_id: int, chunk: Dict, include_content: bool = True) -> Dict:
+    """Point payload for a chunk; lean payloads leave the text to the chunk store."""
+    payload = {
+        "document_id": document_id,
+        "chunk_index": chunk["index"],
+        "word_count": chunk["word_count"]
+    }
+    if include_content:
+        payload["content"] = chunk["content"]
+    return payload
+
+
+def document_point_id(document_id: int) -> str:
+    """Deterministic point ID for a document's centroid vector."""
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{document_id}:centroid"))
@@ -1,22 +1,67 @@
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from qdrant_client.models import Filter, FieldCondition, Range, MatchValue
-from typing import List, Dict, Optional
-import uuid
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import Distance, VectorParams, Batch
+from qdrant_client.models import Filter, FieldCondition, Range, MatchValue, MatchAny
+from qdrant_client.models import (
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig, Disabled,
+    SearchParams, QuantizationSearchParams,
+    HnswConfigDiff, PayloadSchemaType,
+    PointIdsList, PayloadSelectorInclude, SetPayload, SetPayloadOperation,
+    SearchRequest
+)
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Set
+import numpy as np
+import time
 import logging
 from app.config import settings
+from app.core.http import get_http_limits
+from app.services.numpy_vector_service import NumpyVectorService
+from app.services.vector_ids import chunk_point_ids, chunk_payload
 
 logger = logging.getLogger(__name__)
 
+# Payload fields used in filters; each gets a Qdrant payload index.
+# Add tenant/user fields here when filtering on them is introduced.
+PAYLOAD_INDEXES = {
+    "document_id": PayloadSchemaType.INTEGER,
+}
+
 
 class VectorService:
-    def __init__(self):
+    def __init__(
+        self,
+        vector_size: int,
+        collection_name: Optional[str] = None,
+        quantization: Optional[str] = None
+    ):
         self.client = QdrantClient(
             url=settings.qdrant_url,
-            api_key=settings.qdrant_api_key
+            api_key=settings.qdrant_api_key,
+            limits=get_http_limits()  # Keep-alive pool (the client disables it for localhost by default)
+        )
+        # Searches from the query path use this one so they never block the event loop
+        self.async_client = AsyncQdrantClient(
+            url=settings.qdrant_url,
+            api_key=settings.qdrant_api_key,
+            limits=get_http_limits()
         )
-        self.collection_name = "documents"
-        self.vector_size = 1536  # OpenAI ada-002 embedding size
+        self.collection_name = collection_name or settings.qdrant_collection_name
+        self.vector_size = vector_size  # Taken from the embedding provider
+        self.quantization = quantization or settings.qdrant_quantization
+        self.on_disk_vectors = settings.qdrant_on_disk_vectors
+        self.search_rescore = settings.qdrant_search_rescore
+        self.search_oversampling = settings.qdrant_search_oversampling
+        self.upsert_batch_size = settings.qdrant_upsert_batch_size
+        self.upsert_parallelism = settings.qdrant_upsert_parallelism
+        self.upsert_wait = settings.qdrant_upsert_wait
+        self.hnsw_ef = settings.qdrant_hnsw_ef
+        self.payload_content = settings.vector_payload_content
+        # Fetch only the fields results use; lean payloads get content from the chunk store
+        self.payload_selector = PayloadSelectorInclude(
+            include=["document_id", "chunk_index", "word_count"] + (["content"] if self.payload_content else [])
+        )
+        self.last_upload_stats: Dict = {}
         
         # Initialize collection
         self._ensure_collection()
@@ -32,92 +77,243 @@ class VectorService:
                     collection_name=self.collection_name,
                     vectors_config=VectorParams(
                         size=self.vector_size,
-                        distance=Distance.COSINE
-                    )
+                        distance=Distance.COSINE,
+                        on_disk=self.on_disk_vectors
+                    ),
+                    hnsw_config=self._hnsw_config(),
+                    quantization_config=self._quantization_config()
                 )
-                logger.info(f"Created collection: {self.collection_name}")
+                logger.info(f"Created collection: {self.collection_name} (quantization: {self.quantization})")
+                self._ensure_payload_indexes({})
             else:
+                info = self.client.get_collection(self.collection_name)
+                existing_size = info.config.params.vectors.size
+                if existing_size != self.vector_size:
+                    raise Exception(
+                        f"Collection {self.collection_name} stores {existing_size}-d vectors but the "
+                        f"embedding provider produces {self.vector_size}-d vectors; "
+                        f"set QDRANT_COLLECTION_NAME to use a separate collection"
+                    )
                 logger.info(f"Collection {self.collection_name} already exists")
+                self._migrate_quantization(info.config.quantization_config)
+                self._migrate_hnsw(info.config.hnsw_config)
+                self._ensure_payload_indexes(info.payload_schema or {})
                 
         except Exception as e:
             logger.error(f"Failed to ensure collection: {e}")
             raise Exception(f"Vector database initialization failed: {e}")
     
-    def store_chunks(self, document_id: int, chunks: List[Dict]) -> List[str]:
-        """Store document chunks in vector database."""
-        if not chunks:
-            return []
+    def _quantization_config(self):
+        """Build the quantization config selected in settings."""
+        if self.quantization == "scalar":
+            return ScalarQuantization(
+                scalar=ScalarQuantizationConfig(
+                    type=ScalarType.INT8,
+                    quantile=0.99,
+                    always_ram=settings.qdrant_quantization_always_ram
+                )
+            )
+        if self.quantization == "binary":
+            return BinaryQuantization(
+                binary=BinaryQuantizationConfig(always_ram=settings.qdrant_quantization_always_ram)
+            )
+        if self.quantization == "none":
+            return None
+        raise Exception(f"Unknown quantization mode: {self.quantization}")
+    
+    def _migrate_quantization(self, current_config):
+        """Bring an existing collection's quantization in line with settings."""
+        desired_config = self._quantization_config()
+        if current_config == desired_config:
+            return
         
-        points = []
-        vector_ids = []
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            quantization_config=desired_config or Disabled.DISABLED
+        )
+        logger.info(f"Updated quantization of {self.collection_name} to {self.quantization}")
+    
+    def _hnsw_config(self) -> HnswConfigDiff:
+        """HNSW build parameters selected in settings."""
+        return HnswConfigDiff(m=settings.qdrant_hnsw_m, ef_construct=settings.qdrant_hnsw_ef_construct)
+    
+    def _migrate_hnsw(self, current_config):
+        """Apply changed HNSW parameters; Qdrant rebuilds the index in the background."""
+        desired_config = self._hnsw_config()
+        if current_config.m == desired_config.m and current_config.ef_construct == desired_config.ef_construct:
+            return
         
-        for chunk in chunks:
-            vector_id = str(uuid.uuid4())
-            vector_ids.append(vector_id)
-            
-            point = PointStruct(
-                id=vector_id,
-                vector=chunk["embedding"],
-                payload={
-                    "document_id": document_id,
-                    "chunk_index": chunk["index"],
-                    "content": chunk["content"],
-                    "word_count": chunk["word_count"]
-                }
+        self.client.update_collection(collection_name=self.collection_name, hnsw_config=desired_config)
+        logger.info(
+            f"Updated HNSW of {self.collection_name} to m={desired_config.m}, "
+            f"ef_construct={desired_config.ef_construct}"
+        )
+    
+    def _ensure_payload_indexes(self, payload_schema: Dict):
+        """Create missing payload indexes and recreate ones with the wrong type."""
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            existing = payload_schema.get(field_name)
+            if existing is not None and existing.data_type == field_schema:
+                continue
+            
+            if existing is not None:
+                self.client.delete_payload_index(self.collection_name, field_name)
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name=field_name,
+                field_schema=field_schema
+            )
+            logger.info(f"Created {field_schema.value} payload index on {self.collection_name}.{field_name}")
+    
+    def _search_params(
+        self,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None
+    ) -> Optional[SearchParams]:
+        """Search-time HNSW and quantization options; None when Qdrant defaults apply."""
+        quantization = None
+        if self.quantization != "none":
+            quantization = QuantizationSearchParams(
+                ignore=False,
+                rescore=self.search_rescore if rescore is None else rescore,
+                oversampling=self.search_oversampling if oversampling is None else oversampling
             )
-            points.append(point)
+        
+        if quantization is None and self.hnsw_ef is None:
+            return None
+        return SearchParams(hnsw_ef=self.hnsw_ef, quantization=quantization)
+    
+    def store_chunks(
+        self,
+        document_id: int,
+        chunks: List[Dict],
+        vector_ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Store document chunks in vector database.
+        
+        Point IDs are deterministic (see ``chunk_point_ids``), so storing
+        the same chunk again overwrites its point instead of duplicating it.
+        Chunks are sent in fixed-size batches, up to ``upsert_parallelism``
+        at a time, building each request only when it is sent. The last
+        batch is sent with ``wait=True`` after all others are acknowledged,
+        so once this returns every point is indexed and searchable.
+        """
+        if not chunks:
+            return []
+        
+        vector_ids = vector_ids or chunk_point_ids(document_id, chunks)
+        batches = [
+            (start, start + self.upsert_batch_size)
+            for start in range(0, len(chunks), self.upsert_batch_size)
+        ]
+        started = time.perf_counter()
         
         try:
-            self.client.upsert(
-                collection_name=self.collection_name,
-                points=points
+            batch_ms = []
+            if len(batches) > 1:
+                with ThreadPoolExecutor(max_workers=max(1, self.upsert_parallelism)) as executor:
+                    batch_ms.extend(executor.map(
+                        lambda bounds: self._upsert_batch(
+                            document_id, chunks, vector_ids, *bounds, wait=self.upsert_wait
+                        ),
+                        batches[:-1]
+                    ))
+            
+            # Consistency barrier: updates apply in order, so waiting on the last one covers all
+            batch_ms.append(self._upsert_batch(document_id, chunks, vector_ids, *batches[-1], wait=True))
+            
+            total_ms = (time.perf_counter() - started) * 1000
+            self.last_upload_stats = {
+                "points": len(vector_ids),
+                "batches": len(batches),
+                "batch_ms": [round(ms, 2) for ms in batch_ms],
+                "total_ms": round(total_ms, 2),
+                "points_per_second": round(len(vector_ids) / (total_ms / 1000), 1) if total_ms else None
+            }
+            logger.info(
+                f"Stored {len(vector_ids)} chunks for document {document_id} in {len(batches)} batches "
+                f"({total_ms:.0f}ms, slowest batch {max(batch_ms):.0f}ms)"
             )
-            logger.info(f"Stored {len(points)} chunks for document {document_id}")
             return vector_ids
             
         except Exception as e:
             logger.error(f"Failed to store chunks: {e}")
             raise Exception(f"Vector storage failed: {e}")
     
+    def _upsert_batch(
+        self,
+        document_id: int,
+        chunks: List[Dict],
+        vector_ids: List[str],
+        start: int,
+        end: int,
+        wait: bool
+    ) -> float:
+        """Upsert chunks[start:end] and return the request time in milliseconds."""
+        batch_started = time.perf_counter()
+        batch = chunks[start:end]
+        vectors = np.vstack([chunk["embedding"] for chunk in batch]).astype(np.float32, copy=False)
+        payloads = [chunk_payload(document_id, chunk, self.payload_content) for chunk in batch]
+        
+        # The REST client validates vectors as lists, so convert only at send time
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=Batch(ids=vector_ids[start:end], vectors=vectors.tolist(), payloads=payloads),
+            wait=wait
+        )
+        return (time.perf_counter() - batch_started) * 1000
+    
     def search_similar(
         self, 
-        query_embedding: List[float], 
+        query_embedding: np.ndarray, 
         limit: int = 5,
         document_id: Optional[int] = None,
-        score_threshold: float = 0.7
+        score_threshold: float = 0.7,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
+        with_vectors: bool = False,
+        document_ids: Optional[List[int]] = None
     ) -> List[Dict]:
-        """Search for similar chunks."""
-        try:
-            search_filter = None
-            if document_id:
-                search_filter = Filter(
-                    must=[
-                        FieldCondition(
-                            key="document_id",
-                            match=MatchValue(value=document_id)
-                        )
-                    ]
-                )
+        """Search for similar chunks.
+        
+        ``rescore`` and ``oversampling`` override the quantization search
+        settings for this call. ``with_vectors`` adds each hit's embedding
+        as ``vector``. ``document_ids`` restricts the search to any of the
+        given documents.
+        """
+        try:
+            results = self.client.search(**self._search_kwargs(
+                query_embedding, limit, document_id, score_threshold, rescore, oversampling,
+                with_vectors, document_ids
+            ))
             
-            results = self.client.search(
-                collection_name=self.collection_name,
-                query_vector=query_embedding,
-                query_filter=search_filter,
-                limit=limit,
-                score_threshold=score_threshold
-            )
+            formatted_results = self._format_results(results)
+            logger.info(f"Found {len(formatted_results)} similar chunks")
+            return formatted_results
             
-            formatted_results = []
-            for result in results:
-                formatted_results.append({
-                    "id": result.id,
-                    "score": result.score,
-                    "document_id": result.payload["document_id"],
-                    "chunk_index": result.payload["chunk_index"],
-                    "content": result.payload["content"],
-                    "word_count": result.payload["word_count"]
-                })
+        except Exception as e:
+            logger.error(f"Failed to search vectors: {e}")
+            raise Exception(f"Vector search failed: {e}")
+    
+    async def search_similar_async(
+        self, 
+        query_embedding: np.ndarray, 
+        limit: int = 5,
+        document_id: Optional[int] = None,
+        score_threshold: float = 0.7,
+        rescore: Optional[bool] = None,
+        oversampling: Optional[float] = None,
+        with_vectors: bool = False,
+        document_ids: Optional[List[int]] = None
+    ) -> List[Dict]:
+        """``search_similar`` on the async client."""
+        try:
+            results = await self.async_client.search(**self._search_kwargs(
+                query_embedding, limit, document_id, score_threshold, rescore, oversampling,
+                with_vectors, document_ids
+            ))
             
+            formatted_results = self._format_results(results)
             logger.info(f"Found {len(formatted_results)} similar chunks")
             return formatted_results
             
@@ -125,19 +321,325 @@ class VectorService:
             logger.error(f"Failed to search vectors: {e}")
             raise Exception(f"Vector search failed: {e}")
     
+    def _search_kwargs(
+        self,
+        query_embedding: np.ndarray,
+        limit: int,
+        document_id: Optional[int],
+        score_threshold: float,
+        rescore: Optional[bool],
+        oversampling: Optional[float],
+        with_vectors: bool,
+        document_ids: Optional[List[int]]
+    ) -> Dict:
+        return {
+            "collection_name": self.collection_name,
+            "query_vector": query_embedding,
+            "query_filter": self._document_filter(document_id, document_ids),
+            "search_params": self._search_params(rescore, oversampling),
+            "limit": limit,
+            "score_threshold": score_threshold,
+            "with_payload": self.payload_selector,
+            "with_vectors": with_vectors
+        }
+    
+    def search_similar_batch(
+        self,
+        query_embeddings: np.ndarray,
+        limits: List[int],
+        document_ids: List[Optional[int]],
+        score_thresholds: List[float],
+        with_vectors: bool = False,
+        document_id_sets: Optional[List[Optional[List[int]]]] = None
+    ) -> List[List[Dict]]:
+        """Run one search per query row in a single ``search_batch`` round-trip.
+        
+        ``document_id_sets`` optionally restricts each query to any of a
+        set of documents (``None`` entries search everything).
+        """
+        try:
+            requests = self._search_requests(
+                query_embeddings, limits, document_ids, score_thresholds, with_vectors, document_id_sets
+            )
+            batch_results = self.client.search_batch(collection_name=self.collection_name, requests=requests)
+            
+            logger.info(f"Ran batch search for {len(requests)} queries")
+            return [self._format_results(results) for results in batch_results]
+            
+        except Exception as e:
+            logger.error(f"Failed to batch search vectors: {e}")
+            raise Exception(f"Vector search failed: {e}")
+    
+    async def search_similar_batch_async(
+        self,
+        query_embeddings: np.ndarray,
+        limits: List[int],
+        document_ids: List[Optional[int]],
+        score_thresholds: List[float],
+        with_vectors: bool = False,
+        document_id_sets: Optional[List[Optional[List[int]]]] = None
+    ) -> List[List[Dict]]:
+        """``search_similar_batch`` on the async client."""
+        try:
+            requests = self._search_requests(
+                query_embeddings, limits, document_ids, score_thresholds, with_vectors, document_id_sets
+            )
+            batch_results = await self.async_client.search_batch(
+                collection_name=self.collection_name, requests=requests
+            )
+            
+            logger.info(f"Ran batch search for {len(requests)} queries")
+            return [self._format_results(results) for results in batch_results]
+            
+        except Exception as e:
+            logger.error(f"Failed to batch search vectors: {e}")
+            raise Exception(f"Vector search failed: {e}")
+    
+    def _search_requests(
+        self,
+        query_embeddings: np.ndarray,
+        limits: List[int],
+        document_ids: List[Optional[int]],
+        score_thresholds: List[float],
+        with_vectors: bool,
+        document_id_sets: Optional[List[Optional[List[int]]]]
+    ) -> List[SearchRequest]:
+        search_params = self._search_params()
+        return [
+            SearchRequest(
+                vector=embedding.tolist(),
+                filter=self._document_filter(document_id, id_set),
+                params=search_params,
+                limit=limit,
+                score_threshold=score_threshold,
+                with_payload=self.payload_selector,
+                with_vector=with_vectors
+            )
+            for embedding, limit, document_id, score_threshold, id_set in zip(
+                query_embeddings, limits, document_ids, score_thresholds,
+                document_id_sets or [None] * len(query_embeddings)
+            )
+        ]
+    
+    def search_grouped(
+        self,
+        query_embedding: np.ndarray,
+        limit: int = 5,
+        group_size: int = 1,
+        document_id: Optional[int] = None,
+        score_threshold: float = 0.7,
+        with_vectors: bool = False,
+        document_ids: Optional[List[int]] = None
+    ) -> List[Dict]:
+        """Search with at most ``group_size`` hits per document, over ``limit`` documents.
+        
+        Uses Qdrant's grouped search on ``document_id``; hits from all
+        groups are returned in score order.
+        """
+        try:
+            groups = self.client.search_groups(**self._group_kwargs(
+                query_embedding, limit, group_size, document_id, score_threshold, with_vectors, document_ids
+            )).groups
+            return self._format_groups(groups)
+            
+        except Exception as e:
+            logger.error(f"Failed to search vector groups: {e}")
+            raise Exception(f"Vector search failed: {e}")
+    
+    async def search_grouped_async(
+        self,
+        query_embedding: np.ndarray,
+        limit: int = 5,
+        group_size: int = 1,
+        document_id: Optional[int] = None,
+        score_threshold: float = 0.7,
+        with_vectors: bool = False,
+        document_ids: Optional[List[int]] = None
+    ) -> List[Dict]:
+        """``search_grouped`` on the async client."""
+        try:
+            groups = (await self.async_client.search_groups(**self._group_kwargs(
+                query_embedding, limit, group_size, document_id, score_threshold, with_vectors, document_ids
+            ))).groups
+            return self._format_groups(groups)
+            
+        except Exception as e:
+            logger.error(f"Failed to search vector groups: {e}")
+            raise Exception(f"Vector search failed: {e}")
+    
+    def _group_kwargs(
+        self,
+        query_embedding: np.ndarray,
+        limit: int,
+        group_size: int,
+        document_id: Optional[int],
+        score_threshold: float,
+        with_vectors: bool,
+        document_ids: Optional[List[int]]
+    ) -> Dict:
+        return {
+            "collection_name": self.collection_name,
+            "query_vector": query_embedding,
+            "group_by": "document_id",
+            "query_filter": self._document_filter(document_id, document_ids),
+            "search_params": self._search_params(),
+            "limit": limit,
+            "group_size": group_size,
+            "score_threshold": score_threshold,
+            "with_payload": self.payload_selector,
+            "with_vectors": with_vectors
+        }
+    
+    def _format_groups(self, groups) -> List[Dict]:
+        formatted_results = self._format_results([hit for group in groups for hit in group.hits])
+        formatted_results.sort(key=lambda result: result["score"], reverse=True)
+        logger.info(f"Found {len(formatted_results)} similar chunks in {len(groups)} documents")
+        return formatted_results
+    
+    def get_vectors(self, vector_ids: List[str]) -> Dict[str, np.ndarray]:
+        """Fetch stored embeddings by point ID."""
+        if not vector_ids:
+            return {}
+        
+        try:
+            records = self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=vector_ids,
+                with_payload=False,
+                with_vectors=True
+            )
+            return {str(record.id): np.asarray(record.vector, dtype=np.float32) for record in records}
+            
+        except Exception as e:
+            logger.error(f"Failed to retrieve vectors: {e}")
+            raise Exception(f"Vector retrieval failed: {e}")
+    
+    async def get_vectors_async(self, vector_ids: List[str]) -> Dict[str, np.ndarray]:
+        """``get_vectors`` on the async client."""
+        if not vector_ids:
+            return {}
+        
+        try:
+            records = await self.async_client.retrieve(
+                collection_name=self.collection_name,
+                ids=vector_ids,
+                with_payload=False,
+                with_vectors=True
+            )
+            return {str(record.id): np.asarray(record.vector, dtype=np.float32) for record in records}
+            
+        except Exception as e:
+            logger.error(f"Failed to retrieve vectors: {e}")
+            raise Exception(f"Vector retrieval failed: {e}")
+    
+    @staticmethod
+    def _document_filter(document_id: Optional[int], document_ids: Optional[List[int]] = None) -> Optional[Filter]:
+        conditions = []
+        if document_id:
+            conditions.append(FieldCondition(key="document_id", match=MatchValue(value=document_id)))
+        if document_ids:
+            conditions.append(FieldCondition(key="document_id", match=MatchAny(any=document_ids)))
+        return Filter(must=conditions) if conditions else None
+    
+    @staticmethod
+    def _format_results(results) -> List[Dict]:
+        formatted_results = []
+        for result in results:
+            formatted_result = {
+                "id": result.id,
+                "score": result.score,
+                "document_id": result.payload["document_id"],
+                "chunk_index": result.payload["chunk_index"],
+                "content": result.payload.get("content"),
+                "word_count": result.payload["word_count"]
+            }
+            if result.vector is not None:
+                formatted_result["vector"] = np.asarray(result.vector, dtype=np.float32)
+            formatted_results.append(formatted_result)
+        return formatted_results
+    
+    def get_document_point_ids(self, document_id: int) -> Dict[str, int]:
+        """Map each stored point ID of a document to its chunk index."""
+        try:
+            point_ids = {}
+            offset = None
+            while True:
+                records, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    scroll_filter=self._document_filter(document_id),
+                    limit=1000,
+                    offset=offset,
+                    with_payload=PayloadSelectorInclude(include=["chunk_index"]),
+                    with_vectors=False
+                )
+                point_ids.update({str(record.id): record.payload["chunk_index"] for record in records})
+                if offset is None:
+                    return point_ids
+            
+        except Exception as e:
+            logger.error(f"Failed to list document points: {e}")
+            raise Exception(f"Vector listing failed: {e}")
+    
+    def get_document_ids(self) -> Set[int]:
+        """IDs of every document with at least one stored point."""
+        try:
+            document_ids = set()
+            offset = None
+            while True:
+                records, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    limit=1000,
+                    offset=offset,
+                    with_payload=PayloadSelectorInclude(include=["document_id"]),
+                    with_vectors=False
+                )
+                document_ids.update(record.payload["document_id"] for record in records)
+                if offset is None:
+                    return document_ids
+            
+        except Exception as e:
+            logger.error(f"Failed to list documents: {e}")
+            raise Exception(f"Vector listing failed: {e}")
+    
+    def update_chunk_indexes(self, chunk_indexes: Dict[str, int]):
+        """Set new chunk indexes on existing points in one batched request."""
+        if not chunk_indexes:
+            return
+        
+        try:
+            self.client.batch_update_points(
+                collection_name=self.collection_name,
+                update_operations=[
+                    SetPayloadOperation(set_payload=SetPayload(payload={"chunk_index": index}, points=[point_id]))
+                    for point_id, index in chunk_indexes.items()
+                ]
+            )
+        except Exception as e:
+            logger.error(f"Failed to update chunk indexes: {e}")
+            raise Exception(f"Vector update failed: {e}")
+    
+    def delete_points(self, vector_ids: List[str]):
+        """Delete points by ID."""
+        if not vector_ids:
+            return
+        
+        try:
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=PointIdsList(points=vector_ids)
+            )
+            logger.info(f"Deleted {len(vector_ids)} points")
+            
+        except Exception as e:
+            logger.error(f"Failed to delete points: {e}")
+            raise Exception(f"Vector deletion failed: {e}")
+    
     def delete_document_chunks(self, document_id: int):
         """Delete all chunks for a document."""
         try:
             self.client.delete(
                 collection_name=self.collection_name,
-                points_selector=Filter(
-                    must=[
-                        FieldCondition(
-                            key="document_id",
-                            match=MatchValue(value=document_id)
-                        )
-                    ]
-                )
+                points_selector=self._document_filter(document_id)
             )
             logger.info(f"Deleted chunks for document {document_id}")
             
@@ -145,6 +647,14 @@ class VectorService:
             logger.error(f"Failed to delete document chunks: {e}")
             raise Exception(f"Vector deletion failed: {e}")
     
+    def close(self):
+        """Close the Qdrant connection pool."""
+        self.client.close()
+    
+    async def aclose(self):
+        """Close the async Qdrant connection pool."""
+        await self.async_client.close()
+    
     def get_collection_stats(self) -> Dict:
         """Get collection statistics."""
         try:
@@ -152,8 +662,26 @@ class VectorService:
             return {
                 "total_points": info.points_count,
                 "vector_size": info.config.params.vectors.size,
-                "distance": info.config.params.vectors.distance
+                "distance": info.config.params.vectors.distance,
+                "quantization": self.quantization,
+                "on_disk_vectors": bool(info.config.params.vectors.on_disk),
+                "hnsw": {"m": info.config.hnsw_config.m, "ef_construct": info.config.hnsw_config.ef_construct},
+                "payload_indexes": {
+                    field_name: index.data_type for field_name, index in (info.payload_schema or {}).items()
+                },
+                "last_upload": self.last_upload_stats
             }
         except Exception as e:
             logger.error(f"Failed to get collection stats: {e}")
-            return {}
\ No newline at end of file
+            return {}
+
+
+def get_vector_service(vector_size: int, collection_name: Optional[str] = None):
+    """Build the vector backend selected in settings."""
+    if settings.vector_backend == "qdrant":
+        return VectorService(vector_size=vector_size, collection_name=collection_name)
+
+    if settings.vector_backend == "numpy":
+        return NumpyVectorService(vector_size=vector_size, collection_name=collection_name)
+
+    raise Exception(f"Unknown vector backend: {settings.vector_backend}")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Load test the query endpoint: throughput and latency under concurrency
+
+Fires --requests queries at a running API (--url), keeping --concurrency
+of them in flight, and reports requests per second with p50/p95/max
+latency. Run it against a single uvicorn worker before and after a
+change to compare; cycling through --questions and setting
+--score-threshold 0 keeps every request doing a full search and LLM call
+rather than hitting the answer cache.
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+DEFAULT_QUESTIONS = [
+    "What is this document about?",
+    "Summarize the main findings.",
+    "Which methods are described?",
+    "What are the key limitations?",
+    "Who is the intended audience?",
+]
+
+
+async def run_load(url: str, questions: list, total: int, concurrency: int, score_threshold: float, timeout: float):
+    """Send ``total`` queries with at most ``concurrency`` in flight; returns (latencies_ms, errors, seconds)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+
+        async def send(index: int):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json={
+                        "question": questions[index % len(questions)],
+                        "score_threshold": score_threshold
+                    })
+                    response.raise_for_status()
+                    latencies.append((time.perf_counter() - started) * 1000)
+                except httpx.HTTPError as e:
+                    errors += 1
+                    if errors <= 5:
+                        print(f"Request {index} failed: {e}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*[send(index) for index in range(total)])
+        return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure query throughput of a running API")
+    parser.add_argument("--url", default="http://localhost:8000/api/v1/query/")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--score-threshold", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--questions", nargs="+", default=DEFAULT_QUESTIONS)
+    args = parser.parse_args()
+
+    print(f"Sending {args.requests} queries to {args.url} with {args.concurrency} in flight...")
+    latencies, errors, seconds = asyncio.run(run_load(
+        args.url, args.questions, args.requests, args.concurrency, args.score_threshold, args.timeout
+    ))
+
+    print(f"{'completed':<12} {len(latencies)}")
+    print(f"{'errors':<12} {errors}")
+    print(f"{'seconds':<12} {seconds:.2f}")
+    print(f"{'requests/s':<12} {len(latencies) / seconds:.1f}")
+    if latencies:
+        print(f"{'p50 ms':<12} {np.percentile(latencies, 50):.0f}")
+        print(f"{'p95 ms':<12} {np.percentile(latencies, 95):.0f}")
+        print(f"{'max ms':<12} {max(latencies):.0f}")
+
+
+if __name__ == "__main__":
+    main()
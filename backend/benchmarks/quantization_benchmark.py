@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark Qdrant quantization modes: recall@k and search latency
+
+Loads the same synthetic, clustered embeddings into one collection per
+quantization mode and compares search results against exact brute-force
+ground truth, with rescoring on/off and several oversampling factors.
+Needs a running Qdrant (QDRANT_URL); benchmark collections are deleted
+afterwards unless --keep is given.
+"""
+import argparse
+import sys
+import os
+import time
+
+import numpy as np
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.vector_service import VectorService
+
+MODES = ["none", "scalar", "binary"]
+BYTES_PER_DIMENSION = {"none": 4.0, "scalar": 1.0, "binary": 1 / 8}
+
+
+def make_dataset(points: int, queries: int, dimension: int, clusters: int, seed: int):
+    """Clustered unit vectors (closer to real embeddings than uniform noise)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=points)
+    vectors = centers[labels] + 0.5 * rng.standard_normal((points, dimension)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    picks = rng.integers(0, points, size=queries)
+    query_vectors = vectors[picks] + 0.3 * rng.standard_normal((queries, dimension)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return vectors, query_vectors
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Brute-force cosine top-k row indexes for every query."""
+    scores = queries @ vectors.T
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return top
+
+
+def load_collection(mode: str, vectors: np.ndarray) -> VectorService:
+    service = VectorService(
+        vector_size=vectors.shape[1],
+        collection_name=f"benchmark_quantization_{mode}",
+        quantization=mode
+    )
+    chunks = [
+        {"index": index, "content": "", "word_count": 0, "embedding": vector}
+        for index, vector in enumerate(vectors)
+    ]
+    service.store_chunks(document_id=1, chunks=chunks)
+    print(f"{mode}: upload {service.last_upload_stats['total_ms']:.0f}ms "
+          f"({service.last_upload_stats['points_per_second']} points/s)")
+
+    # Wait for indexing/quantization to finish before timing searches
+    while service.client.get_collection(service.collection_name).status != "green":
+        time.sleep(0.5)
+    return service
+
+
+def run_queries(service: VectorService, queries: np.ndarray, truth: np.ndarray, k: int, rescore: bool, oversampling: float):
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        results = service.search_similar(
+            query,
+            limit=k,
+            score_threshold=-1.0,
+            rescore=rescore,
+            oversampling=oversampling
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len({result["chunk_index"] for result in results} & set(expected.tolist()))
+
+    return hits / (len(queries) * k), float(np.mean(latencies)), float(np.percentile(latencies, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Qdrant quantization modes")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversampling", type=float, nargs="+", default=[1.0, 2.0, 4.0])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep benchmark collections")
+    args = parser.parse_args()
+
+    print(f"Generating {args.points} x {args.dimension} vectors and {args.queries} queries...")
+    vectors, queries = make_dataset(args.points, args.queries, args.dimension, args.clusters, args.seed)
+    truth = exact_top_k(vectors, queries, args.k)
+
+    print(f"{'mode':<8} {'rescore':<8} {'oversample':>10} {'recall@' + str(args.k):>10} "
+          f"{'mean ms':>9} {'p95 ms':>9} {'vector MB':>10}")
+
+    for mode in args.modes:
+        service = load_collection(mode, vectors)
+        vector_mb = args.points * args.dimension * BYTES_PER_DIMENSION[mode] / 2**20
+
+        variants = [(False, 1.0)] if mode == "none" else [
+            (rescore, oversampling) for rescore in (False, True) for oversampling in args.oversampling
+        ]
+        try:
+            for rescore, oversampling in variants:
+                recall, mean_ms, p95_ms = run_queries(service, queries, truth, args.k, rescore, oversampling)
+                print(f"{mode:<8} {str(rescore):<8} {oversampling:>10.1f} {recall:>10.3f} "
+                      f"{mean_ms:>9.2f} {p95_ms:>9.2f} {vector_mb:>10.1f}")
+        finally:
+            if not args.keep:
+                service.client.delete_collection(service.collection_name)
+
+
+if __name__ == "__main__":
+    main()
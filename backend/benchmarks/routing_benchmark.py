@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark two-stage (document centroid -> chunk) retrieval against flat search
+
+Builds a synthetic corpus of documents whose chunks cluster around a
+per-document topic, stores chunks and document centroids, then compares
+recall@k (against exact brute-force ground truth) and search latency of
+flat corpus-wide search with routed search over several numbers of
+candidate documents. Runs against Qdrant (QDRANT_URL) or the in-process
+numpy backend; benchmark collections are deleted afterwards unless
+--keep is given.
+"""
+import argparse
+import shutil
+import sys
+import os
+import tempfile
+import time
+
+import numpy as np
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.vector_service import VectorService
+from app.services.numpy_vector_service import NumpyVectorService
+from app.services.document_router import DocumentRouter
+
+CHUNK_COLLECTION = "benchmark_routing_chunks"
+CENTROID_COLLECTION = "benchmark_routing_centroids"
+
+
+def make_corpus(documents: int, chunks_per_document: int, queries: int, dimension: int, topics: int, seed: int):
+    """Chunks scattered around a per-document center, which in turn sits near a shared topic."""
+    rng = np.random.default_rng(seed)
+    topic_centers = rng.standard_normal((topics, dimension)).astype(np.float32)
+    document_centers = (
+        topic_centers[rng.integers(0, topics, size=documents)]
+        + 0.5 * rng.standard_normal((documents, dimension)).astype(np.float32)
+    )
+    vectors = (
+        np.repeat(document_centers, chunks_per_document, axis=0)
+        + 0.5 * rng.standard_normal((documents * chunks_per_document, dimension)).astype(np.float32)
+    )
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    picks = rng.integers(0, len(vectors), size=queries)
+    query_vectors = vectors[picks] + 0.3 * rng.standard_normal((queries, dimension)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return vectors.reshape(documents, chunks_per_document, dimension), query_vectors
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> list:
+    """Brute-force cosine top-k as sets of (document_id, chunk_index)."""
+    documents, chunks_per_document, dimension = vectors.shape
+    scores = queries @ vectors.reshape(-1, dimension).T
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    return [{(int(row // chunks_per_document) + 1, int(row % chunks_per_document)) for row in rows} for rows in top]
+
+
+def make_services(backend: str, dimension: int, storage_dir: str):
+    if backend == "qdrant":
+        return (
+            VectorService(vector_size=dimension, collection_name=CHUNK_COLLECTION),
+            VectorService(vector_size=dimension, collection_name=CENTROID_COLLECTION)
+        )
+    return (
+        NumpyVectorService(vector_size=dimension, collection_name=CHUNK_COLLECTION, storage_dir=storage_dir),
+        NumpyVectorService(vector_size=dimension, collection_name=CENTROID_COLLECTION, storage_dir=storage_dir)
+    )
+
+
+def load_corpus(vector_service, router: DocumentRouter, vectors: np.ndarray):
+    started = time.perf_counter()
+    for document_index, document_vectors in enumerate(vectors):
+        document_id = document_index + 1
+        vector_service.store_chunks(document_id, [
+            {"index": index, "content": "", "word_count": 0, "embedding": vector}
+            for index, vector in enumerate(document_vectors)
+        ])
+        router.update_document(document_id, list(document_vectors))
+    print(f"Loaded {vectors.shape[0] * vectors.shape[1]} chunks and {vectors.shape[0]} centroids "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    if isinstance(vector_service, VectorService):
+        # Wait for indexing to finish before timing searches
+        for service in (vector_service, router.vector_service):
+            while service.client.get_collection(service.collection_name).status != "green":
+                time.sleep(0.5)
+
+
+def run_queries(vector_service, router: DocumentRouter, queries: np.ndarray, truth: list, k: int, routing_documents: int):
+    """Search every query, routed through ``routing_documents`` centroids (0: flat)."""
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        document_ids = router.route(query, routing_documents) if routing_documents else None
+        results = vector_service.search_similar(query, limit=k, score_threshold=-1.0, document_ids=document_ids)
+        latencies.append((time.perf_counter() - started) * 1000)
+        hits += len({(result["document_id"], result["chunk_index"]) for result in results} & expected)
+
+    return hits / (len(queries) * k), float(np.mean(latencies)), float(np.percentile(latencies, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare routed two-stage search with flat search")
+    parser.add_argument("--backend", choices=["qdrant", "numpy"], default="qdrant")
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--chunks-per-document", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--routing-documents", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep benchmark collections")
+    args = parser.parse_args()
+
+    print(f"Generating {args.documents} documents x {args.chunks_per_document} chunks "
+          f"({args.dimension} dimensions) and {args.queries} queries...")
+    vectors, queries = make_corpus(
+        args.documents, args.chunks_per_document, args.queries, args.dimension, args.topics, args.seed
+    )
+    truth = exact_top_k(vectors, queries, args.k)
+
+    storage_dir = tempfile.mkdtemp(prefix="routing_benchmark_")
+    vector_service, centroid_service = make_services(args.backend, args.dimension, storage_dir)
+    router = DocumentRouter(centroid_service)
+
+    try:
+        load_corpus(vector_service, router, vectors)
+
+        print(f"{'search':<16} {'recall@' + str(args.k):>10} {'mean ms':>9} {'p95 ms':>9}")
+        for routing_documents in [0] + args.routing_documents:
+            recall, mean_ms, p95_ms = run_queries(vector_service, router, queries, truth, args.k, routing_documents)
+            label = "flat" if routing_documents == 0 else f"routed top-{routing_documents}"
+            print(f"{label:<16} {recall:>10.3f} {mean_ms:>9.2f} {p95_ms:>9.2f}")
+    finally:
+        if args.backend == "qdrant" and not args.keep:
+            for service in (vector_service, centroid_service):
+                service.client.delete_collection(service.collection_name)
+        if args.backend == "numpy" and not args.keep:
+            shutil.rmtree(storage_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Rebuild search indexes for documents that are already processed
+
+Documents processed before HYBRID_SEARCH_ENABLED or DOCUMENT_ROUTING_ENABLED
+was turned on are missing from the BM25 index or have no centroid (and
+queries skip routing until every document has one). This rebuilds them from
+the chunks and vectors already stored, without re-extracting or
+re-embedding anything. It can be run before enabling the settings.
+"""
+import argparse
+import sys
+import os
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.services.document_service import DocumentService
+from app.services.embedding_service import EmbeddingService
+from app.services.lexical_index import get_lexical_index
+from app.services.document_router import get_document_router
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Rebuild search indexes for processed documents")
+    parser.add_argument("--lexical", action="store_true", help="Rebuild the BM25 index used by hybrid search")
+    parser.add_argument("--centroids", action="store_true", help="Rebuild the document centroids used for routing")
+    args = parser.parse_args()
+    
+    if not args.lexical and not args.centroids:
+        parser.error("Choose an index to rebuild (--lexical and/or --centroids)")
+    
+    embedding_service = EmbeddingService()
+    document_service = DocumentService(
+        embedding_service=embedding_service,
+        lexical_index=get_lexical_index() if args.lexical else None,
+        document_router=get_document_router(embedding_service.dimension) if args.centroids else None
+    )
+    db = SessionLocal()
+    try:
+        if args.lexical:
+            count = document_service.rebuild_lexical_index(db)
+            print(f"Lexical index rebuilt for {count} documents")
+        if args.centroids:
+            count = document_service.rebuild_centroids(db)
+            print(f"Centroids rebuilt for {count} documents")
+    except Exception as e:
+        print(f"Reindexing failed: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
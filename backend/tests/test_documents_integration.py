@@ -2,14 +2,17 @@ import pytest
 import io
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.main import app
-from app.database import get_db, Base
+from app.database import get_db, get_async_db, get_session_factory, Base
 
 # Create test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test_docs.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_docs.db")
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
 
 
 def override_get_db():
@@ -20,7 +23,14 @@ def override_get_db():
         db.close()
 
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
 
 
 @pytest.fixture(scope="function")
@@ -109,4 +119,16 @@ class TestDocumentUpload:
 
     def test_get_nonexistent_document(self, client):
         response = client.get("/api/v1/documents/999")
-        assert response.status_code == 404
\ No newline at end of file
+        assert response.status_code == 404
+
+    def test_delete_document(self, client, sample_pdf_file):
+        filename, file_obj, content_type = sample_pdf_file
+        upload_response = client.post(
+            "/api/v1/documents/upload",
+            files={"file": (filename, file_obj, content_type)}
+        )
+        document_id = upload_response.json()["document_id"]
+        
+        response = client.delete(f"/api/v1/documents/{document_id}")
+        assert response.status_code == 200
+        assert client.get(f"/api/v1/documents/{document_id}").status_code == 404
@@ -1,7 +1,81 @@
 import pytest
-from unittest.mock import Mock, patch
+import asyncio
+import time
+import base64
+import numpy as np
+import httpx
+import openai
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, Mock, patch
 from app.services.processors.pdf_processor import PDFProcessor
-from app.services.response_formatter import ResponseFormatter
+from app.services.response_formatter import ResponseFormatter, StreamingAnswerFormatter
+from app.services.embedding_cache import EmbeddingCache
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.retrieval_cache import RetrievalCache
+from app.services.document_metadata import DocumentMetadataCache
+from app.services.embedding_service import EmbeddingService
+from app.services.embedding_providers import HashingEmbeddingProvider, OpenAIEmbeddingProvider
+from app.services.tokenizer import pack_batches_by_tokens, count_tokens
+from app.services.context_packer import ContextPacker, format_context
+from app.services.query_service import QueryService
+from app.services.embedding_batcher import QueryEmbeddingBatcher
+from app.services.rate_limiter import AdaptiveRateController, parse_reset_duration
+from app.services.vector_service import VectorService
+from app.services.numpy_vector_service import NumpyVectorService
+from app.services.vector_ids import chunk_point_ids
+from app.services.document_service import DocumentService
+from app.services.document_router import DocumentRouter
+from app.services.container import ServiceContainer
+from app.services.chunk_store import SqliteChunkStore
+from app.services.lexical_index import LexicalIndex
+from app.services.reranking import reciprocal_rank_fusion, maximal_marginal_relevance, cap_per_document
+from app.core.cache import LRUCache
+
+
+def fake_embeddings_client(embed):
+    """Mock OpenAI client whose raw embeddings responses come from embed(text)."""
+    client = Mock()
+    client.embeddings.with_raw_response.create.side_effect = lambda model, input, **kwargs: Mock(
+        headers={},
+        parse=Mock(return_value=Mock(data=[Mock(embedding=embed(text)) for text in input]))
+    )
+    return client
+
+
+def provider_error(error_class, status_code, message="error", headers=None):
+    """Build an OpenAI status error as the SDK would raise it."""
+    response = httpx.Response(
+        status_code,
+        request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"),
+        headers=headers or {}
+    )
+    return error_class(message, response=response, body=None)
+
+
+def fake_redis(store):
+    """Mock Redis client over a dict; pipelined increments apply on execute."""
+    queued = []
+
+    def execute():
+        for key, count in queued:
+            store[key] = int(store.get(key, 0)) + count
+        queued.clear()
+
+    pipeline = Mock()
+    pipeline.incrby.side_effect = lambda key, count: queued.append((key, count))
+    pipeline.execute.side_effect = execute
+    redis_client = Mock()
+    redis_client.get.side_effect = store.get
+    redis_client.mget.side_effect = lambda keys: [store.get(key) for key in keys]
+    redis_client.set.side_effect = lambda key, value, ex=None: store.__setitem__(key, value)
+    redis_client.pipeline.return_value = pipeline
+    return redis_client
+
+
+async def iter_pieces(pieces):
+    """An async generator over answer pieces, like LLMService.stream_answer_async."""
+    for piece in pieces:
+        yield piece
 
 
 class TestPDFProcessor:
@@ -43,7 +117,7 @@ class TestResponseFormatter:
             }
         ]
         
-        sources = formatter._format_sources(chunks)
+        sources = formatter.format_sources(chunks)
         
         assert len(sources) == 1
         assert sources[0]["score"] == 0.85
@@ -64,6 +138,14 @@ class TestResponseFormatter:
         answer = formatter._format_answer("")
         assert "couldn't generate" in answer.lower()
 
+    def test_streaming_answer_matches_full_formatting(self):
+        formatter = ResponseFormatter()
+        
+        for pieces in [["  This  is", " an\n", "", "answer  "], ["Done!", "  "], [], ["  "]]:
+            streaming = StreamingAnswerFormatter()
+            streamed = "".join(streaming.feed(piece) for piece in pieces) + streaming.finish()
+            assert streamed == formatter._format_answer("".join(pieces))
+
     def test_format_response(self):
         formatter = ResponseFormatter()
         chunks = [{
@@ -85,4 +167,1061 @@ class TestResponseFormatter:
         assert response["question"] == "Test question?"
         assert response["answer"] == "Test answer."
         assert len(response["sources"]) == 1
-        assert response["processing_time_ms"] == 100
\ No newline at end of file
+        assert response["processing_time_ms"] == 100
+
+class TestLRUCache:
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_entries=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.evictions == 1
+
+    def test_size_bound(self):
+        cache = LRUCache(max_entries=100, max_bytes=10)
+        cache.set("a", "x", size=6)
+        cache.set("b", "y", size=6)
+        
+        assert cache.get("a") is None
+        assert cache.get("b") == "y"
+        assert cache.get_stats()["size_bytes"] == 6
+
+
+class TestEmbeddingCache:
+    def test_key_ignores_whitespace_differences(self):
+        cache = EmbeddingCache(use_redis=False)
+        assert cache.make_key("m", "hello   world\n") == cache.make_key("m", "hello world")
+        assert cache.make_key("m", "hello") != cache.make_key("other", "hello")
+
+    def test_get_many_returns_cached_and_missing(self):
+        cache = EmbeddingCache(use_redis=False)
+        cache.set_many("m", ["a"], [[0.5, 0.25]])
+        
+        results = cache.get_many("m", ["a", "b"])
+        
+        assert results[0].tolist() == [0.5, 0.25]
+        assert results[1] is None
+        assert cache.get_stats()["memory_hits"] == 1
+        assert cache.get_stats()["misses"] == 1
+
+    def test_stats_count_every_lookup_across_threads(self):
+        cache = EmbeddingCache(use_redis=False)
+        cache.set_many("m", ["a"], [[0.5, 0.25]])
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: cache.get_many("m", ["a", "b"] * 50), range(200)))
+        
+        assert cache.get_stats()["memory_hits"] == 10000
+        assert cache.get_stats()["misses"] == 10000
+
+
+class TestEmbeddingServiceCache:
+    def test_only_misses_are_embedded(self):
+        service = EmbeddingService(cache=EmbeddingCache(use_redis=False))
+        service.provider.client = fake_embeddings_client(lambda text: [float(len(text))])
+        
+        first = service.get_embeddings_batch(["aa", "bbb", "aa"])
+        second = service.get_embeddings_batch(["aa", "cccc"])
+        
+        assert first.tolist() == [[2.0], [3.0], [2.0]]
+        assert second.tolist() == [[2.0], [4.0]]
+        create = service.provider.client.embeddings.with_raw_response.create
+        sent = [call.kwargs["input"] for call in create.call_args_list]
+        assert sent == [["aa", "bbb"], ["cccc"]]
+
+
+class TestTokenBatching:
+    def test_packs_by_token_budget(self):
+        batches = pack_batches_by_tokens([40, 40, 40, 10], max_tokens=100, max_items=10)
+        assert batches == [[0, 1], [2, 3]]
+
+    def test_respects_item_limit_and_oversized_items(self):
+        batches = pack_batches_by_tokens([500, 1, 1, 1], max_tokens=100, max_items=2)
+        assert batches == [[0], [1, 2], [3]]
+
+    def test_concurrent_batches_keep_input_order(self):
+        service = EmbeddingService(cache=EmbeddingCache(use_redis=False))
+        service.max_batch_items = 2
+        service.max_concurrency = 3
+        service.provider.client = fake_embeddings_client(lambda text: [float(text)])
+        
+        texts = [str(i) for i in range(7)]
+        embeddings = service.get_embeddings_batch(texts)
+        
+        assert embeddings.dtype == np.float32
+        assert embeddings.tolist() == [[float(i)] for i in range(7)]
+        assert service.provider.client.embeddings.with_raw_response.create.call_count == 4
+
+
+class TestQueryEmbeddingCache:
+    @pytest.mark.asyncio
+    async def test_repeated_questions_skip_the_api(self):
+        with patch("app.services.query_service.get_vector_service"):
+            service = QueryService()
+        service.query_embedding_cache = EmbeddingCache(namespace="qemb", use_redis=False, lowercase=True)
+        service.embedding_batcher = None
+        service.embedding_service.get_embedding_async = AsyncMock(return_value=[0.5, 0.25])
+        
+        first = await service._get_query_embedding("What is RAG?")
+        second = await service._get_query_embedding("  what is  rag? ")
+        
+        assert np.array_equal(first, second)
+        assert service.embedding_service.get_embedding_async.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_embeds_once_and_streams_results(self):
+        with patch("app.services.query_service.get_vector_service"):
+            service = QueryService()
+        service.query_embedding_cache = None
+        service.embedding_service.get_embeddings_batch_async = AsyncMock(
+            side_effect=lambda texts: np.zeros((len(texts), service.embedding_service.dimension), dtype=np.float32)
+        )
+        chunk = {"id": "a", "score": 0.9, "document_id": 1, "chunk_index": 0, "content": "RAG combines retrieval", "word_count": 3}
+        service.vector_service.search_similar_batch_async = AsyncMock(return_value=[[chunk], []])
+        service.llm_service.generate_answer_async = AsyncMock(return_value="It combines retrieval and generation.")
+        
+        results = [
+            result async for result in service.process_query_batch(
+                [{"question": "What is RAG?"}, {"question": "Unrelated?", "document_id": 2}]
+            )
+        ]
+        
+        assert service.embedding_service.get_embeddings_batch_async.call_count == 1
+        assert service.vector_service.search_similar_batch_async.call_args.kwargs["document_ids"] == [None, 2]
+        by_index = {result["index"]: result for result in results}
+        assert by_index[0]["answer"] == "It combines retrieval and generation."
+        assert by_index[1]["sources"] == []
+        service.llm_service.generate_answer_async.assert_called_once()
+
+
+
+class TestSemanticAnswerCache:
+    """Test answer reuse for near-identical questions"""
+
+    def make_response(self, document_id=1):
+        return {"question": "q", "answer": "a", "sources": [{"document_id": document_id}], "processing_time_ms": 900}
+
+    def test_hits_similar_questions_in_scope_only(self):
+        cache = SemanticAnswerCache(similarity_threshold=0.95)
+        scope = SemanticAnswerCache.make_scope(None, 5, 0.7)
+        cache.put(np.array([1, 0], dtype=np.float32), scope, self.make_response(), {1}, 0)
+        
+        assert cache.get(np.array([1, 0.1], dtype=np.float32), scope)["answer"] == "a"
+        assert cache.get(np.array([1, 1], dtype=np.float32), scope) is None
+        assert cache.get(np.array([1, 0], dtype=np.float32), SemanticAnswerCache.make_scope(2, 5, 0.7)) is None
+
+    def test_invalidation_and_eviction(self):
+        cache = SemanticAnswerCache(max_entries=2)
+        cache.put(np.array([1, 0, 0], dtype=np.float32), "s", self.make_response(1), {1}, 0)
+        cache.put(np.array([0, 1, 0], dtype=np.float32), "s", self.make_response(2), {2}, 0)
+        cache.get(np.array([1, 0, 0], dtype=np.float32), "s")
+        cache.put(np.array([0, 0, 1], dtype=np.float32), "s", self.make_response(3), {3}, 0)
+        
+        assert cache.get(np.array([0, 1, 0], dtype=np.float32), "s") is None
+        cache.invalidate_document(1)
+        assert cache.get(np.array([1, 0, 0], dtype=np.float32), "s") is None
+        assert cache.get(np.array([0, 0, 1], dtype=np.float32), "s") is not None
+        assert len(cache) == 1
+
+    def test_invalidation_reaches_every_worker_through_redis(self):
+        redis_client = fake_redis({})
+        workers = [SemanticAnswerCache(use_redis=True), SemanticAnswerCache(use_redis=True)]
+        embedding = np.array([1, 0], dtype=np.float32)
+        
+        with patch("app.services.document_versions.get_redis_client", return_value=redis_client):
+            for worker in workers:
+                version, _ = worker.lookup(embedding, "s")
+                worker.put(embedding, "s", self.make_response(1), {1}, version)
+            assert workers[1].get(embedding, "s") is not None
+            
+            workers[0].invalidate_document(1)
+            
+            assert workers[1].get(embedding, "s") is None
+            stale_version, _ = workers[1].lookup(embedding, "s")
+            workers[0].invalidate_document(1)
+            workers[1].put(embedding, "s", self.make_response(1), {1}, stale_version)
+            assert workers[1].get(embedding, "s") is None
+        
+        assert workers[1].get_stats()["stale"] == 1
+        assert len(workers[0]) == 0 and len(workers[1]) == 0
+
+    @pytest.mark.asyncio
+    async def test_repeated_question_skips_retrieval_and_llm(self):
+        with patch("app.services.query_service.get_vector_service"):
+            service = QueryService(answer_cache=SemanticAnswerCache())
+        service.query_embedding_cache = None
+        service.embedding_batcher = None
+        service.embedding_service.get_embedding_async = AsyncMock(return_value=np.array([0.5, 0.25], dtype=np.float32))
+        chunk = {"id": "a", "score": 0.9, "document_id": 1, "chunk_index": 0, "content": "RAG combines retrieval", "word_count": 3}
+        service.vector_service.search_similar_async = AsyncMock(side_effect=lambda **kwargs: [dict(chunk)])
+        service.llm_service.generate_answer_async = AsyncMock(return_value="It combines retrieval and generation.")
+        
+        first = await service.process_query("What is RAG?")
+        second = await service.process_query("What's RAG?")
+        service.answer_cache.invalidate_document(1)
+        await service.process_query("What is RAG?")
+        
+        assert second["answer"] == first["answer"]
+        assert second["question"] == "What's RAG?" and second["cached"]
+        assert service.llm_service.generate_answer_async.call_count == 2
+
+
+class TestRetrievalCache:
+    """Test version-checked caching of retrieval results"""
+
+    def test_document_changes_invalidate_exactly(self):
+        cache = RetrievalCache(use_redis=False)
+        embedding = np.array([0.5, 0.25], dtype=np.float32)
+        entries = {document_id: cache.make_key(embedding, document_id, 5, 0.7) for document_id in (None, 1, 2)}
+        for document_id, key in entries.items():
+            cache.put(key, [{"id": "a", "score": np.float32(0.9)}], cache.current_version(document_id))
+        
+        assert cache.get(entries[1], 1) == [{"id": "a", "score": pytest.approx(0.9)}]
+        cache.bump_document(1)
+        
+        assert cache.get(entries[None], None) is None
+        assert cache.get(entries[1], 1) is None
+        assert cache.get(entries[2], 2) is not None
+        assert cache.get_stats()["stale"] == 2
+
+    def test_hit_matches_the_fused_results_it_cached(self):
+        cache = RetrievalCache(use_redis=False)
+        key = cache.make_key(np.array([0.5, 0.25], dtype=np.float32), None, 5, 0.7, question="gasket")
+        chunks = reciprocal_rank_fusion([
+            [{"id": "x", "score": np.float32(0.9), "document_id": 1}],
+            [{"id": "y", "score": 7.0, "document_id": 2}, {"id": "x", "score": 5.0, "document_id": 1}]
+        ])
+
+        cache.put(key, chunks, cache.current_version(None))
+
+        assert cache.get(key, None) == chunks
+        assert [chunk["fused_scores"] for chunk in cache.get(key, None)] == [[pytest.approx(0.9), 5.0], [None, 7.0]]
+
+    def test_failed_redis_bump_bypasses_cache_until_replayed(self):
+        store = {}
+        redis_client = fake_redis(store)
+        cache = RetrievalCache(use_redis=True)
+        key = cache.make_key(np.array([0.5, 0.25], dtype=np.float32), 1, 5, 0.7)
+        
+        with patch("app.services.retrieval_cache.get_redis_client", return_value=redis_client), \
+                patch("app.services.document_versions.get_redis_client", return_value=redis_client):
+            cache.put(key, [{"id": "a"}], cache.current_version(1))
+            redis_client.pipeline.side_effect = ConnectionError("Redis down")
+            cache.bump_document(1)
+            assert cache.get(key, 1) is None
+            
+            redis_client.pipeline.side_effect = None
+            assert cache.get(key, 1) is None
+        
+        assert store[cache.versions.key(1)] == 1
+        assert cache.get_stats()["bypassed"] == 1 and cache.get_stats()["stale"] == 1
+
+    @pytest.mark.asyncio
+    async def test_repeated_retrieval_skips_vector_search(self):
+        with patch("app.services.query_service.get_vector_service"):
+            service = QueryService(
+                retrieval_cache=RetrievalCache(use_redis=False), metadata_cache=DocumentMetadataCache()
+            )
+        service.query_embedding_cache = None
+        service.embedding_batcher = None
+        service.embedding_service.get_embedding_async = AsyncMock(return_value=np.array([0.5, 0.25], dtype=np.float32))
+        chunk = {"id": "a", "score": 0.9, "document_id": 1, "chunk_index": 0, "content": "RAG combines retrieval", "word_count": 3}
+        service.vector_service.search_similar_async = AsyncMock(side_effect=lambda **kwargs: [dict(chunk)])
+        service.llm_service.generate_answer_async = AsyncMock(return_value="It combines retrieval and generation.")
+        db = Mock()
+        db.execute = AsyncMock(return_value=[Mock(id=1, original_filename="rag.txt", file_type=".txt")])
+        
+        first = await service.process_query("What is RAG?", db=db)
+        second = await service.process_query("What is RAG?", db=db)
+        service.retrieval_cache.bump_document(3)
+        await service.process_query("What is RAG?", db=db)
+        
+        assert second["sources"] == first["sources"]
+        assert second["sources"][0]["filename"] == "rag.txt"
+        assert service.vector_service.search_similar_async.call_count == 2
+        assert service.llm_service.generate_answer_async.call_count == 3
+        assert db.execute.call_count == 1  # Metadata for the re-run search came from the cache
+
+
+class TestContextPacker:
+    """Test merging of overlapping chunks and the context token budget"""
+
+    def test_adjacent_chunks_merge_without_repeated_words(self):
+        text = " ".join(f"w{i}" for i in range(50))
+        chunks = [
+            {**chunk, "document_id": 1, "chunk_index": chunk["index"]}
+            for chunk in PDFProcessor(chunk_size=20, chunk_overlap=5).chunk_text(text)
+        ]
+        hits = [chunks[2], {"document_id": 2, "chunk_index": 4, "content": "other"}, chunks[0], chunks[1]]
+        packer = ContextPacker(model="gpt-4")
+        
+        context, included, stats = packer.pack(hits)
+        
+        assert context == format_context([text, "other"])
+        assert len(included) == 4
+        assert stats["passages"] == 2 and stats["tokens_saved"] > 0
+        assert packer.pack([chunks[0], chunks[2]])[2]["passages"] == 2
+
+    def test_budget_keeps_rank_order_and_truncates_an_oversized_top_passage(self):
+        first, long, last = "alpha beta", " ".join(["filler"] * 200), "gamma delta"
+        hits = [{"document_id": i, "chunk_index": 0, "content": content} for i, content in enumerate([first, long, last])]
+        packer = ContextPacker(model="gpt-4", max_tokens=count_tokens(first, "gpt-4") + count_tokens(last, "gpt-4"))
+        
+        context, included, stats = packer.pack(hits)
+        truncated, _, _ = ContextPacker(model="gpt-4", max_tokens=5).pack(hits[1:])
+        
+        assert context == format_context([first, last])
+        assert included == [hits[0], hits[2]]
+        assert stats["dropped"] == 1
+        assert truncated.startswith("[Context 1]\nfiller") and "[Context 2]" not in truncated
+        assert count_tokens(truncated.split("\n")[1], "gpt-4") <= 5
+
+    @pytest.mark.asyncio
+    async def test_sources_only_cite_chunks_sent_to_the_llm(self):
+        with patch("app.services.query_service.get_vector_service"):
+            service = QueryService()
+        service.query_embedding_cache = None
+        service.embedding_batcher = None
+        service.llm_service.context_packer = ContextPacker(model="gpt-4", max_tokens=count_tokens("short answer", "gpt-4"))
+        service.embedding_service.get_embedding_async = AsyncMock(return_value=np.array([0.5, 0.25], dtype=np.float32))
+        chunks = [
+            {"id": "a", "score": 0.9, "document_id": 1, "chunk_index": 0, "content": "short answer", "word_count": 2},
+            {"id": "b", "score": 0.8, "document_id": 2, "chunk_index": 0, "content": "a much longer passage", "word_count": 4},
+        ]
+        service.vector_service.search_similar_async = AsyncMock(side_effect=lambda **kwargs: [dict(chunk) for chunk in chunks])
+        service.llm_service.generate_answer_async = AsyncMock(return_value="Short.")
+        
+        response = await service.process_query("What is it?")
+        
+        assert [source["document_id"] for source in response["sources"]] == [1]
+        assert "much longer" not in service.llm_service.generate_answer_async.call_args.kwargs["context"]
+
+
+class TestDocumentMetadataCache:
+    """Test batched, cached document metadata lookups"""
+
+    @pytest.mark.asyncio
+    async def test_one_query_for_misses_and_invalidation(self, tmp_path):
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        from app.database import Base
+        from app.models.document import Document
+        
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'meta.db'}")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        cache = DocumentMetadataCache()
+        
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            db.add_all([
+                Document(filename=f"{i}.txt", original_filename=f"doc{i}.txt", file_path="", file_type=".txt", file_size=1)
+                for i in (1, 2)
+            ])
+            await db.commit()
+            
+            first = await cache.get_many([1, 2, 1, 3], db)
+            await cache.get_many([2, 1], db)
+            cache.invalidate_document(1)
+            await cache.get_many([1, 2], db)
+        await engine.dispose()
+        
+        assert first == {1: {"filename": "doc1.txt", "file_type": ".txt"}, 2: {"filename": "doc2.txt", "file_type": ".txt"}}
+        assert cache.queries == 2
+        assert cache.get_stats()["hits"] == 3
+
+
+class TestStreamingQuery:
+    """Test SSE-style query events"""
+
+    @pytest.mark.asyncio
+    async def test_sources_then_tokens_then_full_response(self):
+        with patch("app.services.query_service.get_vector_service"):
+            service = QueryService()
+        service.query_embedding_cache = None
+        service.embedding_batcher = None
+        service.embedding_service.get_embedding_async = AsyncMock(return_value=np.array([0.5, 0.25], dtype=np.float32))
+        chunk = {"id": "a", "score": 0.9, "document_id": 1, "chunk_index": 0, "content": "RAG combines retrieval", "word_count": 3}
+        service.vector_service.search_similar_async = AsyncMock(side_effect=lambda **kwargs: [dict(chunk)])
+        service.llm_service.stream_answer_async = Mock(side_effect=lambda question, chunks, context=None: iter_pieces([" It ", "combines  ", "retrieval"]))
+        
+        events = [event async for event in service.stream_query("What is RAG?")]
+        
+        assert [event["event"] for event in events[:2]] == ["sources", "token"]
+        assert events[0]["data"]["sources"][0]["document_id"] == 1
+        streamed = "".join(event["data"]["text"] for event in events if event["event"] == "token")
+        assert streamed == "It combines retrieval." == events[-1]["data"]["answer"]
+        assert events[-1]["event"] == "done"
+
+    @pytest.mark.asyncio
+    async def test_failure_yields_error_event(self):
+        with patch("app.services.query_service.get_vector_service"):
+            service = QueryService()
+        service.query_embedding_cache = None
+        service.embedding_batcher = None
+        service.embedding_service.get_embedding_async = AsyncMock(side_effect=RuntimeError("provider down"))
+        
+        events = [event async for event in service.stream_query("What is RAG?")]
+        
+        assert events == [{"event": "error", "data": {"detail": "Query processing failed: provider down"}}]
+
+
+class TestQueryEmbeddingBatcher:
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_share_one_request(self):
+        embedding_service = Mock()
+        embedding_service.get_embeddings_batch_async = AsyncMock(side_effect=lambda texts: [
+            [float(len(text))] for text in texts
+        ])
+        batcher = QueryEmbeddingBatcher(embedding_service, max_wait_ms=20, max_batch_size=10)
+        
+        results = await asyncio.gather(
+            batcher.embed("a"), batcher.embed("bb"), batcher.embed("a")
+        )
+        
+        assert results == [[1.0], [2.0], [1.0]]
+        embedding_service.get_embeddings_batch_async.assert_called_once_with(["a", "bb"])
+        stats = batcher.get_stats()
+        assert stats["batches"] == 1
+        assert stats["batch_size_histogram"]["buckets"]["le_2"] == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_propagates_to_every_waiter(self):
+        embedding_service = Mock()
+        embedding_service.get_embeddings_batch_async = AsyncMock(side_effect=Exception("boom"))
+        batcher = QueryEmbeddingBatcher(embedding_service, max_wait_ms=1)
+        
+        results = await asyncio.gather(
+            batcher.embed("a"), batcher.embed("b"), return_exceptions=True
+        )
+        
+        assert all(isinstance(result, Exception) for result in results)
+
+
+
+class TestEmbeddingDecoding:
+    def test_base64_embeddings_decode_to_float32_matrix(self):
+        vectors = np.array([[0.5, -1.0, 2.0], [1.5, 0.0, -0.25]], dtype=np.float32)
+        data = [Mock(embedding=base64.b64encode(row.tobytes()).decode()) for row in vectors]
+        
+        decoded = OpenAIEmbeddingProvider._decode_embeddings(data)
+        
+        assert decoded.dtype == np.float32
+        assert decoded.flags["C_CONTIGUOUS"]
+        assert np.array_equal(decoded, vectors)
+
+
+
+class TestAdaptiveRateController:
+    def test_parse_reset_duration(self):
+        assert parse_reset_duration("6m0s") == 360
+        assert parse_reset_duration("20ms") == 0.02
+        assert parse_reset_duration("2") == 2
+        assert parse_reset_duration(None) is None
+
+    def test_throttle_cuts_limits_and_success_recovers(self):
+        controller = AdaptiveRateController("test", max_concurrency=8)
+        controller.on_throttle()
+        
+        assert controller.concurrency_limit == 4
+        assert controller.batch_scale == 0.5
+        
+        controller.on_success({})
+        assert 4 < controller.concurrency_limit < 5
+
+    def test_retries_rate_limited_calls(self):
+        controller = AdaptiveRateController("test", max_retries=3, base_backoff_seconds=0.001)
+        raw_response = Mock(headers={}, parse=Mock(return_value="ok"))
+        request = Mock(side_effect=[
+            provider_error(openai.RateLimitError, 429, headers={"retry-after-ms": "1"}),
+            raw_response
+        ])
+        
+        assert controller.call(request) == "ok"
+        assert controller.retries == 1
+        assert controller.throttled == 1
+
+    def test_gives_up_after_max_retries(self):
+        controller = AdaptiveRateController("test", max_retries=1, base_backoff_seconds=0.001)
+        request = Mock(side_effect=provider_error(openai.InternalServerError, 500))
+        
+        with pytest.raises(openai.InternalServerError):
+            controller.call(request)
+        assert request.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_async_calls_retry_and_respect_concurrency(self):
+        controller = AdaptiveRateController(
+            "test", max_concurrency=2, min_concurrency=2, max_retries=3, base_backoff_seconds=0.001
+        )
+        peak = 0
+        failures = [provider_error(openai.RateLimitError, 429, headers={"retry-after-ms": "1"})]
+        
+        async def request():
+            nonlocal peak
+            peak = max(peak, controller.in_flight)
+            await asyncio.sleep(0.01)
+            if failures:
+                raise failures.pop()
+            return Mock(headers={}, parse=Mock(return_value="ok"))
+        
+        results = await asyncio.gather(*[controller.call_async(request) for _ in range(6)])
+        
+        assert results == ["ok"] * 6
+        assert peak <= 2
+        assert controller.retries == 1
+        assert controller.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_streams_hold_their_slot_until_closed(self):
+        controller = AdaptiveRateController("test", max_concurrency=1, min_concurrency=1, base_backoff_seconds=0.001)
+        failures = [provider_error(openai.RateLimitError, 429, headers={"retry-after-ms": "1"})]
+        
+        async def request():
+            if failures:
+                raise failures.pop()
+            return Mock(headers={}, parse=Mock(return_value="stream"))
+        
+        async with controller.stream_async(request) as stream:
+            assert stream == "stream"
+            assert controller.in_flight == 1
+        
+        assert controller.in_flight == 0
+        assert controller.retries == 1
+
+    @pytest.mark.asyncio
+    async def test_async_waiters_get_slots_in_order_after_a_pause(self):
+        controller = AdaptiveRateController("test", max_concurrency=1, min_concurrency=1)
+        order = []
+        
+        async def request(number):
+            async with controller.async_slot():
+                order.append(number)
+                await asyncio.sleep(0.001)
+        
+        async with controller.async_slot():
+            controller.on_success({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "30ms"})
+            tasks = [asyncio.ensure_future(request(number)) for number in range(4)]
+            await asyncio.sleep(0.001)
+            tasks[1].cancel()
+        started = time.monotonic()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        
+        assert order == [0, 2, 3]
+        assert time.monotonic() - started >= 0.02
+        assert controller.in_flight == 0 and not controller._async_waiters
+
+    def test_oversized_batches_are_split(self):
+        service = EmbeddingService(cache=EmbeddingCache(use_redis=False))
+        service.provider.rate_controller = AdaptiveRateController("test")
+        service.provider.client = fake_embeddings_client(lambda text: [float(text)])
+        create = service.provider.client.embeddings.with_raw_response.create
+        embed = create.side_effect
+        
+        def reject_large_batches(model, input, **kwargs):
+            if len(input) > 2:
+                raise provider_error(openai.BadRequestError, 400, "maximum context length exceeded")
+            return embed(model, input, **kwargs)
+        
+        create.side_effect = reject_large_batches
+        embeddings = service.get_embeddings_batch(["1", "2", "3", "4", "5"])
+        
+        assert embeddings.tolist() == [[1.0], [2.0], [3.0], [4.0], [5.0]]
+
+    @pytest.mark.asyncio
+    async def test_async_embeddings_use_the_async_client(self):
+        service = EmbeddingService(cache=EmbeddingCache(use_redis=False))
+        service.max_batch_items = 2
+        service.provider.rate_controller = AdaptiveRateController("test")
+        client = fake_embeddings_client(lambda text: [float(text)])
+        create = client.embeddings.with_raw_response.create
+        service.provider.async_client = Mock()
+        service.provider.async_client.embeddings.with_raw_response.create = AsyncMock(side_effect=create.side_effect)
+        
+        embeddings = await service.get_embeddings_batch_async(["1", "2", "3"])
+        
+        assert embeddings.tolist() == [[1.0], [2.0], [3.0]]
+        assert service.provider.async_client.embeddings.with_raw_response.create.call_count == 2
+
+
+
+class TestHashingEmbeddingProvider:
+    def test_embeddings_are_normalized_and_deterministic(self):
+        provider = HashingEmbeddingProvider(dimension=64)
+        
+        first = provider.embed(["error code E-1234 in the pump", ""])
+        second = provider.embed(["error code E-1234 in the pump"])
+        
+        assert first.shape == (2, 64)
+        assert first.dtype == np.float32
+        assert np.isclose(np.linalg.norm(first[0]), 1.0)
+        assert not first[1].any()
+        assert np.array_equal(first[0], second[0])
+
+    def test_similar_texts_score_higher(self):
+        provider = HashingEmbeddingProvider(dimension=256)
+        query, related, unrelated = provider.embed([
+            "how do I reset the pump controller",
+            "to reset the pump controller hold the power button",
+            "quarterly revenue grew in the european market"
+        ])
+        
+        assert query @ related > query @ unrelated
+
+    def test_embedding_service_uses_provider_dimension(self):
+        service = EmbeddingService(
+            provider=HashingEmbeddingProvider(dimension=32),
+            cache=EmbeddingCache(use_redis=False)
+        )
+        
+        embeddings = service.get_embeddings_batch(["first chunk", "second chunk"])
+        
+        assert service.dimension == 32
+        assert embeddings.shape == (2, 32)
+        assert service.model == "local-hashing-32"
+
+
+class TestVectorService:
+    """Test collection setup, search parameters and uploads"""
+
+    def make_service(self, quantization, existing=None):
+        with patch("app.services.vector_service.QdrantClient") as client_class:
+            client = client_class.return_value
+            client.get_collections.return_value = Mock(
+                collections=[Mock()] if existing is not None else []
+            )
+            if existing is not None:
+                client.get_collections.return_value.collections[0].name = "test"
+                client.get_collection.return_value = Mock(
+                    config=Mock(
+                        params=Mock(vectors=Mock(size=8)),
+                        quantization_config=existing,
+                        hnsw_config=Mock(m=16, ef_construct=100)
+                    ),
+                    payload_schema={"document_id": Mock(data_type="keyword")}
+                )
+            return VectorService(vector_size=8, collection_name="test", quantization=quantization)
+
+    def test_new_collection_is_created_quantized(self):
+        service = self.make_service("scalar")
+        
+        kwargs = service.client.create_collection.call_args.kwargs
+        assert kwargs["quantization_config"].scalar.type == "int8"
+        assert service._search_params().quantization.rescore is True
+
+    def test_unquantized_search_has_no_params(self):
+        service = self.make_service("none")
+        
+        assert service.client.create_collection.call_args.kwargs["quantization_config"] is None
+        assert service._search_params() is None
+
+    def test_existing_collection_is_migrated(self):
+        service = self.make_service("binary", existing=Mock())
+        
+        kwargs = service.client.update_collection.call_args.kwargs
+        assert kwargs["quantization_config"].binary is not None
+        assert service._search_params(rescore=False, oversampling=3.0).quantization.oversampling == 3.0
+        service.client.delete_payload_index.assert_called_once_with("test", "document_id")
+        service.client.create_payload_index.assert_called_once_with(
+            collection_name="test", field_name="document_id", field_schema="integer"
+        )
+
+    def test_new_collection_gets_payload_index_and_hnsw_config(self):
+        service = self.make_service("none")
+        service.hnsw_ef = 128
+        
+        assert service.client.create_collection.call_args.kwargs["hnsw_config"].m == 16
+        assert service.client.create_payload_index.call_args.kwargs["field_name"] == "document_id"
+        assert service._search_params().hnsw_ef == 128
+
+    def test_store_chunks_uploads_in_batches_with_final_barrier(self):
+        service = self.make_service("none")
+        service.upsert_batch_size = 2
+        chunks = [
+            {"index": i, "content": f"chunk {i}", "word_count": 2, "embedding": np.full(8, i, dtype=np.float32)}
+            for i in range(5)
+        ]
+        
+        vector_ids = service.store_chunks(document_id=3, chunks=chunks)
+        
+        calls = service.client.upsert.call_args_list
+        assert [len(call.kwargs["points"].ids) for call in calls[:2]] == [2, 2]
+        assert [call.kwargs["wait"] for call in calls] == [False, False, True]
+        assert calls[-1].kwargs["points"].ids == vector_ids[4:]
+        assert calls[-1].kwargs["points"].payloads[0]["chunk_index"] == 4
+        assert service.last_upload_stats["batches"] == 3
+
+
+class TestNumpyVectorService:
+    """Test the in-process exact-search backend"""
+
+    def make_chunks(self, vectors):
+        return [
+            {"index": i, "content": f"chunk {i}", "word_count": 2, "embedding": np.array(vector, dtype=np.float32)}
+            for i, vector in enumerate(vectors)
+        ]
+
+    def test_search_filters_and_ranks(self, tmp_path):
+        service = NumpyVectorService(vector_size=3, collection_name="test", storage_dir=str(tmp_path))
+        service.store_chunks(1, self.make_chunks([[1, 0, 0], [0, 1, 0]]))
+        service.store_chunks(2, self.make_chunks([[2, 0.1, 0], [0, 0, 1]]))
+        
+        results = service.search_similar(np.array([1, 0, 0], dtype=np.float32), limit=2, score_threshold=0.0)
+        filtered = service.search_similar(np.array([1, 0, 0], dtype=np.float32), limit=5, document_id=2, score_threshold=0.0)
+        
+        assert [(r["document_id"], r["chunk_index"]) for r in results] == [(1, 0), (2, 0)]
+        assert np.isclose(results[0]["score"], 1.0)
+        assert [r["chunk_index"] for r in filtered] == [0, 1]
+        assert all(r["document_id"] == 2 for r in filtered)
+
+    def test_delete_and_reload(self, tmp_path):
+        service = NumpyVectorService(vector_size=3, collection_name="test", storage_dir=str(tmp_path))
+        service.store_chunks(1, self.make_chunks([[1, 0, 0]]))
+        kept_ids = service.store_chunks(2, self.make_chunks([[0, 1, 0]]))
+        service.delete_document_chunks(1)
+        
+        reloaded = NumpyVectorService(vector_size=3, collection_name="test", storage_dir=str(tmp_path))
+        results = reloaded.search_similar(np.array([0, 1, 0], dtype=np.float32), score_threshold=0.0)
+        
+        assert reloaded.get_collection_stats()["total_points"] == 1
+        assert [r["id"] for r in results] == kept_ids
+        with pytest.raises(Exception):
+            NumpyVectorService(vector_size=4, collection_name="test", storage_dir=str(tmp_path))
+
+    def test_writers_sharing_a_collection_keep_each_others_points(self, tmp_path):
+        server = NumpyVectorService(vector_size=3, collection_name="test", storage_dir=str(tmp_path))
+        reindexer = NumpyVectorService(vector_size=3, collection_name="test", storage_dir=str(tmp_path))
+        server.store_chunks(1, self.make_chunks([[1, 0, 0]]))
+        reindexer.store_chunks(2, self.make_chunks([[0, 1, 0]]))
+        server.store_chunks(3, self.make_chunks([[0, 0, 1]]))
+        reindexer.delete_document_chunks(1)
+
+        results = server.search_similar(np.array([1, 1, 1], dtype=np.float32), limit=5, score_threshold=0.0)
+        reloaded = NumpyVectorService(vector_size=3, collection_name="test", storage_dir=str(tmp_path))
+
+        assert sorted(r["document_id"] for r in results) == [2, 3]
+        assert sorted(reloaded.document_ids.tolist()) == [2, 3]
+        assert np.allclose(reloaded.get_vectors(reloaded.ids)[reloaded.ids[0]], [0, 1, 0])
+
+
+class TestIncrementalReindexing:
+    """Test deterministic point IDs and incremental document reindexing"""
+
+    def make_chunks(self, texts):
+        return [{"index": i, "content": text, "word_count": len(text.split())} for i, text in enumerate(texts)]
+
+    def test_point_ids_are_deterministic(self):
+        chunks = self.make_chunks(["alpha", "beta", "alpha"])
+        
+        ids = chunk_point_ids(1, chunks)
+        
+        assert ids == chunk_point_ids(1, chunks)
+        assert len(set(ids)) == 3
+        assert ids[0] != chunk_point_ids(2, chunks)[0]
+
+    def test_reprocessing_embeds_only_changed_chunks(self, tmp_path):
+        service = DocumentService.__new__(DocumentService)
+        service.embedding_service = EmbeddingService(
+            provider=HashingEmbeddingProvider(dimension=16),
+            cache=EmbeddingCache(use_redis=False)
+        )
+        service.vector_service = NumpyVectorService(vector_size=16, collection_name="test", storage_dir=str(tmp_path))
+        service.chunk_store = SqliteChunkStore(str(tmp_path / "chunks.sqlite"))
+        service.lexical_index = None
+        service.document_router = None
+        embed_chunks = Mock(side_effect=service.embedding_service.embed_chunks)
+        service.embedding_service.embed_chunks = embed_chunks
+        
+        service._sync_vectors(1, self.make_chunks(["intro", "pump setup", "wiring", "appendix"]))
+        service._sync_vectors(1, self.make_chunks(["intro", "wiring", "pump setup revised", "appendix"]))
+        
+        assert [chunk["content"] for chunk in embed_chunks.call_args.args[0]] == ["pump setup revised"]
+        indexes = {payload["content"]: payload["chunk_index"] for payload in service.vector_service.payloads}
+        assert indexes == {"intro": 0, "wiring": 1, "pump setup revised": 2, "appendix": 3}
+
+
+class TestLeanPayloads:
+    """Test lean vector payloads hydrated from the chunk store"""
+
+    def test_search_results_are_hydrated_from_chunk_store(self, tmp_path):
+        chunk_store = SqliteChunkStore(str(tmp_path / "chunks.sqlite"))
+        with patch("app.services.numpy_vector_service.settings.vector_payload_content", False):
+            vector_service = NumpyVectorService(vector_size=2, collection_name="test", storage_dir=str(tmp_path))
+            vector_ids = vector_service.store_chunks(1, [
+                {"index": 0, "content": "lean chunk", "word_count": 2, "embedding": np.array([1, 0], dtype=np.float32)}
+            ])
+        chunk_store.put_many({vector_ids[0]: "lean chunk"})
+        
+        with patch("app.services.query_service.get_vector_service"):
+            service = QueryService(vector_service=vector_service, chunk_store=chunk_store)
+        results = vector_service.search_similar(np.array([1, 0], dtype=np.float32))
+        service._hydrate_content(results)
+        
+        assert "content" not in vector_service.payloads[0]
+        assert results[0]["content"] == "lean chunk"
+        
+        chunk_store.delete_many(vector_ids)
+        assert chunk_store.get_many(vector_ids) == {}
+
+
+class TestHybridSearch:
+    """Test the BM25 index and reciprocal-rank fusion"""
+
+    def make_chunks(self, texts):
+        return [{"index": i, "content": text, "word_count": len(text.split())} for i, text in enumerate(texts)]
+
+    def test_lexical_index_finds_exact_terms(self, tmp_path):
+        index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+        index.replace_document(1, ["a", "b"], self.make_chunks(["Pump fault E-1234 means low pressure", "Routine maintenance schedule"]))
+        index.replace_document(2, ["c"], self.make_chunks(["Error E-1234 on the compressor"]))
+        
+        results = index.search("what does E-1234 mean?")
+        
+        assert {result["id"] for result in results} == {"a", "c"}
+        assert [result["id"] for result in index.search("E-1234", document_id=2)] == ["c"]
+        
+        index.replace_document(1, ["b"], self.make_chunks(["Routine maintenance schedule"]))
+        index.delete_document(2)
+        assert index.search("E-1234") == []
+
+    def test_rrf_promotes_results_found_by_both(self):
+        dense = [{"id": "x", "score": 0.9, "content": "x"}, {"id": "y", "score": 0.8, "content": "y"}]
+        lexical = [{"id": "y", "score": 7.0, "content": None}, {"id": "z", "score": 5.0, "content": None}]
+        
+        fused = reciprocal_rank_fusion([dense, lexical], k=60, limit=2)
+        
+        assert [result["id"] for result in fused] == ["y", "x"]
+        assert fused[0]["content"] == "y"
+        assert 0 < fused[1]["fused_score"] < fused[0]["fused_score"] < 1
+        assert [result["score"] for result in fused] == [0.8, 0.9]
+
+    @pytest.mark.asyncio
+    async def test_query_service_fuses_lexical_hits(self, tmp_path):
+        index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+        index.replace_document(1, ["part"], self.make_chunks(["Replace gasket PN-7731 yearly"]))
+        with patch("app.services.query_service.get_vector_service"):
+            service = QueryService(lexical_index=index)
+        dense = [{"id": "other", "score": 0.75, "document_id": 1, "chunk_index": 3, "content": "General upkeep", "word_count": 2}]
+        
+        with patch("app.services.query_service.settings.lexical_min_score", 0.0):
+            fused = await service._fuse_lexical("PN-7731 interval", dense, limit=2, score_threshold=0.7)
+        
+        assert {result["id"] for result in fused} == {"other", "part"}
+        assert service._candidate_limit(2) == 20
+        assert await service._fuse_lexical("PN-7731 interval", dense, limit=2, score_threshold=0.8) == []
+
+    def test_lexical_search_ignores_stopwords_and_weak_matches(self, tmp_path):
+        index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+        index.replace_document(1, ["a", "b", "c"], self.make_chunks([
+            "What is the pump pressure", "The valve is what fails", "Gasket PN-7731 is replaced yearly"
+        ]))
+        
+        assert index.search("what is the") == []
+        assert [result["id"] for result in index.search("what is PN-7731", min_score=0.5)] == ["c"]
+        assert index.search("what is PN-7731", min_score=100) == []
+
+    @pytest.mark.asyncio
+    async def test_lexical_only_hits_report_cosine_score(self):
+        vector_service = Mock()
+        vector_service.get_vectors_async = AsyncMock(return_value={"part": np.array([0, 2], dtype=np.float32)})
+        with patch("app.services.query_service.get_vector_service"):
+            service = QueryService(vector_service=vector_service, lexical_index=Mock())
+        service.lexical_index.search.return_value = [{"id": "part", "score": 6.0, "document_id": 1, "content": None}]
+        dense = [{"id": "other", "score": 0.75, "document_id": 1, "content": "General upkeep"}]
+        
+        selected = await service._select_chunks(
+            "PN-7731", np.array([0.6, 0.8], dtype=np.float32), dense, max_results=2, score_threshold=0.7
+        )
+        
+        assert {chunk["id"]: round(chunk["score"], 3) for chunk in selected} == {"other": 0.75, "part": 0.8}
+        assert all("fused_score" in chunk for chunk in selected)
+
+    def test_rebuild_lexical_index_from_saved_chunks(self, tmp_path):
+        service = DocumentService.__new__(DocumentService)
+        service.lexical_index = LexicalIndex(str(tmp_path / "lexical.sqlite"))
+        service.change_listeners = []
+        chunk_query = Mock()
+        chunk_query.filter.return_value.order_by.return_value.all.return_value = [
+            Mock(vector_id="v0", chunk_index=0, content="Gasket PN-7731 is replaced yearly")
+        ]
+        document_query = Mock()
+        document_query.filter.return_value = [(1,)]
+        db = Mock()
+        db.query.side_effect = [document_query, chunk_query]
+        
+        assert service.rebuild_lexical_index(db) == 1
+        assert [result["id"] for result in service.lexical_index.search("PN-7731")] == ["v0"]
+
+
+class TestReranking:
+    """Test MMR diversification and per-document caps"""
+
+    def test_mmr_skips_near_duplicate(self):
+        relevance = np.array([1.0, 0.99, 0.8])
+        embeddings = np.array([[1, 0], [1, 0.01], [0, 1]], dtype=np.float32)
+        
+        assert maximal_marginal_relevance(relevance, embeddings, lambda_mult=1.0, limit=2) == [0, 1]
+        assert maximal_marginal_relevance(relevance, embeddings, lambda_mult=0.5, limit=2) == [0, 2]
+
+    def test_cap_per_document(self):
+        chunks = [{"id": str(i), "document_id": doc} for i, doc in enumerate([1, 1, 2, 1, 2])]
+        
+        assert [chunk["id"] for chunk in cap_per_document(chunks, 1)] == ["0", "2"]
+
+    def test_numpy_search_grouped_caps_hits(self, tmp_path):
+        service = NumpyVectorService(vector_size=2, collection_name="test", storage_dir=str(tmp_path))
+        service.store_chunks(1, [
+            {"index": i, "content": f"chunk {i}", "word_count": 2, "embedding": np.array([1, 0.1 * i], dtype=np.float32)}
+            for i in range(3)
+        ])
+        service.store_chunks(2, [{"index": 0, "content": "other", "word_count": 1, "embedding": np.array([1, 0.5], dtype=np.float32)}])
+        
+        results = service.search_grouped(np.array([1, 0], dtype=np.float32), limit=5, group_size=1, score_threshold=0.0, with_vectors=True)
+        
+        assert [(r["document_id"], r["chunk_index"]) for r in results] == [(1, 0), (2, 0)]
+        assert results[0]["vector"].shape == (2,)
+
+    @pytest.mark.asyncio
+    async def test_query_service_diversifies_and_strips_vectors(self):
+        with patch("app.services.query_service.get_vector_service"):
+            service = QueryService(embedding_service=EmbeddingService(provider=HashingEmbeddingProvider(dimension=2)))
+        candidates = [
+            {"id": "a", "score": 0.9, "document_id": 1, "vector": np.array([1, 0], dtype=np.float32)},
+            {"id": "b", "score": 0.89, "document_id": 1, "vector": np.array([1, 0.01], dtype=np.float32)},
+            {"id": "c", "score": 0.8, "document_id": 2, "vector": np.array([0, 1], dtype=np.float32)},
+        ]
+        
+        with patch("app.services.query_service.settings.mmr_enabled", True), \
+                patch("app.services.query_service.settings.mmr_lambda", 0.5):
+            selected = await service._select_chunks("question", np.array([1, 0], dtype=np.float32), candidates, max_results=2)
+        
+        assert [chunk["id"] for chunk in selected] == ["a", "c"]
+        assert all("vector" not in chunk for chunk in selected)
+
+
+class TestDocumentRouting:
+    """Test two-stage retrieval through document centroids"""
+
+    def test_search_restricted_to_any_of_documents(self, tmp_path):
+        service = NumpyVectorService(vector_size=2, collection_name="test", storage_dir=str(tmp_path))
+        for document_id, vector in [(1, [1, 0]), (2, [1, 0.1]), (3, [1, 0.2])]:
+            service.store_chunks(document_id, [
+                {"index": 0, "content": "c", "word_count": 1, "embedding": np.array(vector, dtype=np.float32)}
+            ])
+        query = np.array([1, 0], dtype=np.float32)
+        
+        results = service.search_similar(query, limit=5, score_threshold=0.0, document_ids=[2, 3])
+        batch = service.search_similar_batch(
+            np.vstack([query, query]), [5, 5], [None, None], [0.0, 0.0], document_id_sets=[[3], None]
+        )
+        
+        assert [r["document_id"] for r in results] == [2, 3]
+        assert [[r["document_id"] for r in results] for results in batch] == [[3], [1, 2, 3]]
+
+    def test_router_ranks_documents_by_centroid(self, tmp_path):
+        router = DocumentRouter(NumpyVectorService(vector_size=2, collection_name="centroids", storage_dir=str(tmp_path)))
+        router.update_document(1, [np.array([1, 0], dtype=np.float32), np.array([1, 0.2], dtype=np.float32)])
+        router.update_document(2, [np.array([0, 1], dtype=np.float32)])
+        router.update_document(2, [np.array([0.1, 1], dtype=np.float32)])
+        
+        assert router.route(np.array([0, 1], dtype=np.float32), limit=2) == [2, 1]
+        assert router.route_batch(np.array([[1, 0]], dtype=np.float32), limit=1) == [[1]]
+        assert len(router.vector_service.ids) == 2
+        
+        router.delete_document(2)
+        assert router.route(np.array([0, 1], dtype=np.float32), limit=2) == [1]
+
+    def test_reprocessing_refreshes_centroid(self, tmp_path):
+        service = DocumentService.__new__(DocumentService)
+        service.embedding_service = EmbeddingService(
+            provider=HashingEmbeddingProvider(dimension=16),
+            cache=EmbeddingCache(use_redis=False)
+        )
+        service.vector_service = NumpyVectorService(vector_size=16, collection_name="test", storage_dir=str(tmp_path))
+        service.chunk_store = SqliteChunkStore(str(tmp_path / "chunks.sqlite"))
+        service.lexical_index = None
+        service.document_router = DocumentRouter(
+            NumpyVectorService(vector_size=16, collection_name="centroids", storage_dir=str(tmp_path))
+        )
+        chunks = [{"index": i, "content": text, "word_count": 1} for i, text in enumerate(["pump", "wiring"])]
+        
+        service._sync_vectors(1, chunks)
+        service._sync_vectors(1, chunks + [{"index": 2, "content": "appendix", "word_count": 1}])
+        
+        centroids = service.document_router.vector_service
+        assert centroids.payloads == [{"document_id": 1, "chunk_index": 0, "word_count": 3, "content": ""}]
+        expected = DocumentRouter.centroid(np.vstack(list(service.vector_service.get_vectors(service.vector_service.ids).values())))
+        assert np.allclose(centroids.vectors[0], expected / np.linalg.norm(expected), atol=1e-6)
+
+
+    @pytest.mark.asyncio
+    async def test_routing_waits_until_every_document_has_a_centroid(self):
+        router = Mock()
+        router.get_document_ids.return_value = {1, 3}
+        router.route_async = AsyncMock(return_value=[1])
+        vector_service = Mock()
+        vector_service.search_similar_async = AsyncMock(return_value=[])
+        with patch("app.services.query_service.get_vector_service"):
+            service = QueryService(vector_service=vector_service, document_router=router)
+        db = Mock()
+        db.execute = AsyncMock(return_value=Mock(scalars=Mock(return_value=Mock(all=Mock(return_value=[1, 2])))))
+        
+        await service._search_candidates(np.array([1, 0], dtype=np.float32), 5, None, 0.7, db)
+        await service._search_candidates(np.array([1, 0], dtype=np.float32), 5, None, 0.7, db)
+        assert vector_service.search_similar_async.call_args.kwargs["document_ids"] is None
+        assert db.execute.call_count == 1
+        
+        router.get_document_ids.return_value = {1, 2, 3}
+        service._routing_coverage = (float("-inf"), False)
+        await service._search_candidates(np.array([1, 0], dtype=np.float32), 5, None, 0.7, db)
+        assert vector_service.search_similar_async.call_args.kwargs["document_ids"] == [1]
+
+    def test_rebuild_centroids_from_stored_vectors(self, tmp_path):
+        service = DocumentService.__new__(DocumentService)
+        service.vector_service = NumpyVectorService(vector_size=2, collection_name="test", storage_dir=str(tmp_path))
+        service.vector_service.store_chunks(1, [
+            {"index": 0, "content": "c", "word_count": 1, "embedding": np.array([0, 1], dtype=np.float32)}
+        ])
+        service.document_router = DocumentRouter(
+            NumpyVectorService(vector_size=2, collection_name="centroids", storage_dir=str(tmp_path))
+        )
+        db = Mock()
+        db.query.return_value.filter.return_value = [(1,)]
+        
+        assert service.rebuild_centroids(db) == 1
+        assert service.document_router.get_document_ids() == {1}
+        assert service.document_router.route(np.array([0, 1], dtype=np.float32), limit=1) == [1]
+
+
+class TestServiceContainer:
+    """Test that routes share one set of services"""
+
+    def test_services_share_clients(self):
+        with patch("app.services.container.get_vector_service") as get_vector_service, \
+                patch("app.services.container.get_embedding_provider", return_value=HashingEmbeddingProvider(dimension=8)):
+            container = ServiceContainer()
+        
+        assert container.query_service.vector_service is container.document_service.vector_service
+        assert container.query_service.embedding_service is container.document_service.embedding_service
+        assert container.llm_service.async_client._client is container.async_http_client
+        get_vector_service.assert_called_once_with(8)
+        
+        container.close()
+        assert container.http_client.is_closed
+
+    def test_document_changes_invalidate_cached_answers(self):
+        with patch("app.services.container.get_vector_service"), \
+                patch("app.services.container.get_embedding_provider", return_value=HashingEmbeddingProvider(dimension=8)), \
+                patch("app.services.query_service.settings.answer_cache_enabled", True), \
+                patch("app.services.query_service.get_answer_cache", return_value=SemanticAnswerCache()):
+            container = ServiceContainer()
+        answer_cache = container.query_service.answer_cache
+        answer_cache.put(np.ones(8, dtype=np.float32), "s", {"sources": [{"document_id": 4}]}, {4}, 0)
+        assert answer_cache.get(np.ones(8, dtype=np.float32), "s") is not None
+        
+        container.document_service._notify_change(4)
+        
+        assert answer_cache.get(np.ones(8, dtype=np.float32), "s") is None
+        container.close()